@@ -0,0 +1,95 @@
+"""Compare sqf_emit.parse_frontmatter with PyYAML on journal frontmatter.
+
+Usage: python benchmarks/bench_frontmatter.py [--entries N]
+
+Generates N frontmatter blocks shaped like ``sf new`` output and times
+parsing them all with the native parser, ``yaml.safe_load`` and, when
+libyaml is available, ``yaml.load(..., Loader=yaml.CSafeLoader)``. Two
+corpora are measured: "plain" uses ASCII prose, and "mixed" adds quotes,
+comment markers and non-ASCII text that PyYAML emits as escaped,
+folded double-quoted scalars.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import random
+import time
+from pathlib import Path
+
+import yaml
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "sqf_emit.py"
+PLAIN = "parser bug cache flaky test retry timeout regression the in for"
+MIXED = PLAIN + " café 日本 'quoted' #tag"
+
+
+def load_emit():
+    spec = importlib.util.spec_from_file_location("sqf_emit", SCRIPT)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def make_docs(count: int, vocab: str) -> list[str]:
+    rnd = random.Random(0)
+    words = vocab.split()
+    docs = []
+    for _ in range(count):
+        trailers = {
+            key: " ".join(rnd.choices(words, k=rnd.randint(1, 30)))
+            for key in ("fix", "why", "change", "proof", "ref")
+        }
+        docs.append(yaml.safe_dump({"trailers": trailers}, sort_keys=False))
+    return docs
+
+
+def timed(name: str, fn, docs: list[str]) -> None:
+    start = time.perf_counter()
+    for doc in docs:
+        fn(doc)
+    elapsed = time.perf_counter() - start
+    per = elapsed / len(docs) * 1e6
+    print(f"{name:<22} {elapsed * 1000:9.1f} ms  {per:7.1f} us/entry")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10_000)
+    args = parser.parse_args()
+    emit = load_emit()
+    for name, vocab in (("plain", PLAIN), ("mixed", MIXED)):
+        print(f"== {name} corpus")
+        run(emit, make_docs(args.entries, vocab))
+        print()
+
+
+def run(emit, docs: list[str]) -> None:
+    native = 0
+    for doc in docs:
+        try:
+            assert emit.parse_frontmatter(doc) == yaml.safe_load(doc)
+            native += 1
+        except emit.Unsupported:
+            pass
+    print(f"{native}/{len(docs)} entries handled natively")
+
+    def fast(doc: str) -> None:
+        try:
+            emit.parse_frontmatter(doc)
+        except emit.Unsupported:
+            yaml.safe_load(doc)
+
+    timed("parse_frontmatter", fast, docs)
+    timed("yaml.safe_load", yaml.safe_load, docs)
+    if hasattr(yaml, "CSafeLoader"):
+        timed(
+            "yaml CSafeLoader",
+            lambda d: yaml.load(d, Loader=yaml.CSafeLoader),
+            docs,
+        )
+
+
+if __name__ == "__main__":
+    main()
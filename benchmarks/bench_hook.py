@@ -0,0 +1,123 @@
+"""Time the commit-msg hook with and without the trailer cache.
+
+Usage: python benchmarks/bench_hook.py [--commits N] [--entries E]
+                                       [--change-every K]
+
+Builds a throwaway git repository with E journal entries, installs the
+hook from ``scripts/install_hooks.sh`` and runs it N times, as git would
+for N commits, against a scratch message file. Every K-th commit adds a
+journal entry, so the cached hook also pays for its misses. The
+"uncached" row runs the previous hook, which starts Python every time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+UNCACHED = """#!/usr/bin/env bash
+set -euo pipefail
+root="$(git rev-parse --show-toplevel)"
+trailers="$(python3 "$root/scripts/sqf_emit.py" trailers || true)"
+[ -z "$trailers" ] && exit 0
+echo "" >> "$1"
+echo "$trailers" >> "$1"
+"""
+
+
+def write_entry(jdir: Path, n: int, age: float) -> None:
+    path = jdir / f"2025-01-{n % 28 + 1:02d}-entry-{n}.md"
+    path.write_text(
+        "---\ntrailers:\n"
+        f"  fix: fix {n}\n  why: why {n}\n  change: change {n}\n"
+        "---\nBody.\n"
+    )
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def setup(repo: Path, entries: int) -> None:
+    (repo / "scripts").mkdir(parents=True)
+    shutil.copy(SCRIPTS / "sqf_emit.py", repo / "scripts")
+    (repo / ".squirrelfocus").mkdir()
+    (repo / ".squirrelfocus" / "config.yaml").write_text(
+        "journals_dir: journal_logs\n"
+    )
+    jdir = repo / "journal_logs"
+    jdir.mkdir()
+    for n in range(entries):
+        write_entry(jdir, n, age=3600 - n)
+    old = time.time() - 7200
+    os.utime(repo / ".squirrelfocus" / "config.yaml", (old, old))
+    os.utime(repo / "scripts" / "sqf_emit.py", (old, old))
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(
+        ["bash", str(SCRIPTS / "install_hooks.sh")],
+        cwd=repo,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def run(repo: Path, hook: Path, args: argparse.Namespace) -> list[float]:
+    msg = repo / ".git" / "COMMIT_EDITMSG"
+    cache = repo / ".git" / "sqf-trailers"
+    if cache.exists():
+        cache.unlink()
+    lat = []
+    added = args.entries
+    for i in range(args.commits):
+        if args.change_every and i and i % args.change_every == 0:
+            write_entry(repo / "journal_logs", added, age=10)
+            added += 1
+        msg.write_text("work\n")
+        start = time.perf_counter()
+        subprocess.run([str(hook), str(msg)], cwd=repo, check=True)
+        lat.append(time.perf_counter() - start)
+    return lat
+
+
+def report(name: str, lat: list[float]) -> None:
+    lat = sorted(lat)
+    p50 = statistics.median(lat) * 1000
+    p99 = lat[max(int(len(lat) * 0.99) - 1, 0)] * 1000
+    print(
+        f"{name:<9} {sum(lat):9.2f} s {p50:9.2f} ms {p99:9.2f} ms"
+        f" {statistics.mean(lat) * 1000:9.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--change-every", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp) / "repo"
+        setup(repo, args.entries)
+        cached = repo / ".git" / "hooks" / "commit-msg"
+        uncached = repo / ".git" / "hooks" / "commit-msg-uncached"
+        uncached.write_text(UNCACHED)
+        uncached.chmod(0o755)
+        print(
+            f"{'hook':<9} {'total':>11} {'p50':>12} {'p99':>12} {'mean':>12}"
+        )
+        report("uncached", run(repo, uncached, args))
+        # Start the second run from the same set of entries.
+        for path in (repo / "journal_logs").glob("*-entry-*.md"):
+            if int(path.stem.rsplit("-", 1)[1]) >= args.entries:
+                path.unlink()
+        report("cached", run(repo, cached, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Time bulk journal loading, cold and warm, at several tree sizes.
+
+Usage: python benchmarks/bench_load.py [--sizes 1000,10000,100000]
+                                       [--body-bytes B] [--workers W]
+
+For each size a temporary tree of ``sf new``-shaped entries with B-byte
+bodies is written in year/month partitions. Three loaders are timed:
+
+- ``full``: read each whole file and split the frontmatter (the old path)
+- ``prefix``: ``iter_frontmatter`` in this process, frontmatter only
+- ``pool``: ``iter_frontmatter`` on a process pool of W workers
+
+"cold" runs first evict the files from the page cache with
+``posix_fadvise(DONTNEED)`` where the platform supports it; "warm" runs
+repeat the load straight after.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "sqf_emit.py"
+WORDS = "parser bug cache flaky test retry timeout regression the in".split()
+
+
+def load_emit():
+    spec = importlib.util.spec_from_file_location("sqf_emit", SCRIPT)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["sqf_emit"] = mod  # lets pool workers find _load_chunk
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def make_tree(base: Path, count: int, body_bytes: int) -> list[str]:
+    rnd = random.Random(count)
+    paths = []
+    for n in range(count):
+        year = 2000 + n // 4000
+        month = n // 400 % 10 + 1
+        day = n % 28 + 1
+        sub = base / str(year) / f"{month:02d}"
+        sub.mkdir(parents=True, exist_ok=True)
+        path = sub / f"{year}-{month:02d}-{day:02d}-entry-{n}.md"
+        trailers = "".join(
+            f"  {key}: {' '.join(rnd.choices(WORDS, k=8))}\n"
+            for key in ("fix", "why", "change", "proof", "ref")
+        )
+        body = (" ".join(rnd.choices(WORDS, k=body_bytes // 6)) + "\n")[
+            :body_bytes
+        ]
+        path.write_text(f"---\ntrailers:\n{trailers}---\n{body}")
+        paths.append(str(path))
+    return paths
+
+
+def evict(paths: list[str]) -> bool:
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def full(emit, paths: list[str], workers: int) -> int:
+    n = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            fm, _ = emit.split_frontmatter(fh.read())
+        n += bool(fm)
+    return n
+
+
+def prefix(emit, paths: list[str], workers: int) -> int:
+    return sum(bool(fm) for _, fm, _ in emit.iter_frontmatter(paths, 1))
+
+
+def pool(emit, paths: list[str], workers: int) -> int:
+    return sum(bool(fm) for _, fm, _ in emit.iter_frontmatter(paths, workers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--body-bytes", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    emit = load_emit()
+
+    print(f"{'entries':>8} {'loader':<7} {'cold s':>9} {'warm s':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = make_tree(Path(tmp), size, args.body_bytes)
+            for name, fn in (
+                ("full", full),
+                ("prefix", prefix),
+                ("pool", pool),
+            ):
+                timings = []
+                for cold in (True, False):
+                    if cold and not evict(paths):
+                        timings.append(float("nan"))
+                        continue
+                    start = time.perf_counter()
+                    loaded = fn(emit, paths, args.workers)
+                    timings.append(time.perf_counter() - start)
+                    assert loaded == size, (name, loaded)
+                print(
+                    f"{size:>8} {name:<7} {timings[0]:>9.3f}"
+                    f" {timings[1]:>9.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
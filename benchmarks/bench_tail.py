@@ -0,0 +1,73 @@
+"""Compare ``acornlog.tail`` with ``readlines`` on growing acornlogs.
+
+Usage: python benchmarks/bench_tail.py [--max-size BYTES] [--count N]
+
+Files are generated once under a temporary directory. ``tail`` latency
+should stay flat from 1 KB to 1 GB while ``readlines`` grows linearly;
+``readlines`` is skipped above 64 MB to keep the run short.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cli import acornlog  # noqa: E402
+
+SIZES = [1 << 10, 1 << 20, 16 << 20, 256 << 20, 1 << 30]
+READLINES_LIMIT = 64 << 20
+
+
+def make_log(path: Path, size: int) -> None:
+    line = "2025-01-01T12:00:00.000000 note about acorns and focus 🐿️\n"
+    block = (line * (65536 // len(line))).encode("utf-8")
+    with path.open("wb") as fh:
+        written = 0
+        while written < size:
+            part = block[: size - written]
+            fh.write(part)
+            written += len(part)
+
+
+def timed(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-size", type=int, default=1 << 30)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'size':>10} {'tail (ms)':>10} {'readlines (ms)':>15}")
+        for size in (s for s in SIZES if s <= args.max_size):
+            path = Path(tmp) / f"acornlog-{size}.txt"
+            make_log(path, size)
+            fast = timed(lambda: acornlog.tail(path, args.count), args.runs)
+            slow = "-"
+            if size <= READLINES_LIMIT:
+
+                def full() -> list[str]:
+                    with path.open("r", encoding="utf-8") as fh:
+                        return fh.readlines()[-args.count :]
+
+                slow = f"{timed(full, 3) * 1000:.2f}"
+            print(f"{size:>10} {fast * 1000:>10.3f} {slow:>15}")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Load-test the webhook ingestion server with signed keep-alive clients.
+
+Usage: python benchmarks/bench_webhook.py [--seconds S] [--connections N]
+                                          [--client-procs P] [--workers LIST]
+
+``--workers 0`` is the single asyncio process, pinned to one CPU where the
+platform allows it. ``--workers 1,2,4`` runs the multi-process pool with a
+durable spool at each size, so the rows show how throughput scales with
+cores. Client processes open N keep-alive connections in total and post
+pre-signed events back to back. Each row reports accepted events/sec,
+``429`` responses, latency percentiles and how many events reached the log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from integrations import webhook, workers  # noqa: E402
+
+SECRET = b"bench-secret"
+
+
+def pin(cpus: set[int]) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus & os.sched_getaffinity(0) or {0})
+
+
+def run_server(log_dir: str, nworkers: int, port, ready, stop) -> None:
+    settings = webhook.Settings(log_dir=Path(log_dir), secret=SECRET)
+    if nworkers:
+        pool = workers.Pool(settings, Path(log_dir) / "q.db", nworkers)
+        pool.start()
+        port.value = pool.port
+        ready.set()
+        stop_thread = threading.Thread(
+            target=lambda: (stop.wait(), setattr(pool, "stopping", True))
+        )
+        stop_thread.start()
+        pool.run()
+        pool.stop()
+        return
+    pin({0})
+
+    async def main() -> None:
+        server = webhook.IngestServer(settings)
+        port.value = await server.start("127.0.0.1", 0, backlog=1024)
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        await server.close()
+
+    asyncio.run(main())
+
+
+def request(tag: str) -> bytes:
+    # Every body is unique: the worker pool drops repeated payloads.
+    body = json.dumps(
+        {
+            "source": "bench",
+            "event": "push",
+            "payload": {"name": f"event {tag}", "commits": 3},
+        }
+    ).encode()
+    return (
+        "POST /hook HTTP/1.1\r\nHost: bench\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"X-Signature: {webhook.sign(SECRET, body)}\r\n\r\n"
+    ).encode() + body
+
+
+async def connection(port: int, until: float, tag: str, out: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    i = 0
+    while time.perf_counter() < until:
+        req = request(f"{tag}-{i}")
+        start = time.perf_counter()
+        writer.write(req)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        out["lat"].append(time.perf_counter() - start)
+        status = int(head.split(b" ", 2)[1])
+        out[status] = out.get(status, 0) + 1
+        i += 1
+    writer.close()
+
+
+def run_clients(port: int, conns: int, seconds: float, cpu: int, q) -> None:
+    pin({cpu})
+    out: dict = {"lat": []}
+
+    async def main() -> None:
+        until = time.perf_counter() + seconds
+        await asyncio.gather(
+            *(connection(port, until, f"{cpu}.{k}", out) for k in range(conns))
+        )
+
+    asyncio.run(main())
+    q.put(out)
+
+
+def bench(nworkers: int, args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        port = multiprocessing.Value("i", 0)
+        ready, stop = multiprocessing.Event(), multiprocessing.Event()
+        server = multiprocessing.Process(
+            target=run_server, args=(tmp, nworkers, port, ready, stop)
+        )
+        server.start()
+        ready.wait()
+        q: multiprocessing.Queue = multiprocessing.Queue()
+        per = max(1, args.connections // args.client_procs)
+        clients = [
+            multiprocessing.Process(
+                target=run_clients,
+                args=(port.value, per, args.seconds, 1 + nworkers + i, q),
+            )
+            for i in range(args.client_procs)
+        ]
+        for c in clients:
+            c.start()
+        results = [q.get() for _ in clients]
+        for c in clients:
+            c.join()
+        stop.set()
+        server.join()
+        with open(Path(tmp) / "acornlog.txt", "rb") as fh:
+            lines = sum(1 for _ in fh)
+
+    lat = sorted(x for r in results for x in r["lat"])
+    accepted = sum(r.get(202, 0) for r in results)
+    busy = sum(r.get(429, 0) for r in results)
+    p50 = statistics.median(lat) * 1000 if lat else 0.0
+    p99 = lat[max(int(len(lat) * 0.99) - 1, 0)] * 1000 if lat else 0.0
+    print(
+        f"{nworkers:>7} {accepted / args.seconds:>12,.0f} {busy:>6}"
+        f" {p50:>8.2f} {p99:>8.2f} {lines:>9}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--client-procs", type=int, default=2)
+    parser.add_argument("--workers", default="0")
+    args = parser.parse_args()
+
+    print(
+        f"{'workers':>7} {'accepted/s':>12} {'429':>6}"
+        f" {'p50 ms':>8} {'p99 ms':>8} {'logged':>9}"
+    )
+    for nworkers in (int(w) for w in args.workers.split(",")):
+        bench(nworkers, args)
+
+
+if __name__ == "__main__":
+    main()
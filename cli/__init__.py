@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime
+from collections import deque
+from datetime import date, datetime
 from pathlib import Path
+import json
 import os
 import shutil
 import subprocess
 import sys
+import time
+from typing import Any
 
-import openai
+import click
 import typer
 
+from . import acornlog
 from . import config as conf
 
 app = typer.Typer(
@@ -28,16 +33,37 @@ def _startup(_: typer.Context) -> None:
 
 load_cfg = conf.load_cfg
 
+
+def __getattr__(name: str) -> Any:
+    # Heavy SDKs are imported on first attribute access so that commands
+    # such as ``drop`` and ``show`` never pay for them.
+    if name == "openai":
+        import openai
+
+        return openai
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 LOG_DIR = Path.home() / ".squirrelfocus"
-LOG_FILE = LOG_DIR / "acornlog.txt"
+LOG_FILE = acornlog.active_log(LOG_DIR)
 _BASE_PATH = Path(__file__).resolve().parents[1]
 PROMPT_FILE = _BASE_PATH / "codex" / "prompts" / "work_item_generator.md"
 PREVIEW_FORMATS = ("summary", "trailers")
 
 
+_PROMPTS: dict[tuple[str, int, int], str] = {}
+
+
 def load_prompt() -> str:
-    """Return the Codex work item prompt."""
-    return PROMPT_FILE.read_text(encoding="utf-8")
+    """Return the Codex work item prompt, cached by mtime and size."""
+    st = PROMPT_FILE.stat()
+    key = (str(PROMPT_FILE), st.st_mtime_ns, st.st_size)
+    text = _PROMPTS.get(key)
+    if text is None:
+        text = PROMPT_FILE.read_text(encoding="utf-8")
+        _PROMPTS.clear()
+        _PROMPTS[key] = text
+    return text
 
 
 def ensure_log_dir() -> None:
@@ -82,7 +108,7 @@ def init(
     data["journals_dir"] = journals_dir
     if conf.HAVE_YAML:
         cfg_dst.write_text(
-            conf.yaml.safe_dump(data, sort_keys=False),
+            conf.get_yaml().safe_dump(data, sort_keys=False),
             encoding="utf-8",
         )
     else:
@@ -170,22 +196,21 @@ def new(
     else:
         body = text
 
-    fm = {"trailers": {}}
-    for key, val in {
+    values = {
         "fix": fix,
         "why": why,
         "change": change,
         "proof": proof,
         "ref": ref,
-    }.items():
-        if val:
-            fm["trailers"][key] = val
+    }
+    trailers = {key: val for key, val in values.items() if val}
+    fm = {"trailers": trailers}
 
     if conf.HAVE_YAML:
-        fm_text = conf.yaml.safe_dump(fm, sort_keys=False)
+        fm_text = conf.get_yaml().safe_dump(fm, sort_keys=False)
     else:
         lines = ["trailers:"]
-        for k, v in fm["trailers"].items():
+        for k, v in trailers.items():
             lines.append(f'  {k}: "{v}"')
         fm_text = "\n".join(lines) + "\n"
 
@@ -211,15 +236,25 @@ def preview(
     if not script.exists():
         typer.echo("No emitter script found.")
         raise typer.Exit(code=1)
-    result = subprocess.run(
-        [sys.executable, str(script), fmt],
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        typer.echo(result.stderr.strip() or "Emitter failed.")
-        raise typer.Exit(code=result.returncode)
-    msg = result.stdout.strip()
+    from . import emit
+
+    if emit.is_stock(script):
+        try:
+            msg = emit.render_latest(fmt, load_cfg(), Path.cwd()).strip()
+        except (OSError, ValueError) as err:
+            typer.echo(f"Emitter failed: {err}")
+            raise typer.Exit(code=1)
+    else:
+        # A customised local emitter may behave differently; run it as is.
+        result = subprocess.run(
+            [sys.executable, str(script), fmt],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            typer.echo(result.stderr.strip() or "Emitter failed.")
+            raise typer.Exit(code=result.returncode)
+        msg = result.stdout.strip()
     if msg:
         typer.echo(msg)
     else:
@@ -274,83 +309,637 @@ def doctor() -> None:
     raise typer.Exit(code=1 if fail else 0)
 
 
+REPORT_FORMATS = ("text", "jsonl")
+
+
+def _parse_date(value: str, name: str) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise typer.BadParameter(f"{name} must be a date (YYYY-MM-DD).")
+
+
 @app.command()
-def report() -> None:
+def report(
+    since: str = typer.Option(
+        "", "--since", help="Earliest entry date (YYYY-MM-DD)."
+    ),
+    until: str = typer.Option(
+        "", "--until", help="Latest entry date (YYYY-MM-DD); default today."
+    ),
+    limit: int = typer.Option(
+        0, "--limit", min=0, help="Stop after this many entries."
+    ),
+    fmt: str = typer.Option(
+        "text",
+        "--format",
+        help=f"Output format: {' or '.join(REPORT_FORMATS)}.",
+    ),
+) -> None:
     """List journal entry paths."""
+    if fmt not in REPORT_FORMATS:
+        raise typer.BadParameter(
+            f"Format must be one of: {' or '.join(REPORT_FORMATS)}."
+        )
+    start = _parse_date(since, "--since")
+    end = _parse_date(until, "--until") or datetime.now().date()
     cfg = load_cfg()
     jdir = Path(cfg.get("journals_dir", "journal_logs"))
-    cutoff = datetime.now()
     if not jdir.exists():
-        typer.echo("No journal entries found.")
+        typer.echo("No journal entries found.", err=fmt == "jsonl")
         raise typer.Exit(code=1)
-    found = False
-    for path in sorted(jdir.glob("**/*.md")):
-        date_str = path.stem[:10]
-        if len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-":
-            continue
-        try:
-            dt = datetime.fromisoformat(date_str)
-        except ValueError:
-            continue
-        if dt < cutoff:
-            typer.echo(str(path))
-            found = True
+    from . import emit
+
+    mod = emit.load()
+    found = 0
+    paths = (path for _, path in mod.iter_dated(str(jdir), start, end))
+    if fmt == "jsonl":
+        # A small --limit is not worth starting a process pool for.
+        workers = 1 if 0 < limit < mod.POOL_MIN else None
+        keys = cfg.get("trailer_keys", [])
+        for entry in mod.load_entries(paths, workers, keys):
+            rec = {
+                "path": str(Path(entry.path)),
+                "date": str(entry.date),
+                "trailers": entry.trailers,
+            }
+            typer.echo(json.dumps(rec, default=str))
+            found += 1
+            if found == limit:
+                break
+    else:
+        for path in paths:
+            typer.echo(str(Path(path)))
+            found += 1
+            if found == limit:
+                break
     if not found:
-        typer.echo("No journal entries found.")
+        typer.echo("No journal entries found.", err=fmt == "jsonl")
         raise typer.Exit(code=1)
 
 
 @app.command()
-def drop(text: str) -> None:
+def search(
+    query: str = typer.Argument(
+        ..., help="Words to find; use fix:, ref: etc. for trailer fields."
+    ),
+    since: str = typer.Option(
+        "", "--since", help="Earliest entry date (YYYY-MM-DD)."
+    ),
+    until: str = typer.Option(
+        "", "--until", help="Latest entry date (YYYY-MM-DD)."
+    ),
+    limit: int = typer.Option(20, "--limit", min=1, help="Maximum hits."),
+) -> None:
+    """Search the acornlog and journal entries, best matches first."""
+    from . import fts
+
+    start = _parse_date(since, "--since")
+    end = _parse_date(until, "--until")
+    conn = _search_db(load_cfg())
+    try:
+        hits = fts.query(conn, query, start, end, limit)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc), param_hint="QUERY")
+    finally:
+        conn.close()
+    if not hits:
+        typer.echo("No matches found.")
+        raise typer.Exit(code=1)
+    for hit in hits:
+        where = (
+            "acornlog" if hit.kind == "log" else os.path.relpath(hit.source)
+        )
+        snippet = " ".join(hit.snippet.split())
+        typer.echo(f"{hit.day or '-':10}  {where}  {snippet}")
+
+
+def _search_db(cfg: dict[str, Any]) -> Any:
+    """Open this project's search index and bring it up to date."""
+    from . import emit, fts
+
+    ensure_log_dir()
+    jdir = Path(cfg.get("journals_dir", "journal_logs"))
+    keys = cfg.get("trailer_keys", fts.FIELDS)
+    conn = fts.open_db(fts.index_path(LOG_DIR, jdir), keys)
+    try:
+        with conn:
+            fts.refresh_log(conn, LOG_FILE)
+            fts.refresh_journals(conn, jdir, emit.load())
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+@app.command()
+def drop(
+    text: str = typer.Argument("", help="Note to append."),
+    stdin: bool = typer.Option(
+        False, "--stdin", help="Append one entry per input line."
+    ),
+    fsync: bool = typer.Option(
+        False, "--fsync", help="Flush the log to disk before returning."
+    ),
+    via_daemon: bool = typer.Option(
+        False, "--via-daemon", help="Send entries to a running sf daemon."
+    ),
+) -> None:
     """Append TEXT with a timestamp to ~/.squirrelfocus/acornlog.txt."""
+    if not stdin and not text:
+        raise click.MissingParameter(
+            param_hint="'TEXT'", param_type="argument"
+        )
+    if stdin and text:
+        raise typer.BadParameter("TEXT cannot be combined with --stdin.")
+    if stdin:
+        entries = [
+            acornlog.Record(datetime.now().isoformat(), line.rstrip("\r\n"))
+            for line in sys.stdin
+            if line.strip()
+        ]
+    else:
+        entries = [acornlog.Record(datetime.now().isoformat(), text)]
+    if via_daemon and entries:
+        from . import daemon
+
+        try:
+            daemon.send(daemon.socket_path(LOG_DIR), entries, fsync=fsync)
+            return
+        except OSError:
+            pass  # no daemon running: write directly below
+        except daemon.DaemonError as exc:
+            typer.echo(f"Daemon failed: {exc}", err=True)
+            raise typer.Exit(code=1)
     ensure_log_dir()
-    timestamp = datetime.now().isoformat()
-    with LOG_FILE.open("a", encoding="utf-8") as fh:
-        fh.write(f"{timestamp} {text}\n")
+    if entries:
+        acornlog.append(LOG_FILE, entries, fsync=fsync)
+
+
+@app.command("daemon")
+def run_daemon(
+    sock: Path | None = typer.Option(
+        None,
+        "--socket",
+        help="Socket path (default $SF_SOCKET or ~/.squirrelfocus/sf.sock).",
+    )
+) -> None:
+    """Serve `sf drop --via-daemon` requests on a Unix socket."""
+    import signal
+
+    from . import daemon
+
+    path = sock or daemon.socket_path(LOG_DIR)
+    try:
+        server = daemon.Server(path, LOG_DIR)
+    except daemon.DaemonError as exc:
+        typer.echo(str(exc))
+        raise typer.Exit(code=1)
+
+    def stop(*_: Any) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    typer.echo(f"Listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    c = server.committer
+    typer.echo(f"Wrote {c.entries} entries in {c.commits} commits.")
+
+
+def _parse_time(value: str, name: str, end: bool = False) -> datetime | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise typer.BadParameter(f"{name} must be an ISO date or time.")
+    if end and len(value) == 10:
+        # A date-only bound covers the whole day.
+        moment = moment.replace(
+            hour=23, minute=59, second=59, microsecond=999999
+        )
+    return moment
 
 
 @app.command()
 def show(
     count: int = typer.Argument(
         5, min=1, help="Number of log lines to display"
-    )
+    ),
+    since: str = typer.Option(
+        "", "--since", help="Earliest entry time (ISO date or time)."
+    ),
+    until: str = typer.Option(
+        "", "--until", help="Latest entry time (ISO date or time)."
+    ),
 ) -> None:
     """Print the last COUNT lines from ~/.squirrelfocus/acornlog.txt."""
     ensure_log_dir()
-    if not LOG_FILE.exists():
+    start = _parse_time(since, "--since")
+    end = _parse_time(until, "--until", end=True)
+    if not LOG_FILE.exists() and not acornlog.segments(LOG_DIR):
         typer.echo("No log entries found.")
         raise typer.Exit()
 
-    with LOG_FILE.open("r", encoding="utf-8") as fh:
-        lines = fh.readlines()
+    if start is None and end is None:
+        records = acornlog.tail_all(LOG_FILE, count)
+    else:
+        window = acornlog.range_all(LOG_FILE, start, end)
+        records = list(deque(window, maxlen=count))
+    for rec in records:
+        typer.echo(acornlog.format_record(rec).rstrip())
+
 
-    for line in lines[-count:]:
-        typer.echo(line.rstrip())
+@app.command("migrate-log")
+def migrate_log(
+    force: bool = typer.Option(
+        False, "--force", help="Replace an existing acornlog.jsonl."
+    )
+) -> None:
+    """Convert acornlog.txt into the structured acornlog.jsonl format."""
+    src = LOG_DIR / acornlog.TEXT_NAME
+    dst = LOG_DIR / acornlog.JSONL_NAME
+    if not src.exists():
+        typer.echo(f"No {acornlog.TEXT_NAME} to migrate.")
+        raise typer.Exit(code=1)
+    if dst.exists() and not force:
+        typer.echo(f"{dst} already exists. Use --force to replace it.")
+        raise typer.Exit(code=1)
+    count = acornlog.migrate(src, dst)
+    typer.echo(f"Migrated {count} entries to {dst}.")
+    typer.echo(f"{src} was left in place; new entries go to {dst.name}.")
+
+
+@app.command("rotate-log")
+def rotate_log(
+    max_bytes: int | None = typer.Option(
+        None,
+        "--max-bytes",
+        min=0,
+        help="Start a new segment before the log passes this size; 0 is off.",
+    ),
+    monthly: bool | None = typer.Option(
+        None,
+        "--monthly/--no-monthly",
+        help="Start a new segment when the calendar month changes.",
+    ),
+    compress: str | None = typer.Option(
+        None,
+        "--compress",
+        help=f"Segment compression: {' or '.join(acornlog.CODECS)}.",
+    ),
+    now: bool = typer.Option(
+        False, "--now", help="Move the current log into a segment now."
+    ),
+) -> None:
+    """Configure acornlog rotation and list the archived segments."""
+    if compress is not None and not acornlog.codec_available(compress):
+        raise typer.BadParameter(
+            f"Compression must be an available one of:"
+            f" {' or '.join(acornlog.CODECS)}."
+        )
+    ensure_log_dir()
+    policy = acornlog.read_policy(LOG_DIR)
+    changes = {
+        "max_bytes": max_bytes,
+        "monthly": monthly,
+        "compress": compress,
+    }
+    changes = {key: val for key, val in changes.items() if val is not None}
+    if changes:
+        policy = policy._replace(**changes)
+        acornlog.configure(LOG_FILE, policy)
+    if now:
+        seg = acornlog.rotate(LOG_FILE)
+        if seg is None:
+            typer.echo("The log is empty; nothing to rotate.")
+        else:
+            typer.echo(f"Moved {seg.records} entries to {seg.path.name}.")
+    rules = [f"over {policy.max_bytes} bytes"] if policy.max_bytes else []
+    rules += ["monthly"] if policy.monthly else []
+    typer.echo(
+        f"Rotation: {' and '.join(rules) or 'off'};"
+        f" compression: {policy.compress}."
+    )
+    for seg in acornlog.segments(LOG_DIR):
+        typer.echo(
+            f"{seg.path.name}  {seg.first or '?'} .. {seg.last or '?'}"
+            f"  ({seg.records} entries)"
+        )
 
 
 @app.command()
-def ask(question: str) -> None:
+def ask(
+    question: str = typer.Argument("", help="Question to turn into a task."),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Neither read nor write the cache."
+    ),
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Ignore a cached answer and store a new one."
+    ),
+    batch: Path | None = typer.Option(
+        None,
+        "--batch",
+        help="Answer every question in FILE (JSONL or one per line; - for"
+        " stdin) and print JSONL results in input order.",
+    ),
+    concurrency: int | None = typer.Option(
+        None,
+        "--concurrency",
+        min=1,
+        help="Parallel requests for --batch (default: ask_concurrency).",
+    ),
+    stream: bool = typer.Option(
+        False, "--stream", help="Print the answer as tokens arrive."
+    ),
+    timings: bool = typer.Option(
+        False,
+        "--timings",
+        help="Report time to first token and total latency on stderr.",
+    ),
+    base_url: str = typer.Option(
+        "",
+        "--base-url",
+        envvar="OPENAI_BASE_URL",
+        help="OpenAI-compatible API endpoint (default: ask_base_url).",
+    ),
+    with_context: bool = typer.Option(
+        False,
+        "--with-context",
+        help="Add related journal entries and acornlog notes, up to"
+        " ask_context_tokens, and report token and cache stats.",
+    ),
+) -> None:
     """Send QUESTION to Codex and print the work item."""
+    cfg = load_cfg()
+    if base_url:
+        cfg["ask_base_url"] = base_url
+    if batch is not None:
+        if question:
+            raise typer.BadParameter(
+                "QUESTION cannot be combined with --batch."
+            )
+        workers = concurrency or cfg["ask_concurrency"]
+        _ask_batch(cfg, batch, workers, no_cache, refresh, with_context)
+        return
+    if not question:
+        raise click.MissingParameter(
+            param_hint="'QUESTION'", param_type="argument"
+        )
+    prompt = load_prompt()
+    packed = _ask_context(cfg, [question])[question] if with_context else None
+    ctx = packed.text if packed else ""
+    cache = None if no_cache else _ask_cache(cfg)
+    key = _ask_key(cfg, prompt, question, ctx)
+    start = time.perf_counter()
+    try:
+        hit = None if cache is None or refresh else cache.get(key)
+        if hit is not None:
+            typer.echo(hit)
+            if timings:
+                _echo_timings(start, None, cached=True)
+            if packed is not None:
+                _echo_stats(packed, None, cached=True)
+            return
+        backend = _ask_backend(cfg)
+        first = None
+        try:
+            if stream:
+                item, first = _stream_answer(backend, prompt, question, ctx)
+            else:
+                item = backend.complete(prompt, question, ctx)
+                typer.echo(item)
+        except KeyboardInterrupt:
+            typer.echo("\nInterrupted.", err=True)
+            raise typer.Exit(code=130)
+        except Exception as exc:  # pragma: no cover - network issues
+            typer.echo(f"OpenAI error: {exc}")
+            raise typer.Exit(code=1)
+        if timings:
+            _echo_timings(start, first)
+        if packed is not None:
+            _echo_stats(packed, backend.usage, cached=False)
+        if cache is not None and backend.cacheable:
+            cache.put(key, backend.model, item)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _echo_timings(
+    start: float, first: float | None, cached: bool = False
+) -> None:
+    total = (time.perf_counter() - start) * 1000
+    ttft = total if first is None else (first - start) * 1000
+    note = ", cached" if cached else ""
+    typer.echo(f"ttft {ttft:.0f} ms, total {total:.0f} ms{note}", err=True)
+
+
+def _echo_stats(packed: Any, usage: Any, cached: bool) -> None:
+    parts = [
+        f"context {packed.notes}/{packed.considered} notes,"
+        f" ~{packed.tokens} tokens"
+    ]
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        reused = getattr(details, "cached_tokens", None) or 0
+        parts.append(
+            f"prompt {usage.prompt_tokens} tokens ({reused} cached),"
+            f" completion {usage.completion_tokens}"
+        )
+    parts.append(f"response cache {'hit' if cached else 'miss'}")
+    typer.echo("; ".join(parts), err=True)
+
+
+def _ask_context(cfg: dict[str, Any], questions: list[str]) -> dict[str, Any]:
+    """Pack notes related to each of QUESTIONS into the token budget.
+
+    Notes come from this project's index only: its journals and the log.
+    """
+    from . import context, fts
+
+    conn = _search_db(cfg)
+    try:
+        return {
+            q: context.pack(fts.related(conn, q), cfg["ask_context_tokens"])
+            for q in dict.fromkeys(questions)
+        }
+    finally:
+        conn.close()
+
+
+def _ask_cache(cfg: dict[str, Any]) -> Any:
+    from . import askcache
+
+    if cfg["ask_backend"] == "template":
+        return None  # answers are instant and follow the journals
+    return askcache.ResponseCache(
+        LOG_DIR / "ask-cache.db",
+        ttl=cfg["ask_cache_ttl"],
+        max_bytes=cfg["ask_cache_max_bytes"],
+    )
+
+
+def _ask_key(
+    cfg: dict[str, Any], prompt: str, question: str, context: str = ""
+) -> str:
+    from . import askcache
+
+    return askcache.cache_key(
+        cfg["ask_model"],
+        prompt,
+        question,
+        context,
+        cfg["ask_base_url"],
+        cfg["ask_max_tokens"],
+    )
+
+
+def _ask_backend(cfg: dict[str, Any], **options: Any) -> Any:
+    """Return the backend selected by the ``ask_backend`` key."""
+    from . import backends
+
+    if cfg["ask_backend"] == "template":
+        return backends.TemplateBackend.from_journals(
+            cfg["journals_dir"], cfg["trailer_keys"], os.getcwd()
+        )
+    if cfg["ask_timeout"]:
+        options["timeout"] = float(cfg["ask_timeout"])
+    client = _openai_client(cfg["ask_base_url"], **options)
+    return backends.OpenAIBackend(
+        client, cfg["ask_model"], cfg["ask_max_tokens"]
+    )
+
+
+def _openai_client(base_url: str = "", **options: Any) -> Any:
+    import openai
+
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         typer.echo("OPENAI_API_KEY not set")
         raise typer.Exit(code=1)
-    client = openai.OpenAI(api_key=api_key)
-    prompt = load_prompt()
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": question},
-    ]
+    if base_url:
+        options["base_url"] = base_url
+    return openai.OpenAI(api_key=api_key, **options)
+
+
+def _stream_answer(
+    backend: Any, prompt: str, question: str, context: str = ""
+) -> tuple[str, float | None]:
+    """Echo a streamed answer; return it and the first token's time."""
+    from contextlib import closing
+
+    first = None
+    parts = []
+    with closing(backend.stream(prompt, question, context)) as pieces:
+        for piece in pieces:
+            if first is None:
+                first = time.perf_counter()
+            parts.append(piece)
+            typer.echo(piece, nl=False)
+    typer.echo()
+    return "".join(parts).strip(), first
+
+
+def _read_batch(path: Path) -> list[dict[str, Any]]:
     try:
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
+        fh = sys.stdin if str(path) == "-" else path.open(encoding="utf-8")
+    except OSError as exc:
+        raise typer.BadParameter(
+            f"cannot read {path}: {exc.strerror or exc}", param_hint="--batch"
+        )
+    items = []
+    with fh:
+        for n, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                items.append({"question": line})
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if not isinstance(obj, dict) or not isinstance(
+                obj.get("question"), str
+            ):
+                raise typer.BadParameter(
+                    f"line {n}: expected an object with a 'question' string.",
+                    param_hint="--batch",
+                )
+            items.append(obj)
+    return items
+
+
+def _ask_batch(
+    cfg: dict[str, Any],
+    path: Path,
+    concurrency: int,
+    no_cache: bool,
+    refresh: bool,
+    with_context: bool = False,
+) -> None:
+    from . import llm
+
+    items = _read_batch(path)
+    prompt = load_prompt()
+    questions = [item["question"] for item in items]
+    packed = _ask_context(cfg, questions) if with_context else {}
+    ctx = {q: p.text for q, p in packed.items()}
+    cache = None if no_cache else _ask_cache(cfg)
+    hits: dict[str, str] = {}
+    if cache is not None and not refresh:
+        for q in dict.fromkeys(questions):
+            key = _ask_key(cfg, prompt, q, ctx.get(q, ""))
+            if hit := cache.get(key):
+                hits[q] = hit
+    backend = None
+    if len(hits) < len(set(questions)):
+        # One client for the whole batch shares its connection pool. Its
+        # own retries are off so that backoff is handled in one place.
+        backend = _ask_backend(cfg, max_retries=0)
+
+    @llm.dedupe
+    def answer(q: str) -> str:
+        if q in hits:
+            return hits[q]
+        return llm.with_retries(
+            lambda: backend.complete(prompt, q, ctx.get(q, ""))
         )
-    except Exception as exc:  # pragma: no cover - network issues
-        typer.echo(f"OpenAI error: {exc}")
+
+    failed = 0
+    try:
+        for item, fut in llm.ordered_map(
+            lambda it: answer(it["question"]), items, concurrency
+        ):
+            out = dict(item)
+            q = item["question"]
+            if q in packed:
+                out["context_tokens"] = packed[q].tokens
+            exc = fut.exception()
+            if exc is None:
+                out["answer"] = fut.result()
+                if cache is not None and q not in hits:
+                    key = _ask_key(cfg, prompt, q, ctx.get(q, ""))
+                    cache.put(key, backend.model, out["answer"])
+                    hits[q] = out["answer"]
+            else:
+                out["error"] = str(exc)
+                failed += 1
+            typer.echo(json.dumps(out))
+    finally:
+        if cache is not None:
+            cache.close()
+    if failed:
         raise typer.Exit(code=1)
-    item = resp.choices[0].message.content.strip()
-    typer.echo(item)
 
 
 @app.command()
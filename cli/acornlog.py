@@ -0,0 +1,617 @@
+from __future__ import annotations
+
+import bisect
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import importlib
+from itertools import islice
+import json
+import os
+from pathlib import Path
+import re
+import struct
+from typing import Any, BinaryIO, Iterator, NamedTuple, cast
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+BLOCK_SIZE = 8 * 1024
+
+
+def tail(path: Path, count: int, block_size: int = BLOCK_SIZE) -> list[str]:
+    """Return the last COUNT lines of PATH.
+
+    The file is read backwards from EOF in BLOCK_SIZE chunks, so the cost
+    depends on COUNT and line length rather than on the file size.
+    """
+    if count <= 0:
+        return []
+    chunks: list[bytes] = []
+    newlines = 0
+    with path.open("rb") as fh:
+        pos = fh.seek(0, os.SEEK_END)
+        # One extra newline is needed: either the file ends with one, or
+        # the oldest chunk starts mid-line and that fragment is dropped.
+        while pos > 0 and newlines <= count:
+            step = min(block_size, pos)
+            pos -= step
+            fh.seek(pos)
+            chunk = fh.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    # Splitting on b"\n" never cuts a UTF-8 sequence in half, so decoding
+    # is done only after the chunks are joined.
+    lines = b"".join(reversed(chunks)).split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    if pos > 0:
+        lines = lines[1:]
+    return [
+        ln.decode("utf-8", errors="replace").rstrip("\r")
+        for ln in lines[-count:]
+    ]
+
+
+# Structured log -----------------------------------------------------------
+#
+# ``acornlog.jsonl`` holds one JSON object per line: ``{"ts": ..., "text":
+# ...}``. Newlines inside TEXT are escaped, so a record is always exactly
+# one line and ``tail`` works unchanged. The sidecar ``acornlog.jsonl.idx``
+# is a flat array of IDX_ENTRY structs (record number, byte offset, epoch
+# seconds) written for every INDEX_EVERY-th record. Timestamps need not
+# arrive in order (clients and webhooks supply their own), so the epoch is
+# the newest one in the log up to and including that record. That keeps
+# the array sorted: time-range reads bisect it and seek straight to the
+# last checkpoint with nothing newer than SINCE before it.
+
+TEXT_NAME = "acornlog.txt"
+JSONL_NAME = "acornlog.jsonl"
+INDEX_EVERY = 128
+IDX_ENTRY = struct.Struct("<QQd")
+
+
+class Record(NamedTuple):
+    ts: str | None
+    text: str
+
+
+def active_log(log_dir: Path) -> Path:
+    """Return the structured log in LOG_DIR if present, else the text log."""
+    structured = log_dir / JSONL_NAME
+    return structured if structured.exists() else log_dir / TEXT_NAME
+
+
+def is_structured(path: Path) -> bool:
+    """Return True when PATH uses the JSONL record format."""
+    name = str(path)
+    if name.endswith((".gz", ".zst")):
+        name = name.rsplit(".", 1)[0]
+    return name.endswith(".jsonl")
+
+
+def index_path(path: Path) -> Path:
+    """Return the sidecar offset index for PATH."""
+    return path.with_name(path.name + ".idx")
+
+
+def parse_text(line: str) -> Record:
+    """Split a legacy ``"{timestamp} {text}"`` line into a Record.
+
+    Lines that do not start with an ISO timestamp keep their full text and
+    get ``ts=None``, so ``format_record`` reproduces them exactly.
+    """
+    ts, sep, text = line.partition(" ")
+    if sep and _epoch(ts) is not None:
+        return Record(ts, text)
+    return Record(None, line)
+
+
+def parse_line(line: str, structured: bool) -> Record:
+    """Decode one log line in either format."""
+    if not structured:
+        return parse_text(line)
+    try:
+        obj = json.loads(line)
+        return Record(obj.get("ts"), str(obj["text"]))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return Record(None, line)
+
+
+def format_record(rec: Record) -> str:
+    """Return REC in the legacy single-line text form."""
+    return rec.text if rec.ts is None else f"{rec.ts} {rec.text}"
+
+
+def encode(rec: Record, structured: bool) -> bytes:
+    """Return REC as one newline-terminated line for the given format."""
+    if structured:
+        line = json.dumps({"ts": rec.ts, "text": rec.text})
+    else:
+        line = format_record(rec)
+    return (line + "\n").encode("utf-8", errors="surrogateescape")
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="surrogateescape")
+
+
+def _epoch(ts: str | None) -> float | None:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def append(
+    path: Path,
+    records: list[Record],
+    fsync: bool = False,
+    rotate: bool = True,
+) -> None:
+    """Append RECORDS to PATH and maintain its offset index.
+
+    All records go out in one write under an exclusive ``flock`` on the
+    log, so concurrent writers never interleave partial lines and the
+    index checkpoints stay in step with the record count. FSYNC flushes
+    the log to disk once for the whole batch. Locking is skipped where
+    ``fcntl`` is unavailable. ROTATE=False ignores the rotation policy.
+    """
+    with path.open("ab") as fh:
+        append_to(fh, path, records, fsync, rotate)
+
+
+def append_to(
+    fh: BinaryIO,
+    path: Path,
+    records: list[Record],
+    fsync: bool = False,
+    rotate: bool = True,
+) -> None:
+    """Like ``append`` but write through FH, an open ``"ab"`` handle.
+
+    When a rotation policy is set and this write is due to start a new
+    segment, the log is rotated first, under the same lock.
+    """
+    structured = is_structured(path)
+    lines = [encode(rec, structured) for rec in records]
+    with _locked(fh):
+        start = fh.seek(0, os.SEEK_END)
+        if start and records and rotate:
+            policy = read_policy(path.parent)
+            size = sum(map(len, lines))
+            if _due(path, start, size, records[0].ts, policy):
+                _rotate(fh, path, policy)
+                start = 0
+        _write_all(fh.fileno(), b"".join(lines))
+        if structured:
+            _checkpoint(path, start, records, lines)
+        if fsync:
+            os.fsync(fh.fileno())
+
+
+@contextmanager
+def _locked(fh: BinaryIO) -> Iterator[None]:
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def read_index(path: Path) -> list[tuple[int, int, float]]:
+    """Return the checkpoints of PATH, or [] when it has no index."""
+    try:
+        data = index_path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % IDX_ENTRY.size
+    return list(IDX_ENTRY.iter_unpack(data[:usable]))
+
+
+def _last_checkpoint(idx: Path) -> tuple[int, int, float | None]:
+    try:
+        with idx.open("rb") as fh:
+            end = fh.seek(0, os.SEEK_END)
+            end -= end % IDX_ENTRY.size
+            if end == 0:
+                return 0, 0, None
+            fh.seek(end - IDX_ENTRY.size)
+            number, offset, high = IDX_ENTRY.unpack(fh.read(IDX_ENTRY.size))
+            return number, offset, high
+    except FileNotFoundError:
+        return 0, 0, None
+
+
+def _newest(high: float | None, epoch: float | None) -> float | None:
+    if high is None or epoch is None:
+        return epoch if high is None else high
+    return max(high, epoch)
+
+
+def _checkpoint(
+    path: Path, start: int, records: list[Record], lines: list[bytes]
+) -> None:
+    # Records since the last checkpoint are counted from the log itself, so
+    # a crash between the log write and the index write only delays the
+    # next checkpoint instead of skewing every later one.
+    idx = index_path(path)
+    number, offset, high = _last_checkpoint(idx)
+    with path.open("rb") as fh:
+        fh.seek(offset)
+        gap = fh.read(start - offset)
+    number += gap.count(b"\n")
+    if (number - 1) // INDEX_EVERY == (
+        number + len(records) - 1
+    ) // INDEX_EVERY:
+        return  # no checkpoint falls in this batch
+    # The records since the last checkpoint are only parsed when a new
+    # checkpoint needs their newest timestamp.
+    for raw in gap.splitlines():
+        high = _newest(high, _epoch(parse_line(_decode(raw), True).ts))
+    entries = []
+    for rec, line in zip(records, lines):
+        high = _newest(high, _epoch(rec.ts))
+        if number % INDEX_EVERY == 0 and number and high is not None:
+            entries.append(IDX_ENTRY.pack(number, start, high))
+        number += 1
+        start += len(line)
+    if entries:
+        with idx.open("ab") as fh:
+            fh.write(b"".join(entries))
+
+
+def iter_records(path: Path, offset: int = 0) -> Iterator[Record]:
+    """Yield every record of PATH, in either format, from byte OFFSET.
+
+    PATH may also be a compressed segment.
+    """
+    structured = is_structured(path)
+    with _open(path) as fh:
+        if offset:
+            fh.seek(offset)
+        for raw in fh:
+            yield parse_line(_decode(raw.rstrip(b"\n")), structured)
+
+
+def tail_records(path: Path, count: int) -> list[Record]:
+    """Return the last COUNT records of PATH."""
+    structured = is_structured(path)
+    return [parse_line(line, structured) for line in tail(path, count)]
+
+
+def read_range(
+    path: Path, since: datetime | None, until: datetime | None
+) -> Iterator[Record]:
+    """Yield records of PATH with SINCE <= ts <= UNTIL.
+
+    Records without a timestamp are skipped. Timestamps may be out of
+    order, so the rest of the file is always scanned; the structured
+    format first seeks past every checkpoint whose records are all older
+    than SINCE.
+    """
+    lo = since.timestamp() if since else None
+    hi = until.timestamp() if until else None
+    offset = 0
+    structured = is_structured(path)
+    if structured and lo is not None:
+        points = read_index(path)
+        pos = bisect.bisect_left([p[2] for p in points], lo)
+        if pos:
+            offset = points[pos - 1][1]
+    for rec in iter_records(path, offset):
+        epoch = _epoch(rec.ts)
+        if epoch is None or (lo is not None and epoch < lo):
+            continue
+        if hi is not None and epoch > hi:
+            continue
+        yield rec
+
+
+def migrate(src: Path, dst: Path) -> int:
+    """Convert text log SRC into structured log DST; return record count.
+
+    The conversion is lossless: exporting DST with ``format_record`` gives
+    back the lines of SRC byte for byte, invalid UTF-8 and CRLF endings
+    included; only a missing final newline is added. DST and its index are
+    written under temporary names and renamed into place. The temporary
+    file is never rotated, so all of SRC ends up in DST.
+    """
+    tmp = dst.with_name(f"{dst.stem}.tmp{dst.suffix}")
+    tmp_idx = index_path(tmp)
+    for leftover in (tmp, tmp_idx):
+        leftover.unlink(missing_ok=True)
+    count = 0
+    batch: list[Record] = []
+    for rec in iter_records(src):
+        batch.append(rec)
+        if len(batch) == INDEX_EVERY:
+            append(tmp, batch, rotate=False)
+            count += len(batch)
+            batch = []
+    append(tmp, batch, rotate=False)
+    count += len(batch)
+    if tmp_idx.exists():
+        os.replace(tmp_idx, index_path(dst))
+    else:
+        index_path(dst).unlink(missing_ok=True)
+    os.replace(tmp, dst)
+    return count
+
+
+# Rotation -----------------------------------------------------------------
+#
+# With a policy saved by ``sf rotate-log``, ``append_to`` moves the active
+# log into a numbered segment such as ``acornlog.00001.jsonl.gz`` before a
+# write that would take it past ``max_bytes`` or into a new calendar
+# month. The active file is truncated in place rather than renamed, so a
+# writer holding it open (the daemon) keeps appending to the live log.
+# Segments never change afterwards. ``acornlog.manifest.json`` holds the
+# policy and each segment's record count and time range; readers use the
+# ranges to skip segments a query cannot match.
+
+MANIFEST_NAME = "acornlog.manifest.json"
+MANIFEST_VERSION = 1
+CODECS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+_SEGMENT_RE = re.compile(r"acornlog\.(\d+)\.(?:jsonl|txt)(?:\.gz|\.zst)?")
+
+
+class Policy(NamedTuple):
+    max_bytes: int = 0
+    monthly: bool = False
+    compress: str = "none"
+
+
+class Segment(NamedTuple):
+    path: Path
+    first: str | None
+    last: str | None
+    records: int
+
+
+def _zstd() -> Any:
+    # compression.zstd ships with Python 3.14; zstandard is the package
+    # for older interpreters. Both provide ``open``.
+    for name in ("compression.zstd", "zstandard"):
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    raise RuntimeError("zstd needs Python 3.14+ or the zstandard package")
+
+
+def codec_available(name: str) -> bool:
+    """Return True when compression codec NAME can be used here."""
+    if name == "zstd":
+        try:
+            _zstd()
+        except RuntimeError:
+            return False
+    return name in CODECS
+
+
+def _open(path: Path, mode: str = "rb", codec: str | None = None) -> BinaryIO:
+    if codec is None:
+        codec = {".gz": "gzip", ".zst": "zstd"}.get(path.suffix, "none")
+    if codec == "gzip":
+        import gzip
+
+        return cast(BinaryIO, gzip.open(path, mode))
+    if codec == "zstd":
+        return cast(BinaryIO, _zstd().open(path, mode))
+    return cast(BinaryIO, path.open(mode))
+
+
+def manifest_path(log_dir: Path) -> Path:
+    """Return the segment manifest for the log in LOG_DIR."""
+    return log_dir / MANIFEST_NAME
+
+
+def _load_manifest(log_dir: Path) -> tuple[Policy, list[Segment]]:
+    try:
+        blob = json.loads(manifest_path(log_dir).read_text(encoding="utf-8"))
+        if blob.get("version") != MANIFEST_VERSION:
+            return Policy(), []
+        policy = Policy(**blob.get("policy", {}))
+        if policy.compress not in CODECS:
+            policy = policy._replace(compress="none")
+        listed = [
+            Segment(log_dir / s["name"], s["first"], s["last"], s["records"])
+            for s in blob.get("segments", [])
+        ]
+    except FileNotFoundError:
+        return Policy(), []
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return Policy(), []
+    return policy, listed
+
+
+def _write_manifest(
+    log_dir: Path, policy: Policy, segs: list[Segment]
+) -> None:
+    blob = {
+        "version": MANIFEST_VERSION,
+        "policy": policy._asdict(),
+        "segments": [
+            {
+                "name": seg.path.name,
+                "first": seg.first,
+                "last": seg.last,
+                "records": seg.records,
+            }
+            for seg in segs
+        ],
+    }
+    path = manifest_path(log_dir)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(blob, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+_POLICY: dict[Path, tuple[tuple[int, int, int], Policy]] = {}
+
+
+def read_policy(log_dir: Path) -> Policy:
+    """Return the rotation policy for the log in LOG_DIR.
+
+    The parsed manifest is kept per process until the file changes, so
+    appends only pay for a ``stat``.
+    """
+    try:
+        st = manifest_path(log_dir).stat()
+    except FileNotFoundError:
+        return Policy()
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    hit = _POLICY.get(log_dir)
+    if hit is None or hit[0] != key:
+        hit = (key, _load_manifest(log_dir)[0])
+        _POLICY[log_dir] = hit
+    return hit[1]
+
+
+def segment_number(path: Path) -> int:
+    """Return the sequence number in segment file name PATH, or 0."""
+    m = _SEGMENT_RE.fullmatch(path.name)
+    return int(m.group(1)) if m else 0
+
+
+def segments(log_dir: Path) -> list[Segment]:
+    """Return the segments of the log in LOG_DIR, oldest first.
+
+    Segment files missing from the manifest, left by a rotation that was
+    interrupted before the manifest was written, are included with an
+    unknown time range so readers never skip them.
+    """
+    try:
+        names = [n for n in os.listdir(log_dir) if _SEGMENT_RE.fullmatch(n)]
+    except FileNotFoundError:
+        return []
+    found = {seg.path.name: seg for seg in _load_manifest(log_dir)[1]}
+    segs = [
+        found.get(name) or Segment(log_dir / name, None, None, 0)
+        for name in names
+    ]
+    return sorted(segs, key=lambda seg: segment_number(seg.path))
+
+
+def _month(ts: str | None) -> tuple[int, int] | None:
+    if not ts:
+        return None
+    try:
+        moment = datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+    return moment.year, moment.month
+
+
+def _first_ts(path: Path) -> str | None:
+    for rec in islice(iter_records(path), 64):
+        if _epoch(rec.ts) is not None:
+            return rec.ts
+    return None
+
+
+def _due(path: Path, size: int, extra: int, ts: str | None, p: Policy) -> bool:
+    if p.max_bytes and size + extra > p.max_bytes:
+        return True
+    if p.monthly:
+        new = _month(ts)
+        return new is not None and _month(_first_ts(path)) not in (None, new)
+    return False
+
+
+def _rotate(fh: BinaryIO, path: Path, policy: Policy) -> Segment | None:
+    # The caller holds the lock on FH, the log at PATH opened for append.
+    size = fh.seek(0, os.SEEK_END)
+    if not size:
+        return None
+    log_dir = path.parent
+    segs = segments(log_dir)
+    seq = max((segment_number(seg.path) for seg in segs), default=0) + 1
+    name = f"{path.stem}.{seq:05d}{path.suffix}{CODECS[policy.compress]}"
+    dst = log_dir / name
+    tmp = log_dir / f".{name}.tmp"
+    structured = is_structured(path)
+    lo: tuple[float, str] | None = None
+    hi: tuple[float, str] | None = None
+    count = 0
+    with path.open("rb") as src, _open(tmp, "wb", policy.compress) as out:
+        for raw in src:
+            out.write(raw)
+            count += 1
+            rec = parse_line(_decode(raw.rstrip(b"\n")), structured)
+            epoch = _epoch(rec.ts)
+            if epoch is not None and rec.ts is not None:
+                lo = min(lo, (epoch, rec.ts)) if lo else (epoch, rec.ts)
+                hi = max(hi, (epoch, rec.ts)) if hi else (epoch, rec.ts)
+    with tmp.open("rb") as done:
+        os.fsync(done.fileno())
+    os.replace(tmp, dst)
+    # A crash from here until the truncate leaves these records in both
+    # the segment and the live log; after it, only the manifest entry is
+    # missing and ``segments`` still finds the file.
+    index_path(path).unlink(missing_ok=True)
+    os.ftruncate(fh.fileno(), 0)
+    seg = Segment(dst, lo[1] if lo else None, hi[1] if hi else None, count)
+    _write_manifest(log_dir, policy, [*segs, seg])
+    return seg
+
+
+def configure(path: Path, policy: Policy) -> None:
+    """Save POLICY as the rotation policy of the log at PATH."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab") as fh, _locked(fh):
+        _write_manifest(path.parent, policy, segments(path.parent))
+
+
+def rotate(path: Path) -> Segment | None:
+    """Move the log at PATH into a new segment now; None if it is empty."""
+    with path.open("ab") as fh, _locked(fh):
+        return _rotate(fh, path, read_policy(path.parent))
+
+
+def tail_all(path: Path, count: int) -> list[Record]:
+    """Return the last COUNT records of PATH and, if needed, its segments.
+
+    Older segments are opened newest first, only until COUNT is reached.
+    """
+    records = tail_records(path, count) if path.exists() else []
+    for seg in reversed(segments(path.parent)):
+        if len(records) >= count:
+            break
+        older = deque(iter_records(seg.path), maxlen=count - len(records))
+        records = [*older, *records]
+    return records
+
+
+def range_all(
+    path: Path, since: datetime | None, until: datetime | None
+) -> Iterator[Record]:
+    """Like ``read_range``, over the segments of PATH and then PATH.
+
+    Segments whose recorded time range lies outside SINCE..UNTIL are not
+    opened.
+    """
+    lo = since.timestamp() if since else None
+    hi = until.timestamp() if until else None
+    for seg in segments(path.parent):
+        last, first = _epoch(seg.last), _epoch(seg.first)
+        if lo is not None and last is not None and last < lo:
+            continue
+        if hi is not None and first is not None and first > hi:
+            continue
+        yield from read_range(seg.path, since, until)
+    if path.exists():
+        yield from read_range(path, since, until)
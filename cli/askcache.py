@@ -0,0 +1,112 @@
+"""On-disk cache of ``sf ask`` responses."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+
+def cache_key(
+    model: str,
+    prompt: str,
+    question: str,
+    context: str = "",
+    base_url: str = "",
+    max_tokens: int = 0,
+) -> str:
+    """Return the content address of a request.
+
+    Every field that shapes the request is part of the key. The system
+    prompt is hashed separately, so editing the prompt file invalidates
+    every cached answer without storing the prompt itself.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+    doc = json.dumps(
+        [model, base_url, max_tokens, prompt_hash, question, context]
+    )
+    return hashlib.sha256(doc.encode()).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with a TTL and an LRU size cap.
+
+    Entries older than TTL seconds are ignored and removed. When the
+    stored answers exceed MAX_BYTES, the least recently used go first.
+    """
+
+    def __init__(self, path: Path, ttl: float, max_bytes: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(str(path), timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, key: str) -> str | None:
+        """Return the fresh answer stored under KEY, if any."""
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT answer, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            if now - row[1] > self.ttl:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key = ?", (key,)
+                )
+                return None
+            self.conn.execute(
+                "UPDATE responses SET used = ? WHERE key = ?", (now, key)
+            )
+        return str(row[0])
+
+    def put(self, key: str, model: str, answer: str) -> None:
+        """Store ANSWER under KEY and evict down to the size cap."""
+        now = time.time()
+        size = len(answer.encode())
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, answer, size, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self.conn.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.ttl,)
+        )
+        total = self.conn.execute(
+            "SELECT coalesce(sum(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY used"
+        ):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
@@ -0,0 +1,196 @@
+"""Answer backends for ``sf ask``, chosen by the ``ask_backend`` key."""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+from typing import Any, Iterator
+
+from . import llm
+from .context import user_message
+
+# How many of the most recent journal entries the template backend reads.
+RECENT = 200
+WIDTH = 78
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9_-]+")
+_STOP = frozenset(
+    "a an and are as at be but by can do for from how i in into is it its"
+    " make my need of on or our should so that the this to up we what when"
+    " why with".split()
+)
+_TYPES = (
+    ("bug", {"bug", "fix", "broken", "crash", "error", "fail", "fails"}),
+    ("doc", {"doc", "docs", "document", "readme", "guide", "explain"}),
+    ("feature", {"add", "feature", "new", "support", "allow", "enable"}),
+)
+
+
+def messages(
+    prompt: str, question: str, context: str = ""
+) -> list[dict[str, str]]:
+    """Return the chat messages for QUESTION under the system PROMPT."""
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": user_message(question, context)},
+    ]
+
+
+class OpenAIBackend:
+    """Chat completions from an OpenAI-compatible CLIENT."""
+
+    cacheable = True
+
+    def __init__(self, client: Any, model: str, max_tokens: int = 0) -> None:
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        # Token usage reported for the last ``complete`` call, if any.
+        self.usage: Any = None
+
+    def _create(
+        self, prompt: str, question: str, context: str, **options: Any
+    ) -> Any:
+        if self.max_tokens:
+            options["max_tokens"] = self.max_tokens
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages(prompt, question, context),
+            **options,
+        )
+
+    def complete(self, prompt: str, question: str, context: str = "") -> str:
+        resp = self._create(prompt, question, context)
+        self.usage = getattr(resp, "usage", None)
+        return str(resp.choices[0].message.content.strip())
+
+    def stream(
+        self, prompt: str, question: str, context: str = ""
+    ) -> Iterator[str]:
+        chunks = self._create(prompt, question, context, stream=True)
+        try:
+            yield from llm.stream_text(chunks)
+        finally:
+            # Closing drops the connection, so Ctrl-C stops generation too.
+            chunks.close()
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOP]
+
+
+def _clip(text: str, width: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= width:
+        return text
+    return text[: width - 3].rsplit(" ", 1)[0].rstrip(" ,.;:") + "..."
+
+
+class TemplateBackend:
+    """Offline work items built from the question and journal trailers.
+
+    ENTRIES are ``(path, trailers)`` pairs, newest first. The entry whose
+    trailers share the most words with the question seeds the steps, so
+    answers follow how similar work was done before. No network, and
+    answers take well under a millisecond once the entries are loaded.
+    """
+
+    model = "template"
+    cacheable = False
+    usage = None
+
+    def __init__(
+        self, entries: list[tuple[str, dict[str, Any]]], keys: list[str]
+    ) -> None:
+        self.entries = [
+            (path, {k: str(t[k]) for k in keys if t.get(k)})
+            for path, t in entries
+        ]
+        self.vocab = [
+            set(_words(" ".join(t.values()))) for _, t in self.entries
+        ]
+
+    @classmethod
+    def from_journals(
+        cls, jdir: str, keys: list[str], root: str, limit: int = RECENT
+    ) -> TemplateBackend:
+        """Load the LIMIT newest entries under JDIR via the journal index."""
+        from . import emit
+
+        mod = emit.load()
+        base = os.path.join(root, jdir)
+        entries: list[tuple[str, dict[str, Any]]] = []
+        if not os.path.isdir(base):
+            return cls(entries, keys)
+        try:
+            conn = mod.open_index(jdir, root)
+            try:
+                mod.refresh_index(conn, base)
+                rows = conn.execute(
+                    "SELECT path FROM files ORDER BY mtime DESC, path DESC"
+                    " LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                for (rel,) in rows:
+                    trailers = mod.entry_trailers(conn, base, rel)
+                    if isinstance(trailers, dict):
+                        entries.append((os.path.join(jdir, rel), trailers))
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            pass
+        return cls(entries, keys)
+
+    def _best(self, words: set[str]) -> int | None:
+        best, score = None, 0
+        for i, vocab in enumerate(self.vocab):
+            n = len(words & vocab)
+            if n > score:
+                best, score = i, n
+        return best
+
+    def complete(self, prompt: str, question: str, context: str = "") -> str:
+        # CONTEXT is ignored: the entries already are the context.
+        words = _words(question)
+        found = set(words)
+        kind = next((k for k, ws in _TYPES if ws & found), "task")
+        first = question.strip().splitlines()[0] if question.strip() else ""
+        title = _clip(first.rstrip(" .?!"), WIDTH - 7)
+        best = self._best(found)
+        tags = list(dict.fromkeys(words))
+        if best is not None:
+            # Words the question shares with past work make the best tags.
+            shared = self.vocab[best]
+            tags.sort(key=lambda w: w not in shared)
+        if best is None:
+            steps = [
+                f"Pin down the scope of: {title.lower()}",
+                "Make the change with tests",
+                "Verify in CI and record a journal entry",
+            ]
+        else:
+            path, t = self.entries[best]
+            name = os.path.basename(path)
+            steps = [
+                f"Review {name}: {t.get('fix') or t.get('why') or title}",
+                f"Apply a similar change: {t.get('change') or title}",
+                f"Verify as before: {t.get('proof') or 'run the checks'}",
+            ]
+        lines = [
+            f"Title: {title[:1].upper()}{title[1:]}",
+            f"Description: {_clip(question, WIDTH - 13)}",
+            f"Type: {kind}",
+            f"Tags: {_clip(','.join(tags[:4]) or kind, WIDTH - 6)}",
+            "Steps:",
+        ]
+        lines += [
+            f"  {n}. {_clip(step, WIDTH - 5)}"
+            for n, step in enumerate(steps, 1)
+        ]
+        return "\n".join(lines)
+
+    def stream(
+        self, prompt: str, question: str, context: str = ""
+    ) -> Iterator[str]:
+        yield self.complete(prompt, question)
@@ -1,21 +1,30 @@
 from __future__ import annotations
 
+import copy
+import importlib.util
+import json
+import os
+import time
 from pathlib import Path
 from typing import Any  # for optional yaml support
 
 import typer
 
-try:  # optional
-    import yaml as _yaml
-
-    yaml: Any = _yaml
-    HAVE_YAML = True
-except Exception:  # pragma: no cover
-    yaml = None
-    HAVE_YAML = False
+# PyYAML is optional and only imported when a config file is read or
+# written, which keeps startup cheap for commands that never need it.
+HAVE_YAML = importlib.util.find_spec("yaml") is not None
 
 CFG_PATH = Path(".squirrelfocus") / "config.yaml"
 
+# Parsed configs keyed on (path, inode, mtime, size) for this process, and
+# a JSON copy under .squirrelfocus/cache/ shared with scripts/sqf_emit.py so
+# later processes can skip PyYAML entirely.
+COMPILED_VERSION = 1
+# Files modified this recently (ns) may change again within the same mtime
+# tick, so they are not written to the on-disk cache.
+RACY_NS = 2_000_000_000
+_MEMO: dict[tuple[str, int, int, int], dict[str, Any]] = {}
+
 DEFAULTS: dict[str, Any] = {
     "journals_dir": "journal_logs",
     "trailer_keys": ["fix", "why", "change", "proof", "ref"],
@@ -26,20 +35,115 @@ DEFAULTS: dict[str, Any] = {
         "- **Change:** {{change}}\n"
         "- **Proof:** {{proof}}\n"
     ),
+    "range_format": (
+        "#### {{date}} {{slug}}\n"
+        "- **Fix:** {{fix}}\n"
+        "- **Why:** {{why}}\n"
+        "- **Change:** {{change}}\n"
+        "- **Proof:** {{proof}}\n"
+    ),
+    "entry_selection": "mtime",
+    "ask_backend": "openai",
+    "ask_model": "gpt-3.5-turbo",
+    "ask_base_url": "",
+    "ask_timeout": 0.0,
+    "ask_max_tokens": 0,
+    "ask_concurrency": 4,
+    "ask_context_tokens": 1500,
+    "ask_cache_ttl": 7 * 24 * 3600,
+    "ask_cache_max_bytes": 16 * 1024 * 1024,
 }
 
 REQUIRED_TYPES: dict[str, type] = {
     "journals_dir": str,
 }
 
+ASK_BACKENDS = ("openai", "template")
+ENTRY_SELECTIONS = ("mtime", "git")
+
+
+def get_yaml() -> Any:
+    """Import and return the PyYAML module."""
+    import yaml
+
+    return yaml
+
+
+def _compiled_path() -> Path:
+    return CFG_PATH.parent / "cache" / "config.json"
+
+
+def _read_compiled(stamp: list[int]) -> dict[str, Any] | None:
+    try:
+        with _compiled_path().open("r", encoding="utf-8") as fh:
+            blob = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(blob, dict):
+        return None
+    if blob.get("version") != COMPILED_VERSION or blob.get("stat") != stamp:
+        return None
+    data = blob.get("data")
+    return data if isinstance(data, dict) else None
+
+
+def _write_compiled(stamp: list[int], data: dict[str, Any]) -> None:
+    try:
+        text = json.dumps(
+            {"version": COMPILED_VERSION, "stat": stamp, "data": data}
+        )
+    except (TypeError, ValueError):
+        return
+    if json.loads(text)["data"] != data:
+        return  # not representable in JSON without loss
+    path = _compiled_path()
+    try:
+        if not path.parent.is_dir():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            (path.parent / ".gitignore").write_text(
+                "# Created by SquirrelFocus; safe to delete.\n*\n"
+            )
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
 
 def read_cfg() -> dict[str, Any] | None:
-    """Return raw config or None if file missing."""
-    if not HAVE_YAML or not CFG_PATH.exists():
+    """Return raw config or None if file missing.
+
+    Results are cached per process and in a compiled JSON file, both keyed
+    on the file's inode, mtime and size.
+    """
+    try:
+        st = CFG_PATH.stat()
+    except FileNotFoundError:
         return None
+    except OSError as err:
+        typer.echo(f"Could not read config: {err}")
+        raise typer.Exit(code=1)
+    key = (str(CFG_PATH.resolve()), st.st_ino, st.st_mtime_ns, st.st_size)
+    data = _MEMO.get(key)
+    if data is None:
+        stamp = list(key[1:])
+        data = _read_compiled(stamp)
+        if data is None:
+            if not HAVE_YAML:
+                return None
+            data = _parse_yaml()
+            if time.time_ns() - st.st_mtime_ns > RACY_NS:
+                _write_compiled(stamp, data)
+        _MEMO[key] = data
+    return copy.deepcopy(data)
+
+
+def _parse_yaml() -> dict[str, Any]:
+    yaml = get_yaml()
     try:
         with CFG_PATH.open("r", encoding="utf-8") as fh:
-            return yaml.safe_load(fh) or {}
+            data: dict[str, Any] = yaml.safe_load(fh) or {}
+            return data
     except yaml.YAMLError as err:
         typer.echo(f"Failed to parse config: {err}")
         raise typer.Exit(code=1)
@@ -80,7 +184,9 @@ def validate(data: dict[str, Any] | None) -> None:
             raise typer.Exit(code=1)
     for key, defval in DEFAULTS.items():
         if key in data and key not in REQUIRED_TYPES:
-            if not isinstance(data[key], type(defval)):
+            # Whole numbers are fine wherever a float is expected.
+            ok = (int, float) if isinstance(defval, float) else type(defval)
+            if not isinstance(data[key], ok):
                 typer.echo(f"Config key '{key}' malformed.")
                 typer.echo(f"Example: {_example_line(key, defval)}")
                 raise typer.Exit(code=1)
@@ -90,3 +196,11 @@ def validate(data: dict[str, Any] | None) -> None:
                 typer.echo("Config key 'trailer_keys' malformed.")
                 typer.echo(f"Example: {_example_line(key, defval)}")
                 raise typer.Exit(code=1)
+            choices = {
+                "ask_backend": ASK_BACKENDS,
+                "entry_selection": ENTRY_SELECTIONS,
+            }.get(key)
+            if choices and data[key] not in choices:
+                typer.echo(f"Config key '{key}' malformed.")
+                typer.echo(f"Use one of: {', '.join(choices)}")
+                raise typer.Exit(code=1)
@@ -0,0 +1,69 @@
+"""Project context for ``sf ask --with-context``."""
+
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple
+
+from .fts import Note
+
+# Rough token estimate; close enough for budgeting English prose and code
+# without a tokenizer dependency.
+CHARS_PER_TOKEN = 4
+# Cap per note so one long journal entry cannot crowd out the rest.
+NOTE_TOKENS = 200
+HEADER = "Project notes, most relevant first:"
+
+
+class Packed(NamedTuple):
+    text: str
+    tokens: int
+    notes: int
+    considered: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Return the approximate token count of TEXT."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def render(note: Note) -> str:
+    """Return NOTE as a prompt block of at most NOTE_TOKENS tokens."""
+    where = "acornlog" if note.kind == "log" else note.label
+    block = f"[{note.day or '-'} {where}]\n{note.text}"
+    limit = NOTE_TOKENS * CHARS_PER_TOKEN
+    if len(block) > limit:
+        block = block[: limit - 3].rstrip() + "..."
+    return block
+
+
+def pack(notes: Iterable[Note], budget: int) -> Packed:
+    """Fit NOTES, best first, into BUDGET tokens.
+
+    A note that does not fit is skipped and smaller ones after it may
+    still be used.
+    """
+    parts = []
+    used = estimate_tokens(HEADER)
+    considered = 0
+    for note in notes:
+        considered += 1
+        block = render(note)
+        cost = estimate_tokens(block) + 1
+        if used + cost <= budget:
+            parts.append(block)
+            used += cost
+    if not parts:
+        return Packed("", 0, 0, considered)
+    return Packed("\n\n".join([HEADER, *parts]), used, len(parts), considered)
+
+
+def user_message(question: str, context: str) -> str:
+    """Return the user turn for QUESTION with CONTEXT ahead of it.
+
+    Context goes in the user turn, never the system prompt, so the system
+    prompt stays byte-identical across requests and provider-side prompt
+    caches keep matching it.
+    """
+    if not context:
+        return question
+    return f"{context}\n\nQuestion: {question}"
@@ -0,0 +1,225 @@
+"""Local note-capture daemon listening on a Unix domain socket.
+
+Clients send one JSON object per line::
+
+    {"entries": [[timestamp, text], ...], "fsync": false}
+
+and get ``{"ok": true, "count": N}`` back once the entries are on disk,
+or ``{"ok": false, "error": "..."}``. Requests that arrive while a write
+is in progress are committed together in the next write (group commit),
+so many concurrent clients cost one locked append and at most one fsync.
+``scripts/sf_drop.py`` speaks the same protocol without importing the CLI.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+import queue
+import socket
+import socketserver
+import threading
+from typing import Any, BinaryIO
+
+from . import acornlog
+
+SOCKET_NAME = "sf.sock"
+MAX_BATCH = 4096
+CONNECT_TIMEOUT = 1.0
+# How long a client waits for its entries to be written, fsync included.
+REPLY_TIMEOUT = 30.0
+
+
+def socket_path(log_dir: Path) -> Path:
+    """Return ``$SF_SOCKET`` or the default socket inside LOG_DIR."""
+    env = os.getenv("SF_SOCKET")
+    return Path(env) if env else log_dir / SOCKET_NAME
+
+
+class DaemonError(RuntimeError):
+    """Raised when the daemon rejects a request."""
+
+
+class _Pending:
+    def __init__(self, records: list[acornlog.Record], fsync: bool) -> None:
+        self.records = records
+        self.fsync = fsync
+        self.done = threading.Event()
+        self.error: str | None = None
+
+
+class Committer(threading.Thread):
+    """Drain queued requests and append them to the log in batches."""
+
+    def __init__(self, log_dir: Path, max_batch: int = MAX_BATCH) -> None:
+        super().__init__(name="sf-committer", daemon=True)
+        self.log_dir = log_dir
+        self.max_batch = max_batch
+        self.queue: queue.Queue[_Pending | None] = queue.Queue()
+        self.commits = 0
+        self.entries = 0
+        self._fh: BinaryIO | None = None
+        self._path: Path | None = None
+
+    def submit(self, records: list[acornlog.Record], fsync: bool) -> None:
+        """Queue RECORDS and block until they are written."""
+        item = _Pending(records, fsync)
+        self.queue.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise DaemonError(item.error)
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.join()
+
+    def _handle(self) -> tuple[BinaryIO, Path]:
+        # The log is kept open between batches. It is reopened when the
+        # active log changes (``sf migrate-log``) or the file is replaced.
+        path = acornlog.active_log(self.log_dir)
+        fh = self._fh
+        if fh is not None and path == self._path:
+            try:
+                if os.stat(path).st_ino == os.fstat(fh.fileno()).st_ino:
+                    return fh, path
+            except FileNotFoundError:
+                pass
+        if fh is not None:
+            fh.close()
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self._fh, self._path = path.open("ab"), path
+        return self._fh, path
+
+    def run(self) -> None:
+        while True:
+            first = self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            size = len(first.records)
+            while size < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+                size += len(item.records)
+            self._commit(batch)
+        if self._fh is not None:
+            self._fh.close()
+
+    def _commit(self, batch: list[_Pending]) -> None:
+        records = [rec for item in batch for rec in item.records]
+        error = None
+        try:
+            fh, path = self._handle()
+            fsync = any(item.fsync for item in batch)
+            acornlog.append_to(fh, path, records, fsync=fsync)
+            self.commits += 1
+            self.entries += len(records)
+        except Exception as exc:
+            # Whatever goes wrong, the waiting clients must be released and
+            # this thread must live on to serve the next batch.
+            error = f"write failed: {exc}"
+        for item in batch:
+            item.error = error
+            item.done.set()
+
+
+def _decode(line: bytes) -> tuple[list[acornlog.Record], bool]:
+    req = json.loads(line)
+    entries = req["entries"]
+    if not isinstance(entries, list):
+        raise ValueError("entries must be a list")
+    records = [acornlog.Record(str(ts), str(text)) for ts, text in entries]
+    for rec in records:
+        # Lone surrogates survive json.loads but not the text log; reject
+        # them here (UnicodeEncodeError is a ValueError).
+        acornlog.encode(rec, structured=False)
+    return records, bool(req.get("fsync", False))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: Server
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            reply: dict[str, Any]
+            try:
+                records, fsync = _decode(line)
+                self.server.committer.submit(records, fsync)
+                reply = {"ok": True, "count": len(records)}
+            except (ValueError, KeyError, TypeError) as exc:
+                reply = {"ok": False, "error": f"bad request: {exc}"}
+            except DaemonError as exc:
+                reply = {"ok": False, "error": str(exc)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    # Bursts of clients must queue rather than see EAGAIN on connect.
+    request_queue_size = socket.SOMAXCONN
+
+    def __init__(self, sock: Path, log_dir: Path) -> None:
+        self.committer = Committer(log_dir)
+        _claim(sock)
+        super().__init__(str(sock), _Handler)
+        os.chmod(sock, 0o600)
+        self.sock = sock
+        self.committer.start()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.committer.stop()
+        self.sock.unlink(missing_ok=True)
+
+
+def _claim(sock: Path) -> None:
+    # A socket file left behind by a crashed daemon refuses connections
+    # and can be removed; a live one means another daemon owns the path.
+    if not sock.exists():
+        sock.parent.mkdir(parents=True, exist_ok=True)
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(sock))
+    except OSError:
+        sock.unlink()
+    else:
+        raise DaemonError(f"A daemon is already listening on {sock}.")
+    finally:
+        probe.close()
+
+
+def send(
+    sock: Path, records: list[acornlog.Record], fsync: bool = False
+) -> int:
+    """Send RECORDS to the daemon at SOCK and return the count written.
+
+    Raises OSError when no daemon is listening and DaemonError when it
+    reports a failure or does not reply within REPLY_TIMEOUT seconds.
+    """
+    req = {"entries": [list(rec) for rec in records], "fsync": fsync}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(CONNECT_TIMEOUT)
+        conn.connect(str(sock))
+        conn.settimeout(REPLY_TIMEOUT)
+        try:
+            conn.sendall(json.dumps(req).encode() + b"\n")
+            with conn.makefile("rb") as fh:
+                line = fh.readline()
+        except TimeoutError:
+            # Not an OSError to callers: the entries may still be written,
+            # so falling back to a direct append could duplicate them.
+            raise DaemonError("no reply from the daemon")
+    if not line:
+        raise DaemonError("daemon closed the connection")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise DaemonError(reply.get("error", "unknown error"))
+    return int(reply["count"])
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "sqf_emit.py"
+
+
+def load() -> ModuleType:
+    """Return the bundled sqf_emit module, importing it once per process."""
+    mod = sys.modules.get("sqf_emit")
+    if mod is not None:
+        return mod
+    spec = importlib.util.spec_from_file_location("sqf_emit", SCRIPT)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Could not load sqf_emit from {SCRIPT}")
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["sqf_emit"] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def is_stock(script: Path) -> bool:
+    """Return True if SCRIPT is an unmodified copy of the bundled emitter."""
+    try:
+        if script.stat().st_size != SCRIPT.stat().st_size:
+            return False
+        return script.read_bytes() == SCRIPT.read_bytes()
+    except OSError:
+        return False
+
+
+def render_latest(mode: str, cfg: dict[str, Any], root: Path) -> str:
+    """Render the newest journal entry under ROOT as MODE."""
+    mod = load()
+    found = mod.select_entry(cfg, root=str(root))
+    if not found:
+        return ""
+    return str(mod.render(mode, cfg, found[1]))
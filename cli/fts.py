@@ -0,0 +1,401 @@
+"""Full-text search over the acornlog and journal entries."""
+
+from __future__ import annotations
+
+from datetime import date
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+import shlex
+import sqlite3
+import time
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from . import acornlog
+
+SCHEMA_VERSION = "2"
+# Trailer keys indexed when the config names none.
+FIELDS = ("fix", "why", "change", "proof", "ref")
+# bm25 weights of the trailer columns; the body weighs 1.0. Trailers are
+# short and deliberate, so a hit there outranks one in free text.
+FIELD_WEIGHTS = {"fix": 4.0, "ref": 4.0}
+FIELD_WEIGHT = 2.0
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ino INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    doc INTEGER
+);
+"""
+# Trailer columns are numbered (k0, k1, ...) rather than named after their
+# keys, which need not be valid FTS5 column names.
+NOTES = """
+CREATE VIRTUAL TABLE notes USING fts5(
+    body, {columns},
+    kind UNINDEXED, source UNINDEXED, day UNINDEXED, label UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+# A source modified within this window may still be written to, so its
+# stamp is not trusted and it is re-read on the next search.
+RACY_NS = 2_000_000_000
+
+
+class Hit(NamedTuple):
+    kind: str
+    source: str
+    day: str
+    label: str
+    snippet: str
+
+
+def index_path(base: Path, jdir: Path) -> Path:
+    """Return the index under BASE for the project journals in JDIR.
+
+    Each journals directory gets its own index, so a search never returns
+    another project's entries and each can index its own trailer keys.
+    """
+    digest = hashlib.sha256(str(jdir.resolve()).encode()).hexdigest()
+    return base / "search" / f"{digest[:16]}.db"
+
+
+def open_db(path: Path, keys: Iterable[str] = FIELDS) -> sqlite3.Connection:
+    """Open the search index at PATH for the trailer KEYS.
+
+    The index is rebuilt when the schema or KEYS changed.
+    """
+    keys = list(keys)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    stamp = json.dumps([SCHEMA_VERSION, keys])
+    row = conn.execute(
+        "SELECT value FROM meta WHERE key = 'version'"
+    ).fetchone()
+    if row is None or row[0] != stamp:
+        columns = ", ".join(_columns(len(keys)))
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS notes")
+            conn.execute("DELETE FROM sources")
+            conn.execute(NOTES.format(columns=columns))
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (stamp,)
+            )
+    return conn
+
+
+def fields(conn: sqlite3.Connection) -> list[str]:
+    """Return the trailer keys indexed in CONN."""
+    row = conn.execute(
+        "SELECT value FROM meta WHERE key = 'version'"
+    ).fetchone()
+    keys: list[str] = json.loads(row[0])[1]
+    return keys
+
+
+def _columns(count: int) -> list[str]:
+    return [f"k{i}" for i in range(count)]
+
+
+def _weights(keys: list[str]) -> str:
+    weights = [FIELD_WEIGHTS.get(key, FIELD_WEIGHT) for key in keys]
+    return ", ".join(map(str, [1.0, *weights]))
+
+
+def _stamp(st: os.stat_result) -> tuple[int, int, int]:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _trusted(st: os.stat_result) -> bool:
+    return st.st_mtime_ns < time.time_ns() - RACY_NS
+
+
+def _drop_source(conn: sqlite3.Connection, path: str) -> None:
+    conn.execute("DELETE FROM notes WHERE source = ?", (path,))
+    conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+
+def _log_row(rec: acornlog.Record, path: str, width: int) -> tuple[Any, ...]:
+    day = rec.ts[:10] if rec.ts else ""
+    return (rec.text, *[""] * width, "log", path, day, rec.ts)
+
+
+def _insert(conn: sqlite3.Connection, rows: list[tuple[Any, ...]]) -> None:
+    if rows:
+        conn.executemany(
+            f"INSERT INTO notes VALUES ({', '.join('?' * len(rows[0]))})",
+            rows,
+        )
+
+
+def _refresh_segment(conn: sqlite3.Connection, seg: Path) -> int:
+    # Segments never change once written, so each is read exactly once.
+    path = str(seg.resolve())
+    if conn.execute(
+        "SELECT 1 FROM sources WHERE path = ?", (path,)
+    ).fetchone():
+        return 0
+    st = seg.stat()
+    width = len(fields(conn))
+    rows = [_log_row(rec, path, width) for rec in acornlog.iter_records(seg)]
+    _insert(conn, rows)
+    conn.execute(
+        "INSERT INTO sources VALUES (?, 'log', ?, ?, ?, NULL)",
+        (path, st.st_ino, st.st_mtime_ns, st.st_size),
+    )
+    return len(rows)
+
+
+def refresh_log(conn: sqlite3.Connection, log: Path) -> int:
+    """Index records appended to LOG since the last refresh.
+
+    Only bytes past the stored offset are read. A different inode, a
+    shorter file or a new segment means the log was replaced or rotated,
+    so it is indexed again from the start; rotated segments are indexed
+    once each. Other
+    log files indexed earlier are dropped, which keeps a migrated
+    ``acornlog.txt`` from doubling every hit. Returns the number of
+    records added.
+    """
+    path = str(log.resolve())
+    segs = [seg.path for seg in acornlog.segments(log.parent)]
+    # Rotation truncates the log in place, and it may have grown past the
+    # old offset since. The number of the newest segment, kept in the
+    # otherwise unused ``doc`` column, tells that apart from an append.
+    rotated = acornlog.segment_number(segs[-1]) if segs else 0
+    keep = {path, *(str(seg.resolve()) for seg in segs)}
+    for (old,) in conn.execute(
+        "SELECT path FROM sources WHERE kind = 'log'"
+    ).fetchall():
+        if old not in keep:
+            _drop_source(conn, old)
+    added = sum(_refresh_segment(conn, seg) for seg in segs)
+    try:
+        st = log.stat()
+    except FileNotFoundError:
+        _drop_source(conn, path)
+        return added
+    row = conn.execute(
+        "SELECT ino, size, doc FROM sources WHERE path = ?", (path,)
+    ).fetchone()
+    offset = 0
+    if (
+        row is not None
+        and row[0] == st.st_ino
+        and row[1] <= st.st_size
+        and (row[2] or 0) == rotated
+    ):
+        offset = row[1]
+    elif row is not None:
+        _drop_source(conn, path)
+    if offset == st.st_size:
+        return added
+    with log.open("rb") as fh:
+        fh.seek(offset)
+        data = fh.read(st.st_size - offset)
+    # A record still being written has no newline yet; leave it for the
+    # next refresh.
+    data = data[: data.rfind(b"\n") + 1]
+    structured = acornlog.is_structured(log)
+    width = len(fields(conn))
+    rows = []
+    for raw in data.splitlines():
+        line = raw.decode("utf-8", errors="replace").rstrip("\r")
+        rec = acornlog.parse_line(line, structured)
+        rows.append(_log_row(rec, path, width))
+    _insert(conn, rows)
+    conn.execute(
+        "INSERT OR REPLACE INTO sources VALUES (?, 'log', ?, ?, ?, ?)",
+        (path, st.st_ino, st.st_mtime_ns, offset + len(data), rotated),
+    )
+    return added + len(rows)
+
+
+def _walk(jdir: Path) -> Iterator[tuple[str, os.stat_result]]:
+    stack = [str(jdir)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for ent in it:
+                if ent.is_dir(follow_symlinks=False):
+                    stack.append(ent.path)
+                elif ent.name.endswith(".md") and ent.is_file():
+                    yield os.path.abspath(ent.path), ent.stat()
+
+
+def _journal_row(
+    mod: Any, path: str, st: os.stat_result, keys: list[str]
+) -> tuple[Any, ...]:
+    entry = mod.JournalEntry.load(path, keys)
+    values = [str(entry.trailers.get(key) or "") for key in keys]
+    day = entry.date or date.fromtimestamp(st.st_mtime)
+    name = os.path.basename(path)
+    return (entry.body, *values, "journal", path, day.isoformat(), name)
+
+
+def refresh_journals(conn: sqlite3.Connection, jdir: Path, mod: Any) -> int:
+    """Re-index journal entries under JDIR whose stat changed.
+
+    MOD is the loaded ``sqf_emit`` module, whose frontmatter parser and
+    date rules are reused. Entries no longer found under JDIR are dropped.
+    Returns the number of entries re-read.
+    """
+    root = jdir.resolve()
+    keys = fields(conn)
+    known = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT path, ino, mtime, size, doc FROM sources"
+            " WHERE kind = 'journal'"
+        )
+    }
+    seen = set()
+    changed = 0
+    if root.is_dir():
+        for path, st in _walk(root):
+            seen.add(path)
+            old = known.get(path)
+            if old is not None and tuple(old[:3]) == _stamp(st):
+                continue
+            if old is not None:
+                conn.execute("DELETE FROM notes WHERE rowid = ?", (old[3],))
+            row = _journal_row(mod, path, st, keys)
+            cur = conn.execute(
+                f"INSERT INTO notes VALUES ({', '.join('?' * len(row))})",
+                row,
+            )
+            ino, mtime, size = _stamp(st)
+            if not _trusted(st):
+                mtime = -1
+            conn.execute(
+                "INSERT OR REPLACE INTO sources"
+                " VALUES (?, 'journal', ?, ?, ?, ?)",
+                (path, ino, mtime, size, cur.lastrowid),
+            )
+            changed += 1
+    for path, old in known.items():
+        if path not in seen:
+            conn.execute("DELETE FROM notes WHERE rowid = ?", (old[3],))
+            conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+    return changed
+
+
+def build_match(query: str, keys: Iterable[str] = FIELDS) -> str:
+    """Translate QUERY into an FTS5 MATCH expression.
+
+    Words are matched as literal phrases, ``word*`` as a prefix and
+    ``field:value`` restricts VALUE to the trailer column of one of KEYS.
+    Quoting groups words into a phrase. Raises ValueError when nothing is
+    left to match.
+    """
+    keys = list(keys)
+    columns = {key.lower(): col for key, col in zip(keys, _columns(len(keys)))}
+    try:
+        tokens = shlex.split(query)
+    except ValueError:
+        tokens = query.split()
+    terms = []
+    for tok in tokens:
+        field, sep, value = tok.partition(":")
+        column = ""
+        if sep and field.lower() in columns and value:
+            column, tok = columns[field.lower()], value
+        prefix = tok.endswith("*") and len(tok) > 1
+        tok = tok.rstrip("*") if prefix else tok
+        if not tok.strip():
+            continue
+        phrase = '"' + tok.replace('"', '""') + '"' + (" *" if prefix else "")
+        terms.append(f"{column} : {phrase}" if column else phrase)
+    if not terms:
+        raise ValueError("Search query is empty.")
+    return " AND ".join(terms)
+
+
+def query(
+    conn: sqlite3.Connection,
+    text: str,
+    since: date | None = None,
+    until: date | None = None,
+    limit: int = 20,
+) -> list[Hit]:
+    """Return up to LIMIT hits for TEXT, best first."""
+    keys = fields(conn)
+    sql = [
+        "SELECT kind, source, day, label,"
+        " snippet(notes, -1, '[', ']', '...', 12)"
+        " FROM notes WHERE notes MATCH ?"
+    ]
+    args: list[Any] = [build_match(text, keys)]
+    if since is not None:
+        sql.append("AND day >= ?")
+        args.append(since.isoformat())
+    if until is not None:
+        sql.append("AND day != '' AND day <= ?")
+        args.append(until.isoformat())
+    sql.append(f"ORDER BY bm25(notes, {_weights(keys)})")
+    sql.append("LIMIT ?")
+    args.append(limit)
+    return [Hit(*row) for row in conn.execute(" ".join(sql), args)]
+
+
+class Note(NamedTuple):
+    kind: str
+    source: str
+    day: str
+    label: str
+    text: str
+
+
+_WORD_RE = re.compile(r"\w{3,}")
+# Half-life, in days, of a note's relevance in ``related``.
+HALF_LIFE = 90.0
+
+
+def related(
+    conn: sqlite3.Connection, text: str, limit: int = 50
+) -> list[Note]:
+    """Return notes sharing any word with TEXT, best and newest first.
+
+    Unlike ``query`` every word is optional, and the bm25 score decays
+    with the note's age. Each note carries its full body and trailers.
+    """
+    words = dict.fromkeys(w.lower() for w in _WORD_RE.findall(text))
+    if not words:
+        return []
+    match = " OR ".join('"' + w.replace('"', '""') + '"' for w in words)
+    keys = fields(conn)
+    # bm25 scores are negative, better ones lower; decaying them by age
+    # pushes old notes towards zero. Candidates are re-ranked here rather
+    # than in SQL, which not every SQLite build can do (no pow()).
+    rows = conn.execute(
+        f"SELECT bm25(notes, {_weights(keys)}) AS score,"
+        f" kind, source, day, label, body, {', '.join(_columns(len(keys)))}"
+        " FROM notes WHERE notes MATCH ? ORDER BY score LIMIT ?",
+        (match, limit * 4),
+    ).fetchall()
+    today = date.today()
+
+    def decayed(row: tuple[Any, ...]) -> float:
+        try:
+            age = (today - date.fromisoformat(row[3])).days
+        except ValueError:
+            age = 365
+        decay: float = 0.5 ** (max(age, 0) / HALF_LIFE)
+        return float(row[0]) * decay
+
+    notes = []
+    for _, kind, source, day, label, body, *values in sorted(
+        rows, key=decayed
+    )[:limit]:
+        lines = [f"{k}: {v}" for k, v in zip(keys, values) if v]
+        if body.strip():
+            lines.append(" ".join(body.split()))
+        notes.append(Note(kind, source, day, label, "\n".join(lines)))
+    return notes
@@ -0,0 +1,122 @@
+"""Helpers for calling chat completion backends from ``sf ask``."""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import random
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+RETRIES = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 20.0
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Return the server's Retry-After hint carried by EXC, in seconds."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for rate limits, timeouts and transient server errors."""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return int(status) in RETRY_STATUS
+    # Connection and timeout errors from the SDK carry no status code.
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def backoff(
+    attempt: int, base: float = BASE_DELAY, cap: float = MAX_DELAY
+) -> float:
+    """Return a "full jitter" delay for retry number ATTEMPT."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def with_retries(
+    call: Callable[[], R],
+    retries: int = RETRIES,
+    sleep: Callable[[float], Any] = time.sleep,
+) -> R:
+    """Run CALL, retrying retryable errors with jittered backoff."""
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as exc:
+            if attempt >= retries or not is_retryable(exc):
+                raise
+            hint = retry_after(exc)
+            sleep(hint if hint is not None else backoff(attempt))
+            attempt += 1
+
+
+def stream_text(chunks: Iterable[Any]) -> Iterator[str]:
+    """Yield the text pieces of a streamed chat completion."""
+    for chunk in chunks:
+        if chunk.choices:
+            piece = chunk.choices[0].delta.content
+            if piece:
+                yield str(piece)
+
+
+def ordered_map(
+    fn: Callable[[T], R], items: Iterable[T], concurrency: int
+) -> Iterator[tuple[T, Future[R]]]:
+    """Run FN over ITEMS on CONCURRENCY threads, yielding in input order.
+
+    Each item is yielded with its finished future as soon as it and all
+    earlier items are done, so output streams while later items are still
+    running. At most ``4 * CONCURRENCY`` items are in flight, which keeps
+    memory flat for long inputs.
+    """
+    window = max(1, concurrency) * 4
+    pending: deque[tuple[T, Future[R]]] = deque()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            while len(pending) >= window or (pending and pending[0][1].done()):
+                head = pending.popleft()
+                head[1].exception()  # wait
+                yield head
+        while pending:
+            head = pending.popleft()
+            head[1].exception()
+            yield head
+
+
+def dedupe(fn: Callable[[T], R]) -> Callable[[T], R]:
+    """Wrap FN so concurrent calls with equal arguments share one call.
+
+    The first caller runs FN; later callers wait for and reuse its result
+    or exception.
+    """
+    lock = threading.Lock()
+    calls: dict[T, Future[R]] = {}
+
+    def wrapper(arg: T) -> R:
+        with lock:
+            fut = calls.get(arg)
+            owner = fut is None
+            if fut is None:
+                fut = calls[arg] = Future()
+        if owner:
+            try:
+                fut.set_result(fn(arg))
+            except BaseException as exc:
+                fut.set_exception(exc)
+        return fut.result()
+
+    return wrapper
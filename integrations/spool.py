@@ -0,0 +1,151 @@
+"""Durable SQLite queue between webhook workers and the journal writer.
+
+Workers ``enqueue`` accepted events; a single drainer ``drain``s them into
+the acornlog. Each event is keyed on a hash of its content, so a sender
+retrying after a lost response does not create a second entry while the
+first is still in the spool (``RETENTION`` seconds after delivery).
+
+Delivery is at least once: an event is marked delivered only after the
+sink returns, so a crash between the write and the mark replays it.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import time
+from typing import Callable, Iterator
+
+from .webhook import Event, canonical
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+RETENTION = 7 * 24 * 3600
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key BLOB NOT NULL UNIQUE,
+    body TEXT NOT NULL,
+    received REAL NOT NULL,
+    delivered REAL
+);
+CREATE INDEX IF NOT EXISTS pending ON events (id) WHERE delivered IS NULL;
+"""
+
+
+class SpoolBusy(RuntimeError):
+    """Raised when another process already drains the spool."""
+
+
+def event_key(ev: Event) -> bytes:
+    """Return the idempotency key for EV.
+
+    The timestamp is left out: a sender may leave it unsigned, and a
+    replay with a new timestamp must not count as a new event.
+    """
+    doc = {"source": ev.source, "event": ev.event, "payload": ev.payload}
+    return hashlib.sha256(canonical(doc)).digest()
+
+
+def _to_body(ev: Event) -> str:
+    return json.dumps([ev.source, ev.event, ev.payload, ev.timestamp])
+
+
+def _from_body(body: str) -> Event:
+    source, event, payload, timestamp = json.loads(body)
+    return Event(source, event, payload, timestamp)
+
+
+class Spool:
+    """One connection to the spool database at PATH.
+
+    THREADSAFE allows the connection to be used from worker threads, one
+    at a time, as ``IngestServer`` does with its sink.
+    """
+
+    def __init__(self, path: Path, threadsafe: bool = False) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(
+            str(path), timeout=30, check_same_thread=not threadsafe
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL makes every commit durable before a worker answers 202.
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def enqueue(self, events: list[Event]) -> int:
+        """Store EVENTS in one transaction; return how many were new."""
+        now = time.time()
+        rows = [(event_key(ev), _to_body(ev), now) for ev in events]
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO events (key, body, received)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+            return self.conn.total_changes - before
+
+    def pending(self) -> int:
+        """Return the number of events not yet delivered."""
+        row = self.conn.execute(
+            "SELECT count(*) FROM events WHERE delivered IS NULL"
+        ).fetchone()
+        return int(row[0])
+
+    def drain(self, sink: Callable[[list[Event]], None], limit: int) -> int:
+        """Deliver up to LIMIT pending events to SINK, oldest first.
+
+        Returns the number delivered. If SINK raises, nothing is marked
+        and the same events are offered again on the next call.
+        """
+        rows = self.conn.execute(
+            "SELECT id, body FROM events WHERE delivered IS NULL"
+            " ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        if not rows:
+            return 0
+        sink([_from_body(body) for _, body in rows])
+        with self.conn:
+            self.conn.execute(
+                "UPDATE events SET delivered = ? WHERE id BETWEEN ? AND ?"
+                " AND delivered IS NULL",
+                (time.time(), rows[0][0], rows[-1][0]),
+            )
+        return len(rows)
+
+    def prune(self, retention: float = RETENTION) -> int:
+        """Forget delivered events older than RETENTION seconds."""
+        with self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM events WHERE delivered < ?",
+                (time.time() - retention,),
+            )
+        return cur.rowcount
+
+
+@contextmanager
+def drainer_lock(path: Path) -> Iterator[None]:
+    """Hold the single-drainer lock for the spool at PATH."""
+    with open(str(path) + ".lock", "a+b") as fh:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SpoolBusy(f"{path} is already being drained")
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
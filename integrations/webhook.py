@@ -0,0 +1,461 @@
+"""Asyncio HTTP server that turns webhooks into acornlog entries.
+
+Requests follow ``docs/integrations/webhook_format.md``: a JSON body with
+``source``, ``event`` and ``payload``. Accepted events are queued and
+written in batches by a single writer task, so a burst costs one locked
+append instead of one per request. When the queue is full the server
+answers ``429`` and the sender is expected to retry.
+
+Run with ``python -m integrations.webhook --port 8765``. The shared
+secret is read from ``$SF_WEBHOOK_SECRET``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+import hashlib
+import hmac
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, Callable
+
+from cli import acornlog
+
+MAX_BODY = 256 * 1024
+MAX_HEADER = 16 * 1024
+SIGNATURE_HEADER = "x-signature"
+# Body fields covered by a ``signature`` field.
+SIGNED_FIELDS = ("source", "event", "payload", "timestamp")
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    503: "Service Unavailable",
+}
+
+
+class InvalidEvent(ValueError):
+    """Raised when a webhook body does not match the documented format."""
+
+
+@dataclass(frozen=True)
+class Event:
+    source: str
+    event: str
+    payload: dict[str, Any]
+    timestamp: str | None = None
+
+
+@dataclass
+class Settings:
+    log_dir: Path
+    secret: bytes | None = None
+    journals_dir: Path | None = None
+    journal_events: frozenset[str] = frozenset()
+    queue_size: int = 10_000
+    batch_size: int = 512
+    flush_interval: float = 0.05
+    # Answer 202 only after the sink has stored the event.
+    ack_after_write: bool = False
+
+
+@dataclass
+class Metrics:
+    started: float = field(default_factory=time.monotonic)
+    received: int = 0
+    accepted: int = 0
+    written: int = 0
+    batches: int = 0
+    rejected: dict[str, int] = field(default_factory=dict)
+
+    def reject(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def snapshot(self, depth: int) -> dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "uptime_s": round(elapsed, 3),
+            "received": self.received,
+            "accepted": self.accepted,
+            "written": self.written,
+            "batches": self.batches,
+            "rejected": dict(self.rejected),
+            "queue_depth": depth,
+            "accepted_per_s": round(self.accepted / elapsed, 1),
+            "written_per_s": round(self.written / elapsed, 1),
+        }
+
+
+def sign(secret: bytes, body: bytes) -> str:
+    """Return the ``X-Signature`` header value for BODY."""
+    return "sha256=" + hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+
+def canonical(payload: dict[str, Any]) -> bytes:
+    """Return PAYLOAD serialized with sorted keys and no spaces."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+
+
+def verify(secret: bytes, body: bytes, header: str, obj: Any) -> bool:
+    """Check the header signature over BODY or the ``signature`` field.
+
+    The header covers the raw body. The body field cannot cover itself,
+    so it is computed over ``canonical`` of the other fields instead:
+    SIGNED_FIELDS, with a missing one as null.
+    """
+    # Compared as bytes: compare_digest rejects non-ASCII str arguments.
+    if header:
+        given = header.encode("latin-1", errors="replace")
+        return hmac.compare_digest(given, sign(secret, body).encode())
+    field_sig = obj.get("signature") if isinstance(obj, dict) else None
+    if not isinstance(field_sig, str) or not isinstance(
+        obj.get("payload"), dict
+    ):
+        return False
+    signed = {key: obj.get(key) for key in SIGNED_FIELDS}
+    expected = hmac.new(secret, canonical(signed), hashlib.sha256)
+    return hmac.compare_digest(
+        field_sig.removeprefix("sha256=").encode("utf-8", errors="replace"),
+        expected.hexdigest().encode(),
+    )
+
+
+def parse_event(obj: Any) -> Event:
+    """Validate a decoded webhook body and return its Event."""
+    if not isinstance(obj, dict):
+        raise InvalidEvent("body must be a JSON object")
+    for key in ("source", "event"):
+        if not isinstance(obj.get(key), str) or not obj[key].strip():
+            raise InvalidEvent(f"'{key}' must be a non-empty string")
+    if not isinstance(obj.get("payload"), dict):
+        raise InvalidEvent("'payload' must be an object")
+    return Event(
+        obj["source"].strip(),
+        obj["event"].strip(),
+        obj["payload"],
+        _timestamp(obj.get("timestamp")),
+    )
+
+
+def _timestamp(value: Any) -> str | None:
+    # The value becomes the log record's timestamp, so anything that is
+    # not a plain ISO time (a newline could forge a text-log line) is
+    # dropped and the write time is used instead.
+    if not isinstance(value, str) or not value:
+        return None
+    if any(ch.isspace() for ch in value):
+        return None
+    # fromisoformat only accepts a "Z" suffix from Python 3.11 on.
+    stamp: str = value[:-1] + "+00:00" if value.endswith("Z") else value
+    try:
+        datetime.fromisoformat(stamp)
+    except ValueError:
+        return None
+    return stamp
+
+
+def summary(ev: Event) -> str:
+    """Return a one-line description of EV for the acornlog."""
+    p = ev.payload
+    for key in ("text", "name", "description", "title", "message"):
+        if isinstance(p.get(key), str) and p[key].strip():
+            text = p[key]
+            break
+    else:
+        text = json.dumps(p, sort_keys=True, separators=(",", ":"))
+    text = " ".join(text.split())
+    if len(text) > 200:
+        text = text[:197] + "..."
+    return " ".join(f"[{ev.source}/{ev.event}] {text}".split())
+
+
+def journal_stub(ev: Event, jdir: Path, stamp: datetime) -> Path:
+    """Write a journal entry for EV under JDIR and return its path."""
+    digest = hashlib.sha256(canonical(ev.payload)).hexdigest()[:8]
+    name = f"{stamp.date().isoformat()}-{ev.source}-{ev.event}-{digest}.md"
+    path = jdir / "".join(
+        c if c.isalnum() or c in "-._" else "-" for c in name
+    )
+    url = ev.payload.get("html_url") or ev.payload.get("url") or ""
+    trailers = {"fix": summary(ev), "ref": str(url)}
+    # JSON strings are valid YAML double-quoted scalars.
+    fm = "".join(f"  {k}: {json.dumps(v)}\n" for k, v in trailers.items() if v)
+    body = json.dumps(ev.payload, indent=2, sort_keys=True)
+    text = (
+        f"---\ntrailers:\n{fm}---\n"
+        f"# {ev.source} {ev.event}\n\n```json\n{body}\n```\n"
+    )
+    jdir.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def write_batch(settings: Settings, events: list[Event]) -> None:
+    """Append EVENTS to the acornlog in one write; add journal stubs."""
+    now = datetime.now()
+    records = [
+        acornlog.Record(ev.timestamp or now.isoformat(), summary(ev))
+        for ev in events
+    ]
+    settings.log_dir.mkdir(parents=True, exist_ok=True)
+    acornlog.append(acornlog.active_log(settings.log_dir), records)
+    if settings.journals_dir is not None:
+        for ev in events:
+            if f"{ev.source}/{ev.event}" in settings.journal_events:
+                journal_stub(ev, settings.journals_dir, now)
+
+
+Sink = Callable[[list[Event]], object]
+
+
+class IngestServer:
+    """Accept webhooks over HTTP and write them in batches.
+
+    SINK receives each batch in a worker thread; it defaults to
+    ``write_batch``, which appends to the acornlog.
+    """
+
+    def __init__(self, settings: Settings, sink: Sink | None = None) -> None:
+        self.settings = settings
+        self.sink = sink or partial(write_batch, settings)
+        self.metrics = Metrics()
+        self.queue: asyncio.Queue[tuple[Event, asyncio.Future[bool] | None]]
+        self.queue = asyncio.Queue(settings.queue_size)
+        self._server: asyncio.Server | None = None
+        self._writer: asyncio.Task[None] | None = None
+
+    async def start(self, host: str, port: int, **kw: Any) -> int:
+        """Listen on HOST:PORT and return the bound port."""
+        self._writer = asyncio.create_task(self._drain())
+        self._server = await asyncio.start_server(
+            self._client, host, port, limit=MAX_HEADER, **kw
+        )
+        return int(self._server.sockets[0].getsockname()[1])
+
+    async def close(self) -> None:
+        """Stop accepting requests and flush everything queued."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.queue.join()
+        if self._writer is not None:
+            self._writer.cancel()
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.settings.flush_interval
+            while len(batch) < self.settings.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                left = deadline - loop.time()
+                if left <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), left)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+            ok = False
+            try:
+                await asyncio.to_thread(self.sink, [ev for ev, _ in batch])
+                self.metrics.written += len(batch)
+                self.metrics.batches += 1
+                ok = True
+            except Exception:
+                self.metrics.reject("write_failed")
+            finally:
+                for _, fut in batch:
+                    if fut is not None and not fut.done():
+                        fut.set_result(ok)
+                    self.queue.task_done()
+
+    async def _client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while await self._request(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.LimitOverrunError:
+            await self._reply(writer, 413, {"error": "headers too large"})
+        finally:
+            writer.close()
+
+    async def _request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = (lines[0].split(" ") + ["", ""])[:3]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        conn = headers.get("connection", "").lower()
+        keep = conn != "close" and (
+            version == "HTTP/1.1" or conn == "keep-alive"
+        )
+        if method == "GET":
+            if target == "/metrics":
+                snap = self.metrics.snapshot(self.queue.qsize())
+                await self._reply(writer, 200, snap, keep)
+            elif target == "/healthz":
+                await self._reply(writer, 200, {"ok": True}, keep)
+            else:
+                await self._reply(writer, 404, {"error": "not found"}, keep)
+            return keep
+        if method != "POST":
+            await self._reply(writer, 405, {"error": "use POST"})
+            return False
+        length = headers.get("content-length", "")
+        if not length.isdigit():
+            await self._reply(writer, 411, {"error": "need Content-Length"})
+            return False
+        if int(length) > MAX_BODY:
+            await self._reply(writer, 413, {"error": "body too large"})
+            return False
+        body = await reader.readexactly(int(length))
+        status, reply = await self._accept(
+            body, headers.get(SIGNATURE_HEADER, "")
+        )
+        await self._reply(writer, status, reply, keep)
+        return keep
+
+    async def _accept(self, body: bytes, signature: str) -> tuple[int, Any]:
+        self.metrics.received += 1
+        try:
+            obj = json.loads(body)
+        except ValueError:
+            self.metrics.reject("invalid")
+            return 400, {"error": "body is not JSON"}
+        secret = self.settings.secret
+        if secret is not None and not verify(secret, body, signature, obj):
+            self.metrics.reject("unauthorized")
+            return 401, {"error": "bad signature"}
+        try:
+            ev = parse_event(obj)
+        except InvalidEvent as exc:
+            self.metrics.reject("invalid")
+            return 400, {"error": str(exc)}
+        fut = None
+        if self.settings.ack_after_write:
+            fut = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((ev, fut))
+        except asyncio.QueueFull:
+            self.metrics.reject("queue_full")
+            return 429, {"error": "queue full, retry later"}
+        if fut is not None and not await fut:
+            return 503, {"error": "could not store event, retry later"}
+        self.metrics.accepted += 1
+        return 202, {"ok": True}
+
+    async def _reply(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        obj: Any,
+        keep: bool = False,
+    ) -> None:
+        body = json.dumps(obj).encode()
+        head = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: " + ("keep-alive" if keep else "close"),
+        ]
+        if status == 429:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+async def serve(settings: Settings, host: str, port: int) -> None:
+    """Run an IngestServer until cancelled."""
+    server = IngestServer(settings)
+    bound = await server.start(host, port)
+    print(f"Listening on http://{host}:{bound}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Webhook ingestion server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--log-dir", type=Path, default=Path.home() / ".squirrelfocus"
+    )
+    parser.add_argument("--journals-dir", type=Path)
+    parser.add_argument(
+        "--journal-event",
+        action="append",
+        default=[],
+        metavar="SOURCE/EVENT",
+        help="Also write a journal stub for this event type.",
+    )
+    parser.add_argument("--queue-size", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Run N worker processes over a durable spool (SO_REUSEPORT).",
+    )
+    parser.add_argument(
+        "--spool",
+        type=Path,
+        help="Spool database for --workers (default LOG_DIR/webhooks.db).",
+    )
+    parser.add_argument(
+        "--allow-unsigned",
+        action="store_true",
+        help="Accept requests without a signature when no secret is set.",
+    )
+    args = parser.parse_args(argv)
+    secret = os.getenv("SF_WEBHOOK_SECRET", "").encode() or None
+    if secret is None and not args.allow_unsigned:
+        parser.error("set SF_WEBHOOK_SECRET or pass --allow-unsigned")
+    settings = Settings(
+        log_dir=args.log_dir,
+        secret=secret,
+        journals_dir=args.journals_dir,
+        journal_events=frozenset(args.journal_event),
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+    )
+    if args.workers > 0:
+        from . import workers
+
+        spool = args.spool or args.log_dir / "webhooks.db"
+        workers.serve(settings, spool, args.host, args.port, args.workers)
+        return
+    try:
+        asyncio.run(serve(settings, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Multi-process webhook ingestion over a shared durable spool.
+
+Every worker process runs an ``IngestServer`` on the same port through
+``SO_REUSEPORT``, so the kernel spreads connections across them and JSON
+parsing and HMAC checks scale with cores. Workers answer ``202`` only
+after the event is committed to the SQLite spool. The parent process is
+the single writer: it drains the spool into the acornlog in batches.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from functools import partial
+import multiprocessing
+from multiprocessing.synchronize import Event as MpEvent
+from pathlib import Path
+import signal
+import socket
+import time
+from typing import Any
+
+from .spool import Spool, drainer_lock
+from .webhook import IngestServer, Settings, write_batch
+
+PRUNE_EVERY = 3600.0
+
+
+def _worker(
+    settings: Settings, spool_path: Path, host: str, port: int, ready: MpEvent
+) -> None:
+    spool = Spool(spool_path, threadsafe=True)
+
+    async def main() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        # Clients wait for their ack, so lingering for a fuller batch only
+        # adds latency; requests that queue up during a commit still share
+        # the next one.
+        durable = replace(settings, ack_after_write=True, flush_interval=0)
+        server = IngestServer(durable, sink=spool.enqueue)
+        await server.start(host, port, reuse_port=True)
+        ready.set()
+        await stop.wait()
+        await server.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        spool.close()
+
+
+def reserve_port(host: str, port: int) -> socket.socket:
+    """Bind, without listening, a SO_REUSEPORT socket on HOST:PORT.
+
+    Holding it keeps an ephemeral port (PORT 0) ours until the workers
+    have bound it too. It never accepts connections itself.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise OSError("worker mode needs SO_REUSEPORT")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+class Pool:
+    """Worker processes plus the draining parent."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        spool_path: Path,
+        workers: int,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.settings = settings
+        self.spool_path = spool_path
+        self.host = host
+        self.workers = workers
+        self._reserved = reserve_port(host, port)
+        self.port: int = self._reserved.getsockname()[1]
+        self.procs: list[Any] = []
+        self.stopping = False
+        self.delivered = 0
+
+    def _spawn(self) -> Any:
+        ready = multiprocessing.Event()
+        proc = multiprocessing.Process(
+            target=_worker,
+            args=(self.settings, self.spool_path, self.host, self.port, ready),
+            daemon=True,
+        )
+        proc.start()
+        if not ready.wait(30):
+            raise RuntimeError("webhook worker failed to start")
+        return proc
+
+    def start(self) -> None:
+        Spool(self.spool_path).close()  # create the schema once
+        self.procs = [self._spawn() for _ in range(self.workers)]
+
+    def stop(self) -> None:
+        """Stop the workers; each flushes its in-memory queue first."""
+        self.stopping = True
+        for proc in self.procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self.procs:
+            proc.join()
+        self._reserved.close()
+
+    def run(self) -> None:
+        """Drain the spool until ``stopping`` is set.
+
+        The workers are then stopped and whatever they committed last is
+        drained too, so nothing accepted is left behind.
+        """
+        sink = partial(write_batch, self.settings)
+        spool = Spool(self.spool_path)
+        last_prune = 0.0
+        try:
+            with drainer_lock(self.spool_path):
+                while not self.stopping:
+                    self._respawn()
+                    n = spool.drain(sink, self.settings.batch_size)
+                    self.delivered += n
+                    if n == 0:
+                        time.sleep(self.settings.flush_interval)
+                    if time.monotonic() - last_prune > PRUNE_EVERY:
+                        spool.prune()
+                        last_prune = time.monotonic()
+                self.stop()
+                while n := spool.drain(sink, self.settings.batch_size):
+                    self.delivered += n
+        finally:
+            spool.close()
+
+    def _respawn(self) -> None:
+        for i, proc in enumerate(self.procs):
+            if not proc.is_alive() and not self.stopping:
+                self.procs[i] = self._spawn()
+
+
+def serve(
+    settings: Settings, spool_path: Path, host: str, port: int, workers: int
+) -> None:
+    """Run WORKERS ingestion processes and drain until SIGTERM or Ctrl-C."""
+    pool = Pool(settings, spool_path, workers, host, port)
+    pool.start()
+
+    def stop(*_: Any) -> None:
+        pool.stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Listening on http://{host}:{pool.port} ({workers} workers)")
+    try:
+        pool.run()
+    finally:
+        pool.stop()
+    print(f"Delivered {pool.delivered} events.")
@@ -4,8 +4,46 @@ HOOK=".git/hooks/commit-msg"
 cat > "$HOOK" <<'HOOK'
 #!/usr/bin/env bash
 set -euo pipefail
-root="$(git rev-parse --show-toplevel)"
-trailers="$(python3 "$root/scripts/sqf_emit.py" trailers || true)"
+{ read -r root; read -r cache; read -r index; read -r reflog; } < <(
+  git rev-parse --show-toplevel --git-path sqf-trailers \
+    --git-path index --git-path logs/HEAD
+)
+# The trailer cache written by `sqf_emit.py trailers --cache` holds the
+# journals directory and newest entry it was built from. It is fresh while
+# that entry exists and nothing it depends on is newer than the cache.
+# With git-based selection that includes the index and HEAD's reflog.
+fresh() {
+  local magic jdir newest
+  { read -r magic && read -r jdir && read -r newest; } < "$cache" || return 1
+  case "$magic" in
+    "sqf-trailers 1") ;;
+    "sqf-trailers 1 git")
+      if [ "$index" -nt "$cache" ] || [ "$reflog" -nt "$cache" ]; then
+        return 1
+      fi
+      ;;
+    *) return 1 ;;
+  esac
+  if [ "$root/.squirrelfocus/config.yaml" -nt "$cache" ] ||
+    [ "$root/scripts/sqf_emit.py" -nt "$cache" ]; then
+    return 1
+  fi
+  if [ -n "$newest" ] && [ ! -f "$newest" ]; then
+    return 1
+  fi
+  [ -d "$jdir" ] || return 0
+  [ -z "$(find "$jdir" -name '*.md' -newer "$cache" -print -quit)" ]
+}
+trailers=""
+if [ -f "$cache" ] && fresh; then
+  { read -r _; read -r _; read -r _; IFS= read -r -d '' trailers || true; } \
+    < "$cache"
+  trailers="${trailers%$'\n'}"
+else
+  trailers="$(
+    python3 "$root/scripts/sqf_emit.py" trailers --cache "$cache" || true
+  )"
+fi
 [ -z "$trailers" ] && exit 0
 echo "" >> "$1"
 echo "$trailers" >> "$1"
@@ -0,0 +1,93 @@
+"""
+Append notes to the acornlog through a running ``sf daemon``.
+
+Usage: sf_drop.py [--fsync] TEXT...
+       some-command | sf_drop.py [--fsync] -
+
+Each TEXT argument, or each non-empty stdin line with ``-``, becomes one
+entry. Only the standard library is imported, so a drop costs little more
+than interpreter startup. When no daemon is listening the entries are
+appended directly with the CLI's own ``cli/acornlog.py``, which is loaded
+without importing the rest of the ``cli`` package.
+"""
+
+import importlib.util
+import json
+import os
+import socket
+import sys
+from datetime import datetime
+from pathlib import Path
+
+LOG_DIR = Path.home() / ".squirrelfocus"
+# Kept in step with cli/daemon.py.
+SOCKET_NAME = "sf.sock"
+CONNECT_TIMEOUT = 1.0
+REPLY_TIMEOUT = 30.0
+
+
+def socket_path() -> Path:
+    env = os.getenv("SF_SOCKET")
+    return Path(env) if env else LOG_DIR / SOCKET_NAME
+
+
+def send(sock: Path, entries: list, fsync: bool) -> int:
+    req = {"entries": entries, "fsync": fsync}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(CONNECT_TIMEOUT)
+        conn.connect(str(sock))
+        conn.settimeout(REPLY_TIMEOUT)
+        try:
+            conn.sendall(json.dumps(req).encode() + b"\n")
+            with conn.makefile("rb") as fh:
+                line = fh.readline()
+        except TimeoutError:
+            raise RuntimeError("no reply from the daemon")
+    reply = json.loads(line) if line else {"error": "connection closed"}
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "unknown error"))
+    return int(reply["count"])
+
+
+def load_acornlog():
+    """Load cli/acornlog.py without running ``cli/__init__.py``."""
+    here = Path(__file__).resolve().parents[1] / "cli" / "acornlog.py"
+    path = here if here.exists() else None
+    if path is None:
+        spec = importlib.util.find_spec("cli")
+        if spec is None or not spec.submodule_search_locations:
+            raise SystemExit("sf_drop: cli package not found")
+        path = Path(list(spec.submodule_search_locations)[0]) / "acornlog.py"
+    spec = importlib.util.spec_from_file_location("sf_acornlog", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def main(argv: list) -> int:
+    fsync = "--fsync" in argv
+    args = [a for a in argv if a != "--fsync"]
+    if not args:
+        print(__doc__.strip().splitlines()[2], file=sys.stderr)
+        return 2
+    texts = [ln.rstrip("\r\n") for ln in sys.stdin] if args == ["-"] else args
+    entries = [[datetime.now().isoformat(), t] for t in texts if t.strip()]
+    if not entries:
+        return 0
+    try:
+        send(socket_path(), entries, fsync)
+        return 0
+    except OSError:
+        pass
+    except RuntimeError as exc:
+        print(f"sf_drop: daemon failed: {exc}", file=sys.stderr)
+        return 1
+    acornlog = load_acornlog()
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    records = [acornlog.Record(ts, text) for ts, text in entries]
+    acornlog.append(acornlog.active_log(LOG_DIR), records, fsync=fsync)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,22 +1,47 @@
 """
 Emit commit trailers or a CI run summary from the newest journal entry.
 Works with PyYAML if present; falls back to a simple parser if not.
+
+Usage: sqf_emit.py [trailers|summary]
+       sqf_emit.py trailers --cache FILE
+       sqf_emit.py range [REVS] [--since DATE] [--until DATE] [--max-chars N]
+
+``--cache FILE`` also records the trailers in FILE for the commit-msg hook,
+which reads them back in plain shell while no journal entry has changed.
+``range`` aggregates every entry changed in a git revision range (for
+example ``origin/main...HEAD``) or dated within a window into one summary.
+
+The module is also importable: the CLI calls ``render`` in-process so that
+``sf preview`` does not have to start a second interpreter.
 """
 
 import sys
 import os
+import argparse
 import glob
+import subprocess
+import importlib.util
+import json
+import mmap
+import re
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import chain, islice
+import multiprocessing
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CFG_PATH = os.path.join(ROOT, ".squirrelfocus", "config.yaml")
 
-try:
-    import yaml  # type: ignore
-
-    HAVE_YAML = True
-except Exception:
-    yaml = None
-    HAVE_YAML = False
+# PyYAML is optional and imported on first use (see ``get_yaml``), so runs
+# served from the caches never load it.
+yaml = None
+HAVE_YAML = importlib.util.find_spec("yaml") is not None
+# Version of the compiled config cache shared with cli/config.py.
+COMPILED_VERSION = 1
 
 DEF_CFG = {
     "journals_dir": "journal_logs",
@@ -28,28 +53,271 @@ DEF_CFG = {
         "- **Change:** {{change}}\n"
         "- **Proof:** {{proof}}\n"
     ),
+    "range_format": (
+        "#### {{date}} {{slug}}\n"
+        "- **Fix:** {{fix}}\n"
+        "- **Why:** {{why}}\n"
+        "- **Change:** {{change}}\n"
+        "- **Proof:** {{proof}}\n"
+    ),
+    "entry_selection": "mtime",
 }
 
 
-def newest_md(jdir: str) -> str | None:
-    pat = os.path.join(ROOT, jdir, "**", "*.md")
+MODES = ("trailers", "summary")
+# GitHub rejects step summaries and comments above 64 KiB.
+MAX_SUMMARY_CHARS = 60_000
+
+# Journal index: a SQLite cache under .squirrelfocus/cache/ recording each
+# entry's mtime, size and trailers, refreshed by rescanning only the
+# directories whose mtime changed. Bump INDEX_VERSION when the parsed
+# representation changes so stale caches are rebuilt.
+INDEX_VERSION = "2"
+CACHE_DIR = os.path.join(".squirrelfocus", "cache")
+# A directory modified this recently (ns) may change again within the same
+# mtime tick, so its mtime is not trusted until the next run.
+RACY_NS = 2_000_000_000
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY, parent TEXT, mtime INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, dir TEXT, mtime INTEGER, size INTEGER,
+    trailers TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+"""
+
+
+def newest_md(jdir: str, root: str = ROOT) -> str | None:
+    """Return the newest entry by scanning the whole tree (no index)."""
+    pat = os.path.join(root, jdir, "**", "*.md")
     files = [f for f in glob.glob(pat, recursive=True)]
     return max(files, key=os.path.getmtime) if files else None
 
 
+class Unsupported(ValueError):
+    """Frontmatter outside the subset ``parse_frontmatter`` understands."""
+
+
+_KEY_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_-]*):(?: +|$)")
+# Anything PyYAML rejects or treats specially (tabs, CR, NEL, the Unicode
+# line separators, BOM) is left to the full loader.
+_BAD_CHARS_RE = re.compile(
+    "[^\x0a\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe"
+    "\uff00-\ufffd\U00010000-\U0010ffff]"
+)
+# Plain scalars YAML 1.1 would resolve to int, float or timestamp.
+_NUMERIC_RE = re.compile(
+    r"""[-+]?(?:0b[01_]+|0[0-7_]+|(?:0|[1-9][0-9_]*)|0x[0-9a-fA-F_]+
+    |[1-9][0-9_]*(?::[0-5]?[0-9])+
+    |[0-9][0-9_]*\.[0-9_]*(?:[eE][-+][0-9]+)?|\.[0-9][0-9_]*(?:[eE][-+][0-9]+)?
+    |[0-9][0-9_]*(?::[0-5]?[0-9])+\.[0-9_]*|\.(?:inf|Inf|INF))
+    |\.(?:nan|NaN|NAN)|<<|=
+    |[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}(?:(?:[Tt]|[ \t]+)[0-9]{1,2}:[0-9]{2}:[0-9]{2}
+    (?:\.[0-9]*)?(?:[ \t]*(?:Z|[-+][0-9]{1,2}(?::[0-9]{2})?))?)?""",
+    re.X,
+)
+_NULLS = {"", "~", "null", "Null", "NULL"}
+_BOOLS = {
+    **dict.fromkeys("yes Yes YES true True TRUE on On ON".split(), True),
+    **dict.fromkeys("no No NO false False FALSE off Off OFF".split(), False),
+}
+_ESCAPES = {
+    "0": "\0",
+    "a": "\a",
+    "b": "\b",
+    "t": "\t",
+    "n": "\n",
+    "v": "\v",
+    "f": "\f",
+    "r": "\r",
+    "e": "\x1b",
+    " ": " ",
+    '"': '"',
+    "/": "/",
+    "\\": "\\",
+    "N": "\x85",
+    "_": "\xa0",
+    "L": "\u2028",
+    "P": "\u2029",
+}
+_SQUOTED_RE = re.compile(r"'((?:[^']|'')*)'")
+_DQUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"', re.S)
+_ESCAPE_RE = re.compile(
+    r"\\(x[0-9A-Fa-f]{2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.S
+)
+
+
+def _fold(segments: list[str], escaped_breaks: bool = False) -> str:
+    """Join the lines of a flow scalar using YAML line folding."""
+    if len(segments) == 1:
+        return segments[0]
+    out = [segments[0].rstrip(" \t")]
+    empty = 0
+    for i, seg in enumerate(segments[1:], 1):
+        last = i == len(segments) - 1
+        text = seg.lstrip(" \t") if last else seg.strip(" \t")
+        if not text and not last:
+            empty += 1
+            continue
+        prev = out[-1]
+        if escaped_breaks and _ends_escaped(prev):
+            out[-1] = prev[:-1]
+            out.append("\n" * empty)
+        else:
+            out.append("\n" * empty if empty else " ")
+        empty = 0
+        out.append(text)
+    return "".join(out)
+
+
+def _ends_escaped(text: str) -> bool:
+    tail = len(text) - len(text.rstrip("\\"))
+    return tail % 2 == 1
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+
+    def sub(m: re.Match) -> str:
+        code = m.group(1)
+        if len(code) > 1:
+            return chr(int(code[1:], 16))
+        if code not in _ESCAPES:
+            raise Unsupported(f"unknown escape \\{code}")
+        return _ESCAPES[code]
+
+    return _ESCAPE_RE.sub(sub, text)
+
+
+def _quoted(raw: str, quote: str) -> str:
+    """Parse a quoted scalar that must end RAW (apart from spaces)."""
+    m = (_SQUOTED_RE if quote == "'" else _DQUOTED_RE).match(raw)
+    if not m:
+        raise Unsupported("unterminated quoted scalar")
+    if raw[m.end() :].strip(" \n"):
+        raise Unsupported("content after quoted scalar")
+    segments = m.group(1).split("\n")
+    if quote == "'":
+        return _fold(segments).replace("''", "'")
+    for seg in segments[:-1]:
+        if seg.rstrip(" ") != seg and _ends_escaped(seg.rstrip(" ")):
+            raise Unsupported("escaped trailing whitespace")
+    # Folding happens before unescaping so escaped "\n"s are not folded.
+    return _unescape(_fold(segments, escaped_breaks=True))
+
+
+def _plain(lines: list[str]):
+    parts = [ln.strip(" ") for ln in lines]
+    first = parts[0]
+    if first[:1] in set("-?:,[]{}#&*!|>'\"%@`"):
+        raise Unsupported("indicator at start of plain scalar")
+    for part in parts:
+        if (
+            ": " in part
+            or " #" in part
+            or part.endswith(":")
+            or part.startswith("#")
+        ):
+            raise Unsupported("ambiguous plain scalar")
+    value = _fold(parts)
+    if value in _NULLS:
+        return None
+    if value in _BOOLS:
+        return _BOOLS[value]
+    if _NUMERIC_RE.fullmatch(value):
+        raise Unsupported("non-string plain scalar")
+    return value
+
+
+def _mapping(lines: list[str], ind_of: list[int], lo: int, hi: int) -> dict:
+    """Parse LINES[LO:HI] as a block mapping; IND_OF is -1 for blanks."""
+    out: dict = {}
+    base = -1
+    i = lo
+    while i < hi:
+        ind = ind_of[i]
+        line = lines[i]
+        if ind < 0 or line[ind] == "#":
+            i += 1
+            continue
+        if base < 0:
+            base = ind
+        if ind != base:
+            raise Unsupported("unexpected indentation")
+        m = _KEY_RE.match(line, ind)
+        if not m or m.group(1) in _BOOLS or m.group(1) in _NULLS:
+            raise Unsupported("not a simple mapping entry")
+        j = i + 1
+        while j < hi and (ind_of[j] < 0 or ind_of[j] > ind):
+            j += 1
+        k = j
+        while k > i + 1 and ind_of[k - 1] < 0:
+            k -= 1
+        rest = line[m.end() :].rstrip(" ")
+        first = rest[:1]
+        if first == "'" or first == '"':
+            raw = "\n".join([rest, *lines[i + 1 : k]]) if k > i + 1 else rest
+            value = _quoted(raw, first)
+        elif rest == "{}" or rest == "[]":
+            if k > i + 1:
+                raise Unsupported("content after flow collection")
+            value = {} if rest == "{}" else []
+        elif rest:
+            value = _plain([rest, *lines[i + 1 : k]])
+        elif any(
+            ind_of[c] >= 0 and lines[c][ind_of[c]] != "#"
+            for c in range(i + 1, k)
+        ):
+            value = _mapping(lines, ind_of, i + 1, k)
+        else:
+            value = None
+        out[m.group(1)] = value
+        i = j
+    return out
+
+
+def parse_frontmatter(text: str) -> dict:
+    """Parse the frontmatter subset SquirrelFocus writes itself.
+
+    Handles nested mappings of plain, single- and double-quoted scalars
+    (including escapes and folded multi-line values), ``{}``, ``[]``,
+    nulls and booleans. Anything else raises ``Unsupported`` so callers
+    can fall back to a full YAML loader.
+    """
+    if _BAD_CHARS_RE.search(text):
+        raise Unsupported("unsupported characters")
+    lines = text.split("\n")
+    ind_of = []
+    for line in lines:
+        body = line.lstrip(" ")
+        ind_of.append(len(line) - len(body) if body else -1)
+    return _mapping(lines, ind_of, 0, len(lines))
+
+
 def split_frontmatter(text: str) -> tuple[dict, str]:
     if not text.startswith("---"):
         return {}, text
     parts = text.split("---", 2)
     if len(parts) < 3:
         return {}, text
-    fm_text = parts[1]
-    body = parts[2]
+    return _load_frontmatter(parts[1]), parts[2]
+
+
+def _load_frontmatter(fm_text: str) -> dict:
+    try:
+        return parse_frontmatter(fm_text)
+    except Unsupported:
+        pass
     if HAVE_YAML:
         try:
-            return yaml.safe_load(fm_text) or {}, body  # type: ignore
+            return get_yaml().safe_load(fm_text) or {}
         except Exception:
-            return {}, body
+            return {}
     fm = {}
     trailers = {}
     lines = fm_text.splitlines()
@@ -68,51 +336,920 @@ def split_frontmatter(text: str) -> tuple[dict, str]:
                 in_tr = False
     if trailers:
         fm["trailers"] = trailers
-    return fm, body
+    return fm
 
 
-def load_cfg() -> dict:
-    if HAVE_YAML and os.path.exists(CFG_PATH):
+def entry_date(name: str) -> date | None:
+    """Return the date encoded in the first ten characters of NAME."""
+    ds = name[:10]
+    if len(ds) != 10 or ds[4] != "-" or ds[7] != "-":
+        return None
+    try:
+        return date.fromisoformat(ds)
+    except ValueError:
+        return None
+
+
+def _span(name: str, parent: tuple | None) -> tuple[date, date] | None:
+    """Return the dates a partition directory NAME covers, if any."""
+    try:
+        if len(name) == 4 and name.isdigit():
+            year = int(name)
+            return date(year, 1, 1), date(year, 12, 31)
+        if len(name) == 10:
+            day = entry_date(name)
+            return (day, day) if day else None
+        if len(name) == 7 and name[4] == "-":
+            first = date(int(name[:4]), int(name[5:]), 1)
+        elif len(name) == 2 and name.isdigit() and parent:
+            if parent[0].year != parent[1].year:
+                return None
+            first = date(parent[0].year, int(name), 1)
+        else:
+            return None
+    except ValueError:
+        return None
+    nxt = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, nxt - timedelta(days=1)
+
+
+def iter_dated(
+    base: str,
+    since: date | None = None,
+    until: date | None = None,
+    _span_of: tuple | None = None,
+):
+    """Yield ``(date, path)`` for dated entries under BASE in path order.
+
+    Directories named ``YYYY``, ``YYYY-MM``, ``YYYY-MM-DD`` or ``MM``
+    (inside a year) are skipped without listing them when they fall
+    outside SINCE..UNTIL (inclusive). Entries stream as they are found.
+    """
+    try:
+        with os.scandir(base) as it:
+            ents = [e for e in it if not e.name.startswith(".")]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    is_dir = {e.name: e.is_dir() for e in ents}
+    # Appending "/" to directory names reproduces full-path sort order.
+    for ent in sorted(ents, key=lambda e: e.name + "/" * is_dir[e.name]):
+        if is_dir[ent.name]:
+            span = _span(ent.name, _span_of)
+            if span and (
+                (since and span[1] < since) or (until and span[0] > until)
+            ):
+                continue
+            yield from iter_dated(ent.path, since, until, span)
+        elif ent.name.endswith(".md"):
+            day = entry_date(ent.name)
+            if day is None:
+                continue
+            if (since and day < since) or (until and day > until):
+                continue
+            yield day, ent.path
+
+
+def cache_dir(root: str = ROOT) -> str:
+    """Return the cache directory under ROOT, creating it if needed."""
+    cdir = os.path.join(root, CACHE_DIR)
+    if not os.path.isdir(cdir):
+        os.makedirs(cdir, exist_ok=True)
+        with open(os.path.join(cdir, ".gitignore"), "w") as fh:
+            fh.write("# Created by sqf_emit; safe to delete.\n*\n")
+    return cdir
+
+
+def open_index(jdir: str, root: str = ROOT) -> sqlite3.Connection:
+    """Open the journal index for JDIR, resetting it if it is stale."""
+    conn = sqlite3.connect(os.path.join(cache_dir(root), "journals.sqlite"))
+    conn.executescript(INDEX_SCHEMA)
+    key = f"{INDEX_VERSION}:{jdir}"
+    row = conn.execute("SELECT value FROM meta WHERE key = 'key'").fetchone()
+    if row is None or row[0] != key:
+        conn.executescript("DELETE FROM dirs; DELETE FROM files;")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('key', ?)", (key,))
+    return conn
+
+
+def _rel(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def _read_trailers(path: str) -> dict:
+    try:
+        return load_entry(path).get("trailers", {}) or {}
+    except (OSError, UnicodeDecodeError):
+        return {}
+
+
+def _drop_dir(conn: sqlite3.Connection, rel: str) -> None:
+    if not rel:
+        conn.executescript("DELETE FROM dirs; DELETE FROM files;")
+        return
+    pre = rel + "/"
+    conn.execute(
+        "DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+        (rel, len(pre), pre),
+    )
+    conn.execute(
+        "DELETE FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?",
+        (rel, len(pre), pre),
+    )
+
+
+def _index_file(conn: sqlite3.Connection, rel: str, st) -> None:
+    # Trailers are parsed lazily (see ``entry_trailers``) so a cold build
+    # only costs one stat per file.
+    conn.execute(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, NULL)",
+        (rel, os.path.dirname(rel), st.st_mtime_ns, st.st_size),
+    )
+
+
+def entry_trailers(conn: sqlite3.Connection, base: str, rel: str) -> dict:
+    """Return the cached trailers for REL, parsing the file on a miss."""
+    row = conn.execute(
+        "SELECT trailers FROM files WHERE path = ?", (rel,)
+    ).fetchone()
+    if row is not None and row[0] is not None:
+        return json.loads(row[0])
+    trailers = _read_trailers(os.path.join(base, rel))
+    conn.execute(
+        "UPDATE files SET trailers = ? WHERE path = ?",
+        (json.dumps(trailers, default=str), rel),
+    )
+    conn.commit()
+    return trailers
+
+
+def _scan_dir(conn: sqlite3.Connection, base: str, rel: str) -> list[str]:
+    """Sync one directory's rows with disk; return unseen subdirectories."""
+    full = os.path.join(base, rel) if rel else base
+    st = os.stat(full)
+    mtime = (
+        st.st_mtime_ns if time.time_ns() - st.st_mtime_ns > RACY_NS else None
+    )
+    subdirs = set()
+    seen = {}
+    with os.scandir(full) as it:
+        for ent in it:
+            if ent.name.startswith("."):
+                continue
+            if ent.is_dir():
+                subdirs.add(_rel(rel, ent.name))
+            elif ent.name.endswith(".md") and ent.is_file():
+                seen[_rel(rel, ent.name)] = ent.stat()
+    known = {
+        path: (ftime, size)
+        for path, ftime, size in conn.execute(
+            "SELECT path, mtime, size FROM files WHERE dir = ?", (rel,)
+        )
+    }
+    for path in known.keys() - seen.keys():
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    for path, fst in seen.items():
+        if known.get(path) != (fst.st_mtime_ns, fst.st_size):
+            _index_file(conn, path, fst)
+    old_subdirs = {
+        row[0]
+        for row in conn.execute(
+            "SELECT path FROM dirs WHERE parent = ?", (rel,)
+        )
+    }
+    for sub in old_subdirs - subdirs:
+        _drop_dir(conn, sub)
+    conn.execute(
+        "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+        (rel, os.path.dirname(rel) if rel else None, mtime),
+    )
+    return sorted(subdirs - old_subdirs)
+
+
+def refresh_index(conn: sqlite3.Connection, base: str) -> None:
+    """Rescan only the directories under BASE whose mtime changed.
+
+    Files edited in place do not change their directory's mtime, so apart
+    from the current newest entry (re-checked in ``newest``) such edits are
+    picked up the next time their directory changes.
+    """
+    known = dict(conn.execute("SELECT path, mtime FROM dirs"))
+    known.setdefault("", None)
+    stack = []
+    for rel, mtime in known.items():
         try:
-            with open(CFG_PATH, "r", encoding="utf-8") as fh:
-                data = yaml.safe_load(fh) or {}
-            out = dict(DEF_CFG)
-            out.update({k: v for k, v in data.items() if v is not None})
-            return out
-        except Exception:
+            st = os.stat(os.path.join(base, rel) if rel else base)
+        except FileNotFoundError:
+            _drop_dir(conn, rel)
+            continue
+        if mtime != st.st_mtime_ns:
+            stack.append(rel)
+    while stack:
+        rel = stack.pop()
+        try:
+            stack.extend(_scan_dir(conn, base, rel))
+        except FileNotFoundError:
+            _drop_dir(conn, rel)
+    conn.commit()
+
+
+def _newest_path(conn: sqlite3.Connection) -> str | None:
+    row = conn.execute(
+        "SELECT path FROM files ORDER BY mtime DESC, path DESC LIMIT 1"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def newest(jdir: str, root: str = ROOT) -> tuple[str, dict] | None:
+    """Return ``(path, frontmatter)`` of the newest entry via the index.
+
+    Falls back to a full scan when the index cannot be used.
+    """
+    base = os.path.join(root, jdir)
+    if not os.path.isdir(base):
+        return None
+    try:
+        conn = open_index(jdir, root)
+        try:
+            refresh_index(conn, base)
+            rel = _newest_path(conn)
+            if rel is None:
+                return None
+            # Catch in-place edits of the entry most likely being worked on.
+            st = os.stat(os.path.join(base, rel))
+            cur = conn.execute(
+                "SELECT mtime, size FROM files WHERE path = ?", (rel,)
+            ).fetchone()
+            if cur != (st.st_mtime_ns, st.st_size):
+                _index_file(conn, rel, st)
+                conn.commit()
+                rel = _newest_path(conn) or rel
+            trailers = entry_trailers(conn, base, rel)
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        path = newest_md(jdir, root)
+        return (path, load_entry(path)) if path else None
+    return os.path.join(base, rel), {"trailers": trailers}
+
+
+def get_yaml():
+    """Import PyYAML on first use and return it."""
+    global yaml
+    if yaml is None:
+        import yaml as mod  # type: ignore
+
+        yaml = mod
+    return yaml
+
+
+def _read_cfg() -> dict:
+    """Return raw config, preferring the compiled JSON cache."""
+    try:
+        st = os.stat(CFG_PATH)
+    except OSError:
+        return {}
+    stamp = [st.st_ino, st.st_mtime_ns, st.st_size]
+    cpath = os.path.join(os.path.dirname(CFG_PATH), "cache", "config.json")
+    try:
+        with open(cpath, "r", encoding="utf-8") as fh:
+            blob = json.load(fh)
+        if (
+            blob.get("version") == COMPILED_VERSION
+            and blob.get("stat") == stamp
+            and isinstance(blob.get("data"), dict)
+        ):
+            return blob["data"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    if not HAVE_YAML:
+        return {}
+    try:
+        with open(CFG_PATH, "r", encoding="utf-8") as fh:
+            data = get_yaml().safe_load(fh) or {}
+    except Exception:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    if time.time_ns() - st.st_mtime_ns > RACY_NS:
+        try:
+            text = json.dumps(
+                {"version": COMPILED_VERSION, "stat": stamp, "data": data}
+            )
+            if json.loads(text)["data"] == data:
+                cache_dir(os.path.dirname(os.path.dirname(CFG_PATH)))
+                tmp = f"{cpath}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    fh.write(text)
+                os.replace(tmp, cpath)
+        except (TypeError, ValueError, OSError):
             pass
-    return dict(DEF_CFG)
+    return data
 
 
-def main() -> None:
-    mode = sys.argv[1] if len(sys.argv) > 1 else "trailers"
-    cfg = load_cfg()
-    jdir = cfg.get("journals_dir", "journal_logs")
-    keys = cfg.get("trailer_keys", [])
-    tmpl = cfg.get("summary_format", "")
-    path = newest_md(jdir)
-    if not path:
-        print("", end="")
+def load_cfg() -> dict:
+    out = dict(DEF_CFG)
+    out.update({k: v for k, v in _read_cfg().items() if v is not None})
+    return out
+
+
+# Journal loading: frontmatter is read FM_BLOCK bytes at a time until its
+# closing "---", so the body is never read. Inputs of at least POOL_MIN
+# paths are parsed on a process pool, POOL_CHUNK paths per task.
+FM_BLOCK = 4096
+POOL_MIN = 2000
+POOL_CHUNK = 256
+
+
+def read_frontmatter(path: str) -> tuple[dict, int]:
+    """Return ``(frontmatter, body_offset)`` for the entry at PATH.
+
+    BODY_OFFSET is the byte offset where the body starts (0 when there is
+    no frontmatter). Only the frontmatter prefix of the file is read.
+    """
+    with open(path, "rb") as fh:
+        buf = fh.read(FM_BLOCK)
+        if not buf.startswith(b"---"):
+            return {}, 0
+        end = buf.find(b"---", 3)
+        while end < 0:
+            more = fh.read(FM_BLOCK)
+            if not more:
+                return {}, 0
+            start = max(3, len(buf) - 2)
+            buf += more
+            end = buf.find(b"---", start)
+    text = buf[3:end].decode("utf-8", errors="replace")
+    # Match text-mode reads, which translate newlines.
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return _load_frontmatter(text) or {}, end + 3
+
+
+def load_entry(path: str) -> dict:
+    """Return the frontmatter of the journal entry at PATH."""
+    return read_frontmatter(path)[0]
+
+
+def _load_chunk(paths: list[str]) -> list[tuple[str, dict, int]]:
+    return [(p, *read_frontmatter(p)) for p in paths]
+
+
+def _pool_context():
+    # Tasks name ``_load_chunk`` by module, so this module must be the one
+    # registered under its name, and workers must inherit it by forking: a
+    # spawned child could not import a script loaded from a file path.
+    mod = sys.modules.get(__name__)
+    if getattr(mod, "_load_chunk", None) is not _load_chunk:
+        return None
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+def iter_frontmatter(paths, workers: int | None = None):
+    """Yield ``(path, frontmatter, body_offset)`` for PATHS in input order.
+
+    PATHS may be any iterable and is consumed lazily. Once POOL_MIN paths
+    are pending, parsing moves to a pool of WORKERS processes (default:
+    one per CPU); ``workers=1`` keeps it in this process. Results stream
+    as they complete, and a consumer that stops early leaves the remaining
+    files unread.
+    """
+    it = iter(paths)
+    head = list(islice(it, POOL_MIN))
+    workers = workers or os.cpu_count() or 1
+    ctx = _pool_context()
+    if len(head) < POOL_MIN or workers < 2 or ctx is None:
+        for path in head:
+            yield (path, *read_frontmatter(path))
+        for path in it:
+            yield (path, *read_frontmatter(path))
         return
-    with open(path, "r", encoding="utf-8") as fh:
-        text = fh.read()
-    fm, _ = split_frontmatter(text)
-    trailers = (fm or {}).get("trailers", {}) or {}
+    chunks = iter(lambda: list(islice(it, POOL_CHUNK)), [])
+    first = [head[i : i + POOL_CHUNK] for i in range(0, POOL_MIN, POOL_CHUNK)]
+    pending: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        try:
+            for part in chain(first, chunks):
+                pending.append(pool.submit(_load_chunk, part))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+
+def intern_trailers(trailers: dict, keys) -> dict:
+    """Return TRAILERS with the keys listed in KEYS interned.
+
+    Entries then share one string per configured key. Other keys are kept
+    as parsed, since interned strings live as long as the process.
+    """
+    return {
+        sys.intern(k) if isinstance(k, str) and k in keys else k: v
+        for k, v in trailers.items()
+    }
+
+
+class JournalEntry:
+    """A journal entry whose body is read only when it is used.
+
+    ``date`` and ``slug`` come from the file name and ``trailers`` from
+    the frontmatter. ``body_offset`` is the byte offset of the body.
+    """
+
+    __slots__ = ("path", "date", "slug", "trailers", "body_offset", "_body")
+
+    def __init__(
+        self, path: str, trailers: dict | None = None, body_offset: int = 0
+    ) -> None:
+        name = os.path.splitext(os.path.basename(path))[0]
+        self.path = path
+        self.date = entry_date(name)
+        self.slug = name[11:] if self.date else name
+        self.trailers = trailers or {}
+        self.body_offset = body_offset
+        self._body: str | None = None
+
+    @classmethod
+    def from_frontmatter(
+        cls, path: str, fm: dict, body_offset: int = 0, keys=()
+    ) -> "JournalEntry":
+        trailers = fm.get("trailers") if isinstance(fm, dict) else None
+        if not isinstance(trailers, dict):
+            trailers = {}
+        return cls(path, intern_trailers(trailers, keys), body_offset)
+
+    @classmethod
+    def load(cls, path: str, keys=()) -> "JournalEntry":
+        """Read the frontmatter of the entry at PATH; KEYS are interned."""
+        return cls.from_frontmatter(path, *read_frontmatter(path), keys)
+
+    @property
+    def body(self) -> str:
+        """The body text, read from disk on first access."""
+        if self._body is None:
+            with open(self.path, "rb") as fh:
+                fh.seek(self.body_offset)
+                text = fh.read().decode("utf-8", errors="replace")
+            self._body = text.replace("\r\n", "\n").replace("\r", "\n")
+        return self._body
+
+    def mapped_body(self) -> memoryview:
+        """Return the raw body bytes as a view of a read-only memory map.
+
+        Nothing is read or copied until the view is sliced or scanned.
+        """
+        with open(self.path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size <= self.body_offset:
+                return memoryview(b"")
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)[self.body_offset :]
+
+
+def _filter_default(val: str, arg: str) -> str:
+    return val if val.strip() else arg
+
+
+def _filter_link(val: str, arg: str) -> str:
+    if val.startswith(("http://", "https://")):
+        return f"[{arg or val}]({val})"
+    return val
+
+
+# Template filters: ``{{key|name}}`` or ``{{key|name:"arg"}}``.
+FILTERS = {"default": _filter_default, "link": _filter_link}
+_SLOT_RE = re.compile(
+    r"""\s*(\w+)((?:\s*\|\s*\w+(?::(?:"(?:[^"\\]|\\.)*"|[^|"]*))?)*)\s*"""
+)
+_FILTER_RE = re.compile(r"""\|\s*(\w+)(?::("(?:[^"\\]|\\.)*"|[^|"]*))?""")
+
+
+def _parse_slot(spec: str) -> tuple | None:
+    """Return ``(key, filters)`` for a placeholder body, or None."""
+    m = _SLOT_RE.fullmatch(spec)
+    if not m:
+        return None
+    filters = []
+    for name, arg in _FILTER_RE.findall(m.group(2)):
+        if name not in FILTERS:
+            return None
+        arg = arg.strip()
+        if arg.startswith('"'):
+            arg = re.sub(r"\\(.)", r"\1", arg[1:-1])
+        filters.append((FILTERS[name], arg))
+    return m.group(1), tuple(filters)
+
+
+@lru_cache(maxsize=32)
+def compile_template(text: str) -> tuple:
+    """Tokenize TEXT once into literals and ``(key, filters, raw)`` slots.
+
+    Placeholders that do not parse (or use unknown filters) stay literal.
+    """
+    parts: list = []
+    pos = 0
+    while True:
+        start = text.find("{{", pos)
+        end = text.find("}}", start + 2) if start >= 0 else -1
+        if end < 0:
+            break
+        slot = _parse_slot(text[start + 2 : end])
+        if slot is None:
+            # Keep the braces literal and look for a placeholder after them.
+            parts.append(text[pos : start + 2])
+            pos = start + 2
+            continue
+        parts.append(text[pos:start])
+        parts.append((*slot, text[start : end + 2]))
+        pos = end + 2
+    parts.append(text[pos:])
+    return tuple(p for p in parts if p != "")
+
+
+def render_template(compiled: tuple, values: dict, keys) -> str:
+    """Render a compiled template in one pass.
+
+    Placeholders whose key is not in KEYS are left as they are.
+    """
+    out = []
+    for part in compiled:
+        if isinstance(part, str):
+            out.append(part)
+            continue
+        key, filters, raw = part
+        if key not in keys:
+            out.append(raw)
+            continue
+        val = values.get(key)
+        val = "" if val is None else str(val)
+        for fn, arg in filters:
+            val = fn(val, arg)
+        out.append(val)
+    return "".join(out)
+
+
+def render_many(tmpl: str, entries, keys) -> list[str]:
+    """Render TMPL for each trailers dict in ENTRIES, compiling it once."""
+    compiled = compile_template(tmpl)
+    known = frozenset(keys)
+    return [render_template(compiled, e, known) for e in entries]
+
+
+def render(mode: str, cfg: dict, entry: dict) -> str:
+    """Render ENTRY frontmatter as MODE using CFG; no I/O is performed."""
+    keys = cfg.get("trailer_keys", [])
+    trailers = entry.get("trailers", {}) or {}
     if mode == "trailers":
         lines = []
         for k in keys:
             val = str(trailers.get(k, "")).strip()
             if val:
                 lines.append(f"{k}: {val}")
-        print("\n".join(lines))
-        return
+        return "\n".join(lines)
     if mode == "summary":
-        msg = tmpl
-        for k in keys:
-            msg = msg.replace("{{" + k + "}}", str(trailers.get(k, "")))
-        print(msg)
+        tmpl = cfg.get("summary_format", "")
+        return render_many(tmpl, [trailers], keys)[0]
+    return ""
+
+
+# Trailer cache for the commit-msg hook: a magic line, the absolute journals
+# directory, the absolute path of the newest entry (empty if none), then the
+# trailer lines. The hook trusts it while no ``*.md`` under the directory,
+# nor the config or this script, is newer than the file itself. A " git"
+# suffix on the magic line adds the git index and HEAD to that list.
+TRAILER_CACHE_MAGIC = "sqf-trailers 1"
+
+
+def write_trailer_cache(
+    cache: str,
+    jdir: str,
+    path: str | None,
+    text: str,
+    started: int,
+    git: bool = False,
+) -> None:
+    """Record TEXT, rendered from PATH, in CACHE for the hook.
+
+    The file's mtime is set to RACY_NS before STARTED, the time the entries
+    were scanned, so that any entry written during or just before the scan
+    still looks newer to the hook and forces another Python run. GIT marks
+    a cache built by git-based selection, which the hook also invalidates
+    when the index or HEAD changes.
+    """
+    base = os.path.abspath(os.path.join(ROOT, jdir))
+    magic = TRAILER_CACHE_MAGIC + (" git" if git else "")
+    lines = [magic, base, os.path.abspath(path) if path else ""]
+    if any("\n" in line for line in lines):
+        return
+    body = "\n".join(lines + ([text] if text else [])) + "\n"
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(body)
+        stamp = started - RACY_NS
+        os.utime(tmp, ns=(stamp, stamp))
+        os.replace(tmp, cache)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+# An empty tree, to diff against when HEAD has no parent.
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+GIT_SELECT_VERSION = 2
+
+
+def _git_dir(root: str) -> str | None:
+    path = os.path.join(root, ".git")
+    if os.path.isdir(path):
+        return path
+    try:
+        with open(path, encoding="utf-8") as fh:
+            line = fh.readline().strip()
+    except OSError:
+        return None
+    if not line.startswith("gitdir: "):
+        return None
+    return os.path.normpath(os.path.join(root, line[len("gitdir: ") :]))
+
+
+def head_sha(gdir: str) -> str | None:
+    """Resolve HEAD in the git directory GDIR by reading its files.
+
+    Returns None for an unborn branch or anything unexpected; callers then
+    treat the state as uncacheable.
+    """
+    try:
+        with open(os.path.join(gdir, "HEAD"), encoding="utf-8") as fh:
+            head = fh.read().strip()
+        if not head.startswith("ref: "):
+            return head or None
+        ref = head[len("ref: ") :]
+        common = gdir
+        if os.path.isfile(os.path.join(gdir, "commondir")):
+            with open(os.path.join(gdir, "commondir"), encoding="utf-8") as fh:
+                common = os.path.join(gdir, fh.read().strip())
+        for base in (gdir, common):
+            try:
+                with open(os.path.join(base, ref), encoding="utf-8") as fh:
+                    return fh.read().strip() or None
+            except FileNotFoundError:
+                pass
+        with open(os.path.join(common, "packed-refs"), encoding="utf-8") as fh:
+            for line in fh:
+                sha, _, name = line.strip().partition(" ")
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+
+def _git_names(args: list[str], jdir: str, root: str) -> list[str] | None:
+    proc = subprocess.run(
+        ["git", "diff", "--name-only", "--diff-filter=AMR", "--no-renames"]
+        + args
+        + ["--", jdir],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return [ln for ln in proc.stdout.splitlines() if ln.endswith(".md")]
+
+
+def _newest_first(names: list[str]) -> list[str]:
+    return sorted(
+        names,
+        key=lambda p: (entry_date(os.path.basename(p)) or date.min, p),
+        reverse=True,
+    )
+
+
+def _git_diff_names(jdir: str, root: str) -> tuple[list[str], list[str]]:
+    # Staged entries and HEAD's own entries are listed separately, so that
+    # what is about to be committed always outranks the previous commit.
+    # Without a HEAD (or its parent) the empty tree stands in for it.
+    staged = _git_names(["--cached", "HEAD"], jdir, root)
+    if staged is None:
+        staged = _git_names(["--cached", EMPTY_TREE], jdir, root)
+        if staged is None:
+            raise OSError(f"git diff failed in {root}")
+    head = _git_names(["HEAD^", "HEAD"], jdir, root)
+    if head is None:
+        head = _git_names([EMPTY_TREE, "HEAD"], jdir, root) or []
+    return _newest_first(staged), _newest_first(head)
+
+
+def git_selected(
+    jdir: str, root: str = ROOT, staged_only: bool = False
+) -> list[str]:
+    """Return journal entries staged, then changed in HEAD, newest first.
+
+    Each group is ordered by the date in the entry's name, then path, so
+    the choice does not depend on checkout mtimes. STAGED_ONLY leaves out
+    HEAD's entries. Results are cached under ``.squirrelfocus/cache``
+    keyed on the HEAD commit and the index stat, so repeated calls for the
+    same state run no git command at all. Raises OSError when git is
+    unavailable or ROOT is not a work tree.
+    """
+    gdir = _git_dir(root)
+    if gdir is None:
+        raise OSError(f"{root} is not a git work tree")
+    sha = head_sha(gdir)
+    key = None
+    if sha is not None:
+        try:
+            st = os.stat(os.path.join(gdir, "index"))
+            stamp = [st.st_ino, st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            stamp = []
+        key = [GIT_SELECT_VERSION, sha, jdir, *stamp]
+    cache = os.path.join(cache_dir(root), "git-select.json")
+    found = None
+    if key is not None:
+        try:
+            with open(cache, encoding="utf-8") as fh:
+                blob = json.load(fh)
+            if blob.get("key") == key:
+                found = blob["staged"], blob["head"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+    if found is None:
+        found = _git_diff_names(jdir, root)
+        if key is not None:
+            tmp = f"{cache}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(
+                        {"key": key, "staged": found[0], "head": found[1]}, fh
+                    )
+                os.replace(tmp, cache)
+            except OSError:
+                pass
+    staged, head = found
+    names = (
+        staged
+        if staged_only
+        else staged + [p for p in head if p not in staged]
+    )
+    return [os.path.join(root, p) for p in names]
+
+
+def select_entry(
+    cfg: dict, root: str = ROOT, staged_only: bool = False
+) -> tuple[str, dict] | None:
+    """Return ``(path, frontmatter)`` of the entry to emit under CFG.
+
+    With ``entry_selection: git`` this is the newest staged entry, else
+    the newest changed in HEAD; otherwise, or when git names none, the
+    newest by mtime. STAGED_ONLY, used by the commit-msg hook, considers
+    staged entries only and returns None when git names none.
+    """
+    jdir = cfg.get("journals_dir", "journal_logs")
+    if cfg.get("entry_selection") == "git":
+        try:
+            paths = git_selected(jdir, root, staged_only)
+        except OSError:
+            return newest(jdir, root)
+        for path in paths:
+            if os.path.isfile(path):
+                return path, load_entry(path)
+        if staged_only:
+            return None
+    return newest(jdir, root)
+
+
+def git_changed(revs: str, jdir: str, root: str = ROOT) -> list[str]:
+    """Return journal files added or modified in the git range REVS."""
+    out = subprocess.run(
+        ["git", "diff", "--name-only", "--diff-filter=AMR", revs, "--", jdir],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    paths = (os.path.join(root, ln) for ln in out.splitlines())
+    return [p for p in paths if p.endswith(".md") and os.path.isfile(p)]
+
+
+def collect_range(
+    jdir: str,
+    revs: str | None = None,
+    since: date | None = None,
+    until: date | None = None,
+    root: str = ROOT,
+) -> list[str]:
+    """Return entry paths for a git range or a date window, oldest first."""
+    if revs:
+        paths = git_changed(revs, jdir, root)
+        if since or until:
+            paths = [
+                p
+                for p in paths
+                if (d := entry_date(os.path.basename(p)))
+                and not (since and d < since)
+                and not (until and d > until)
+            ]
+    else:
+        base = os.path.join(root, jdir)
+        paths = [p for _, p in iter_dated(base, since, until)]
+    return sorted(
+        paths, key=lambda p: (entry_date(os.path.basename(p)) or date.min, p)
+    )
+
+
+def load_entries(paths, workers: int | None = None, keys=()):
+    """Yield a JournalEntry for each of PATHS, in input order.
+
+    Loading goes through iter_frontmatter; KEYS are interned.
+    """
+    for path, fm, offset in iter_frontmatter(paths, workers):
+        yield JournalEntry.from_frontmatter(path, fm, offset, keys)
+
+
+def render_range(
+    cfg: dict,
+    paths: list[str],
+    entries,
+    max_chars: int = MAX_SUMMARY_CHARS,
+    root: str = ROOT,
+) -> str:
+    """Render one aggregated summary, truncated to about MAX_CHARS.
+
+    ENTRIES are JournalEntry objects for PATHS and may be a lazy
+    iterable; it is not consumed past the cap.
+    """
+    if not paths:
+        return ""
+    keys = frozenset([*cfg.get("trailer_keys", []), "date", "slug", "path"])
+    compiled = compile_template(
+        cfg.get("range_format", DEF_CFG["range_format"])
+    )
+    out = [f"### CI Triage ({len(paths)} entries)\n"]
+    size = len(out[0])
+    for i, entry in enumerate(islice(entries, len(paths))):
+        vals = dict(entry.trailers)
+        vals["date"] = entry.date.isoformat() if entry.date else ""
+        vals["slug"] = entry.slug
+        vals["path"] = os.path.relpath(entry.path, root)
+        block = render_template(compiled, vals, keys)
+        if size + len(block) + 1 > max_chars:
+            out.append(f"_...and {len(paths) - i} more entries._\n")
+            break
+        out.append(block)
+        size += len(block) + 1
+    return "\n".join(out).rstrip("\n")
+
+
+def range_main(argv: list[str], cfg: dict) -> str:
+    """Handle ``range [REVS] [--since D] [--until D] [--max-chars N]``."""
+    ap = argparse.ArgumentParser(prog="sqf_emit.py range")
+    ap.add_argument("revs", nargs="?", help="git range such as main...HEAD")
+    ap.add_argument("--since", type=date.fromisoformat)
+    ap.add_argument("--until", type=date.fromisoformat)
+    ap.add_argument("--max-chars", type=int, default=MAX_SUMMARY_CHARS)
+    args = ap.parse_args(argv)
+    jdir = cfg.get("journals_dir", "journal_logs")
+    try:
+        paths = collect_range(jdir, args.revs, args.since, args.until)
+    except subprocess.CalledProcessError as exc:
+        detail = " ".join((exc.stderr or "").split())
+        ap.error(f"git diff {args.revs} failed: {detail}")
+    keys = cfg.get("trailer_keys", [])
+    entries = load_entries(paths, keys=keys)
+    return render_range(cfg, paths, entries, args.max_chars)
+
+
+def main() -> None:
+    started = time.time_ns()
+    args = sys.argv[1:]
+    mode = args[0] if args else "trailers"
+    cfg = load_cfg()
+    if mode == "range":
+        out = range_main(args[1:], cfg)
+        print(out, end="\n" if out else "")
+        return
+    cache = None
+    if len(args) > 2 and args[1] == "--cache":
+        cache = args[2]
+    jdir = cfg.get("journals_dir", "journal_logs")
+    # The commit-msg hook (the only caller passing --cache) describes the
+    # commit being made, so it only looks at staged entries.
+    found = select_entry(cfg, staged_only=cache is not None)
+    if mode not in MODES:
+        print("", end="")
         return
-    print("", end="")
+    out = render(mode, cfg, found[1]) if found else ""
+    if cache and mode == "trailers":
+        git = cfg.get("entry_selection") == "git"
+        write_trailer_cache(cache, jdir, found and found[0], out, started, git)
+    print(out, end="\n" if out else "")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+import pytest
+
+import cli
+
+
+@pytest.fixture(autouse=True)
+def isolated_log_dir(tmp_path, monkeypatch):
+    """Keep caches and indexes written under LOG_DIR out of the real home."""
+    log_dir = tmp_path / ".squirrelfocus"
+    monkeypatch.setattr(cli, "LOG_DIR", log_dir)
+    monkeypatch.setattr(cli, "LOG_FILE", log_dir / "acornlog.txt")
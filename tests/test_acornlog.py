@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+from cli import acornlog
+
+
+def write(path: Path, data: bytes) -> Path:
+    path.write_bytes(data)
+    return path
+
+
+def test_tail_returns_last_lines(tmp_path):
+    log = write(tmp_path / "log.txt", b"a\nb\nc\nd\n")
+    assert acornlog.tail(log, 2) == ["c", "d"]
+
+
+def test_tail_count_exceeds_lines(tmp_path):
+    log = write(tmp_path / "log.txt", b"a\nb\n")
+    assert acornlog.tail(log, 10) == ["a", "b"]
+
+
+def test_tail_empty_file(tmp_path):
+    log = write(tmp_path / "log.txt", b"")
+    assert acornlog.tail(log, 3) == []
+
+
+def test_tail_missing_trailing_newline(tmp_path):
+    log = write(tmp_path / "log.txt", b"a\nb\nc")
+    assert acornlog.tail(log, 2) == ["b", "c"]
+    assert acornlog.tail(log, 1, block_size=1) == ["c"]
+
+
+def test_tail_small_blocks_match_readlines(tmp_path):
+    lines = [f"entry {i} " + "x" * (i % 7) for i in range(200)]
+    log = write(tmp_path / "log.txt", ("\n".join(lines) + "\n").encode())
+    for block in (1, 3, 16, 1024):
+        for count in (1, 5, 199, 200, 500):
+            assert acornlog.tail(log, count, block_size=block) == (
+                lines[-count:]
+            )
+
+
+def test_tail_utf8_across_block_boundary(tmp_path):
+    lines = ["naïve café", "🐿️ acorns", "日本語のメモ"]
+    log = write(tmp_path / "log.txt", ("\n".join(lines) + "\n").encode())
+    for block in range(1, 8):
+        assert acornlog.tail(log, 2, block_size=block) == lines[-2:]
+
+
+def test_tail_keeps_blank_lines_and_strips_crlf(tmp_path):
+    log = write(tmp_path / "log.txt", b"a\r\n\r\nb\r\n")
+    assert acornlog.tail(log, 3) == ["a", "", "b"]
+
+
+def stamp(i: int) -> str:
+    return (datetime(2025, 1, 1) + timedelta(minutes=i)).isoformat()
+
+
+def test_structured_round_trip(tmp_path):
+    log = tmp_path / "acornlog.jsonl"
+    recs = [
+        acornlog.Record(stamp(0), "multi\nline"),
+        acornlog.Record(stamp(1), 'quote " and \\ slash'),
+    ]
+    acornlog.append(log, recs)
+    assert len(log.read_bytes().splitlines()) == 2
+    assert acornlog.tail_records(log, 5) == recs
+    assert list(acornlog.iter_records(log)) == recs
+
+
+def test_index_checkpoints_every_n_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(acornlog, "INDEX_EVERY", 4)
+    log = tmp_path / "acornlog.jsonl"
+    for i in range(10):
+        acornlog.append(log, [acornlog.Record(stamp(i), f"n{i}")])
+    points = acornlog.read_index(log)
+    assert [p[0] for p in points] == [4, 8]
+    with log.open("rb") as fh:
+        for number, offset, _ in points:
+            fh.seek(offset)
+            assert json.loads(fh.readline())["text"] == f"n{number}"
+
+
+def test_read_range_seeks_to_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(acornlog, "INDEX_EVERY", 8)
+    log = tmp_path / "acornlog.jsonl"
+    acornlog.append(
+        log, [acornlog.Record(stamp(i), f"n{i}") for i in range(100)]
+    )
+    offsets = []
+    real = acornlog.iter_records
+
+    def spy(path, offset=0):
+        offsets.append(offset)
+        return real(path, offset)
+
+    monkeypatch.setattr(acornlog, "iter_records", spy)
+    since = datetime.fromisoformat(stamp(50))
+    until = datetime.fromisoformat(stamp(60))
+    got = [r.text for r in acornlog.read_range(log, since, until)]
+    assert got == [f"n{i}" for i in range(50, 61)]
+    assert offsets[0] > 0
+
+
+@pytest.mark.parametrize("name", ["acornlog.txt", "acornlog.jsonl"])
+def test_read_range_with_out_of_order_timestamps(tmp_path, monkeypatch, name):
+    monkeypatch.setattr(acornlog, "INDEX_EVERY", 4)
+    log = tmp_path / name
+    late = acornlog.Record("2025-03-01T00:00:00", "march")
+    recs = [acornlog.Record(stamp(i), f"n{i}") for i in range(20)]
+    recs.insert(5, late)
+    for rec in recs:
+        acornlog.append(log, [rec])
+    since = datetime.fromisoformat(stamp(10))
+    until = datetime(2025, 1, 31)
+    got = [r.text for r in acornlog.read_range(log, since, until)]
+    assert got == [f"n{i}" for i in range(10, 20)]
+    jan = datetime(2025, 1, 1)
+    assert len(list(acornlog.read_range(log, jan, until))) == 20
+    highs = [p[2] for p in acornlog.read_index(log)]
+    assert highs == sorted(highs)
+
+
+def test_migrate_is_lossless(tmp_path):
+    src = tmp_path / "acornlog.txt"
+    data = (
+        f"{stamp(0)} first\n".encode()
+        + b"no timestamp here\n"
+        + b"\n"
+        + f"{stamp(1)} crlf\r\n".encode()
+        + f"{stamp(2)}  two spaces \n".encode()
+        + f"{stamp(3)} bad \xff bytes\n".encode("latin-1")
+    )
+    src.write_bytes(data)
+    dst = tmp_path / "acornlog.jsonl"
+    assert acornlog.migrate(src, dst) == 6
+    assert all(json.loads(ln) for ln in dst.read_bytes().splitlines())
+    recs = list(acornlog.iter_records(dst))
+    assert recs[1] == acornlog.Record(None, "no timestamp here")
+    exported = b"".join(acornlog.encode(r, False) for r in recs)
+    assert exported == data
+
+
+def test_migrate_ignores_rotation_policy(tmp_path):
+    src = tmp_path / "acornlog.txt"
+    src.write_text("".join(f"{stamp(i)} line {i}\n" for i in range(500)))
+    dst = tmp_path / "acornlog.jsonl"
+    acornlog.configure(dst, acornlog.Policy(max_bytes=4000))
+    assert acornlog.migrate(src, dst) == 500
+    assert len(list(acornlog.iter_records(dst))) == 500
+    assert acornlog.segments(tmp_path) == []
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "acornlog.jsonl",
+        "acornlog.jsonl.idx",
+        "acornlog.manifest.json",
+        "acornlog.txt",
+    ]
+
+
+def test_text_log_compat_reader(tmp_path):
+    log = tmp_path / "acornlog.txt"
+    acornlog.append(log, [acornlog.Record(stamp(0), "hello")])
+    assert log.read_text() == f"{stamp(0)} hello\n"
+    assert acornlog.tail_records(log, 1) == [
+        acornlog.Record(stamp(0), "hello")
+    ]
+    assert acornlog.active_log(tmp_path) == log
+    (tmp_path / "acornlog.jsonl").touch()
+    assert acornlog.active_log(tmp_path).name == "acornlog.jsonl"
+
+
+def _writer(args):
+    path, worker, batches = args
+    for b in range(batches):
+        text = f"w{worker}b{b} " + chr(0x61 + worker % 26) * 20_000
+        recs = [acornlog.Record(stamp(b), f"{text} {i}") for i in range(3)]
+        acornlog.append(Path(path), recs)
+
+
+@pytest.mark.parametrize("name", ["acornlog.txt", "acornlog.jsonl"])
+def test_concurrent_writers_never_interleave(tmp_path, monkeypatch, name):
+    monkeypatch.setattr(acornlog, "INDEX_EVERY", 16)
+    log = tmp_path / name
+    workers, batches = 32, 5
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(workers) as pool:
+        pool.map(_writer, [(str(log), w, batches) for w in range(workers)])
+    recs = list(acornlog.iter_records(log))
+    assert len(recs) == workers * batches * 3
+    seen = set()
+    for rec in recs:
+        tag, body, i = rec.text.split(" ")
+        assert len(set(body)) == 1 and len(body) == 20_000
+        seen.add((tag, i))
+    assert len(seen) == len(recs)
+    if name.endswith(".jsonl"):
+        points = acornlog.read_index(log)
+        assert [p[0] for p in points] == list(range(16, len(recs), 16))
+        with log.open("rb") as fh:
+            starts = [0] + [fh.tell() for _ in iter(fh.readline, b"")]
+        assert all(starts[n] == off for n, off, _ in points)
+
+
+def test_cli_drop_stdin_from_many_processes(tmp_path):
+    env = {**os.environ, "HOME": str(tmp_path)}
+    root = Path(__file__).resolve().parents[1]
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", "import cli; cli.app()", "drop", "--stdin"],
+            cwd=root,
+            env=env,
+            stdin=subprocess.PIPE,
+        )
+        for _ in range(12)
+    ]
+    for n, proc in enumerate(procs):
+        lines = "".join(f"p{n} line {i}\n" for i in range(50))
+        proc.communicate(lines.encode())
+        assert proc.returncode == 0
+    log = tmp_path / ".squirrelfocus" / "acornlog.txt"
+    recs = list(acornlog.iter_records(log))
+    assert len(recs) == 600
+    assert {r.text for r in recs} == {
+        f"p{n} line {i}" for n in range(12) for i in range(50)
+    }
+
+
+def test_rotation_by_size_reads_across_segments(tmp_path, monkeypatch):
+    log = tmp_path / "acornlog.jsonl"
+    acornlog.configure(log, acornlog.Policy(max_bytes=600, compress="gzip"))
+    recs = [
+        acornlog.Record(stamp(i), f"note {i} " + "x" * 40) for i in range(40)
+    ]
+    for rec in recs:
+        acornlog.append(log, [rec])
+    segs = acornlog.segments(tmp_path)
+    assert len(segs) > 3 and all(s.path.suffix == ".gz" for s in segs)
+    assert log.stat().st_size <= 600
+    assert segs[0].first == stamp(0)
+    assert sum(s.records for s in segs) + len(acornlog.tail(log, 99)) == 40
+    everything = [r for s in segs for r in acornlog.iter_records(s.path)]
+    assert everything + list(acornlog.iter_records(log)) == recs
+    assert acornlog.tail_all(log, 25) == recs[-25:]
+
+    opened = []
+    real = acornlog.iter_records
+
+    def spy(path, offset=0):
+        opened.append(Path(path).name)
+        return real(path, offset)
+
+    monkeypatch.setattr(acornlog, "iter_records", spy)
+    since = datetime.fromisoformat(stamp(12))
+    until = datetime.fromisoformat(stamp(14))
+    got = list(acornlog.range_all(log, since, until))
+    assert got == recs[12:15]
+    assert len(opened) < len(segs)
+
+
+def test_rotation_by_month(tmp_path):
+    log = tmp_path / "acornlog.txt"
+    acornlog.configure(log, acornlog.Policy(monthly=True))
+    jan = acornlog.Record("2025-01-31T23:00:00", "january")
+    feb = acornlog.Record("2025-02-01T01:00:00", "february")
+    acornlog.append(log, [jan])
+    acornlog.append(log, [jan])
+    acornlog.append(log, [feb])
+    (seg,) = acornlog.segments(tmp_path)
+    assert seg.path.name == "acornlog.00001.txt"
+    assert (seg.first, seg.last, seg.records) == (jan.ts, jan.ts, 2)
+    assert list(acornlog.iter_records(log)) == [feb]
+    manifest = json.loads(acornlog.manifest_path(tmp_path).read_text())
+    assert manifest["segments"][0]["name"] == seg.path.name
+
+
+def test_rotation_keeps_concurrent_writes(tmp_path):
+    log = tmp_path / "acornlog.jsonl"
+    acornlog.configure(log, acornlog.Policy(max_bytes=300_000))
+    workers, batches = 8, 5
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(workers) as pool:
+        pool.map(_writer, [(str(log), w, batches) for w in range(workers)])
+    segs = acornlog.segments(tmp_path)
+    assert segs
+    recs = [r for s in segs for r in acornlog.iter_records(s.path)]
+    recs += list(acornlog.iter_records(log))
+    assert len({r.text for r in recs}) == len(recs) == workers * batches * 3
+
+
+def test_cli_show_and_search_span_segments(tmp_path, monkeypatch):
+    from typer.testing import CliRunner
+
+    import cli
+
+    runner = CliRunner()
+    monkeypatch.chdir(tmp_path)
+    for text in ("older acorn", "middle acorn"):
+        assert runner.invoke(cli.app, ["drop", text]).exit_code == 0
+    # Index the live log first, so rotation truncates an indexed file.
+    assert "middle" in runner.invoke(cli.app, ["search", "acorn"]).output
+    result = runner.invoke(
+        cli.app, ["rotate-log", "--compress", "gzip", "--now"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "Moved 2 entries to acornlog.00001.txt.gz." in result.output
+    newest = "newest acorn " + "padding " * 20
+    runner.invoke(cli.app, ["drop", newest.strip()])
+    shown = runner.invoke(cli.app, ["show", "3"]).output.splitlines()
+    assert [line.split(" ", 1)[1] for line in shown] == [
+        "older acorn",
+        "middle acorn",
+        newest.strip(),
+    ]
+    found = runner.invoke(cli.app, ["search", "older"])
+    assert found.exit_code == 0 and "[older] acorn" in found.output
+    hits = runner.invoke(cli.app, ["search", "acorn"]).output.splitlines()
+    assert len(hits) == 3
+    assert "[newest]" in runner.invoke(cli.app, ["search", "newest"]).output
+    bad = runner.invoke(cli.app, ["rotate-log", "--compress", "lz4"])
+    assert bad.exit_code != 0
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from cli import askcache
+
+
+def test_key_depends_on_model_prompt_and_question():
+    base = askcache.cache_key("m", "prompt", "q")
+    assert base == askcache.cache_key("m", "prompt", "q")
+    assert base != askcache.cache_key("m2", "prompt", "q")
+    assert base != askcache.cache_key("m", "prompt v2", "q")
+    assert base != askcache.cache_key("m", "prompt", "q?")
+    local = askcache.cache_key("m", "prompt", "q", base_url="http://local")
+    assert local not in (base, askcache.cache_key("m", "prompt", "q", "ctx"))
+    assert base != askcache.cache_key("m", "prompt", "q", max_tokens=64)
+    joined = askcache.cache_key("m", "prompt", "q\0ctx")
+    assert joined != askcache.cache_key("m", "prompt", "q", "ctx")
+
+
+def test_ttl_expires_entries(tmp_path, monkeypatch):
+    cache = askcache.ResponseCache(tmp_path / "c.db", ttl=60, max_bytes=1000)
+    now = [1000.0]
+    monkeypatch.setattr(askcache.time, "time", lambda: now[0])
+    cache.put("k", "m", "answer")
+    now[0] += 59
+    assert cache.get("k") == "answer"
+    now[0] += 2
+    assert cache.get("k") is None
+    cache.close()
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, monkeypatch):
+    cache = askcache.ResponseCache(tmp_path / "c.db", ttl=1e9, max_bytes=25)
+    now = [0.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(askcache.time, "time", tick)
+    cache.put("a", "m", "x" * 10)
+    cache.put("b", "m", "y" * 10)
+    assert cache.get("a") == "x" * 10
+    cache.put("c", "m", "z" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 10
+    cache.close()
@@ -0,0 +1,96 @@
+from pathlib import Path
+import time
+
+from typer.testing import CliRunner
+
+import cli
+from cli import backends
+
+runner = CliRunner()
+KEYS = ["fix", "why", "change", "proof", "ref"]
+
+ENTRIES = [
+    (
+        "journal_logs/2025-02-01-docs.md",
+        {"fix": "docs: refresh README", "change": "rewrite install section"},
+    ),
+    (
+        "journal_logs/2025-01-01-ci.md",
+        {
+            "fix": "ci/sentinel: stabilize network probe",
+            "why": "network probe flaky in CI",
+            "change": "add curl backoff",
+            "proof": "artifacts/network.txt",
+        },
+    ),
+]
+
+
+def test_template_follows_the_closest_entry():
+    backend = backends.TemplateBackend(ENTRIES, KEYS)
+    item = backend.complete("", "The CI network probe fails again")
+    lines = item.splitlines()
+    assert lines[0] == "Title: The CI network probe fails again"
+    assert "Type: bug" in lines
+    assert lines[3].startswith("Tags: ci,network,probe")
+    assert "  1. Review 2025-01-01-ci.md: ci/sentinel: stabilize" in item
+    assert "  3. Verify as before: artifacts/network.txt" in item
+    assert all(len(line) < 79 for line in lines)
+
+
+def test_template_without_history_and_speed():
+    backend = backends.TemplateBackend(ENTRIES, KEYS)
+    item = backend.complete("", "Plan the quarterly roadmap " * 10)
+    assert "Type: task" in item
+    assert "Pin down the scope of: plan the quarterly" in item
+    assert all(len(line) < 79 for line in item.splitlines())
+    start = time.perf_counter()
+    for _ in range(1000):
+        backend.complete("", "Add retries to the network probe")
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def test_ask_template_backend_from_config(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with runner.isolated_filesystem():
+        Path(".squirrelfocus").mkdir()
+        Path(".squirrelfocus/config.yaml").write_text(
+            "journals_dir: journal_logs\nask_backend: template\n"
+        )
+        jdir = Path("journal_logs")
+        jdir.mkdir()
+        (jdir / "2024-01-01-lint.md").write_text(
+            "---\n"
+            "trailers:\n"
+            "  fix: lint job ignores ruff config\n"
+            "  change: pass --config to ruff\n"
+            "  proof: ci run 42\n"
+            "---\n"
+        )
+        result = runner.invoke(cli.app, ["ask", "Ruff lint misses files"])
+        assert result.exit_code == 0, result.output
+        assert "Review 2024-01-01-lint.md: lint job ignores" in result.output
+        assert not (cli.LOG_DIR / "ask-cache.db").exists()
+
+        batch = runner.invoke(
+            cli.app, ["ask", "--batch", "-"], input="one\ntwo\n"
+        )
+        assert batch.exit_code == 0
+        assert len(batch.output.splitlines()) == 2
+
+
+def test_ask_backend_config_is_validated():
+    with runner.isolated_filesystem():
+        Path(".squirrelfocus").mkdir()
+        Path(".squirrelfocus/config.yaml").write_text(
+            "journals_dir: journal_logs\nask_backend: carrier-pigeon\n"
+        )
+        result = runner.invoke(cli.app, ["ask", "anything"])
+        assert result.exit_code == 1
+        assert "Config key 'ask_backend' malformed." in result.output
+
+        Path(".squirrelfocus/config.yaml").write_text(
+            "journals_dir: journal_logs\nask_timeout: 30\n"
+        )
+        result = runner.invoke(cli.app, ["hello"])
+        assert result.exit_code == 0
@@ -1,7 +1,10 @@
 from datetime import date, timedelta
+import json
+import os
 import re
 from typer.testing import CliRunner
 import cli
+import cli.emit
 
 runner = CliRunner()
 
@@ -62,6 +65,46 @@ def test_show_outputs_recent_entries(tmp_path, monkeypatch):
     assert lines == ["entry2", "entry3"]
 
 
+def test_migrate_log_then_show_range(tmp_path, monkeypatch):
+    log_dir, log_file = setup_tmp_log(tmp_path, monkeypatch)
+    log_dir.mkdir()
+    log_file.write_text(
+        "2025-01-01T09:00:00 old\n"
+        "2025-01-02T09:00:00 mid\n"
+        "2025-01-03T09:00:00 new\n"
+    )
+    result = runner.invoke(cli.app, ["migrate-log"])
+    assert result.exit_code == 0
+    assert "Migrated 3 entries" in result.output
+    again = runner.invoke(cli.app, ["migrate-log"])
+    assert again.exit_code == 1
+    monkeypatch.setattr(cli, "LOG_FILE", log_dir / "acornlog.jsonl")
+    assert runner.invoke(cli.app, ["drop", "fresh"]).exit_code == 0
+    result = runner.invoke(
+        cli.app,
+        ["show", "5", "--since", "2025-01-02", "--until", "2025-01-02"],
+    )
+    assert result.output.strip() == "2025-01-02T09:00:00 mid"
+    result = runner.invoke(cli.app, ["show", "2"])
+    assert result.output.splitlines()[0] == "2025-01-03T09:00:00 new"
+    assert result.output.splitlines()[1].endswith(" fresh")
+
+
+def test_show_until_date_covers_the_whole_day(tmp_path, monkeypatch):
+    log_dir, log_file = setup_tmp_log(tmp_path, monkeypatch)
+    log_dir.mkdir()
+    log_file.write_text(
+        "2024-01-05T23:59:59.500000 late\n"
+        "2024-01-05T23:59:59.999999 last\n"
+        "2024-01-06T00:00:00 next day\n"
+    )
+    result = runner.invoke(cli.app, ["show", "5", "--until", "2024-01-05"])
+    assert result.output.splitlines() == [
+        "2024-01-05T23:59:59.500000 late",
+        "2024-01-05T23:59:59.999999 last",
+    ]
+
+
 def test_show_no_log(tmp_path, monkeypatch):
     setup_tmp_log(tmp_path, monkeypatch)
     result = runner.invoke(cli.app, ["show", "1"])
@@ -268,6 +311,74 @@ def test_report_ignores_future_files(tmp_path, monkeypatch):
     assert str(future_file) not in lines
 
 
+def make_partitioned(tmp_path):
+    jdir = tmp_path / "journal_logs"
+    for name in (
+        "2019/12/2019-12-31-old.md",
+        "2020/01/2020-01-05-a.md",
+        "2020/02/2020-02-10-b.md",
+        "2020-03/2020-03-01-c.md",
+        "2021/2021-06-01-d.md",
+    ):
+        path = jdir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"---\ntrailers:\n  fix: {path.stem[11:]}\n---\n")
+    return jdir
+
+
+def test_report_since_until_limit(tmp_path, monkeypatch):
+    jdir = make_partitioned(tmp_path)
+    monkeypatch.setattr(cli, "load_cfg", lambda: {"journals_dir": str(jdir)})
+    result = runner.invoke(
+        cli.app, ["report", "--since", "2020-01-01", "--until", "2020-12-31"]
+    )
+    assert result.exit_code == 0
+    lines = result.output.split()
+    assert lines == sorted(lines)
+    names = sorted(line.rsplit("/", 1)[1] for line in lines)
+    assert names == ["2020-01-05-a.md", "2020-02-10-b.md", "2020-03-01-c.md"]
+    result = runner.invoke(
+        cli.app, ["report", "--since", "2020-03-01", "--limit", "1"]
+    )
+    assert result.output.strip().endswith("2020-03-01-c.md")
+
+
+def test_report_skips_partitions_outside_range(tmp_path, monkeypatch):
+    jdir = make_partitioned(tmp_path)
+    monkeypatch.setattr(cli, "load_cfg", lambda: {"journals_dir": str(jdir)})
+    mod = cli.emit.load()
+    listed = []
+    orig = mod.os.scandir
+
+    def spy(path):
+        listed.append(os.path.relpath(path, jdir))
+        return orig(path)
+
+    monkeypatch.setattr(mod.os, "scandir", spy)
+    result = runner.invoke(cli.app, ["report", "--since", "2021-01-01"])
+    assert result.exit_code == 0
+    assert sorted(listed) == [".", "2021"]
+
+
+def test_report_jsonl(tmp_path, monkeypatch):
+    jdir = make_partitioned(tmp_path)
+    monkeypatch.setattr(cli, "load_cfg", lambda: {"journals_dir": str(jdir)})
+    result = runner.invoke(
+        cli.app, ["report", "--format", "jsonl", "--until", "2019-12-31"]
+    )
+    assert result.exit_code == 0
+    rec = json.loads(result.output)
+    assert rec["date"] == "2019-12-31"
+    assert rec["trailers"] == {"fix": "old"}
+    assert rec["path"].endswith("2019-12-31-old.md")
+
+
+def test_report_bad_since():
+    result = runner.invoke(cli.app, ["report", "--since", "yesterday"])
+    assert result.exit_code != 0
+    assert "--since must be a date" in result.output
+
+
 def test_init_help():
     result = runner.invoke(cli.app, ["init", "--help"])
     assert result.exit_code == 0
@@ -291,3 +402,87 @@ def test_init_idempotent():
         assert second.exit_code == 0
         assert "created" not in second.output
         assert "No changes." in second.output
+
+
+def test_search_log_and_journals(tmp_path, monkeypatch):
+    log_dir, log_file = setup_tmp_log(tmp_path, monkeypatch)
+    jdir = tmp_path / "journal_logs"
+    jdir.mkdir()
+    (jdir / "2025-01-02-x.md").write_text(
+        "---\ntrailers:\n  fix: flaky squirrel test\n---\nbody\n"
+    )
+    monkeypatch.setattr(cli, "load_cfg", lambda: {"journals_dir": str(jdir)})
+    runner.invoke(cli.app, ["drop", "squirrel spotted"])
+    result = runner.invoke(cli.app, ["search", "squirrel"])
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert len(lines) == 2
+    assert any("acornlog" in ln and "[squirrel]" in ln for ln in lines)
+    result = runner.invoke(cli.app, ["search", "fix:squirrel"])
+    assert result.output.startswith("2025-01-02")
+    assert len(list((log_dir / "search").glob("*.db"))) == 1
+    result = runner.invoke(cli.app, ["search", "nothing-here"])
+    assert result.exit_code == 1
+
+
+def test_search_is_scoped_to_the_project(tmp_path, monkeypatch):
+    setup_tmp_log(tmp_path, monkeypatch)
+    for name in ("projA", "projB"):
+        jdir = tmp_path / name / "journal_logs"
+        jdir.mkdir(parents=True)
+        (jdir / f"2025-01-01-{name}.md").write_text(
+            f"---\ntrailers:\n  fix: {name} squirrel\n  cause: acorns\n---\n"
+        )
+    cfg = {
+        "journals_dir": "journal_logs",
+        "trailer_keys": ["fix", "cause"],
+    }
+    monkeypatch.setattr(cli, "load_cfg", lambda: cfg)
+    monkeypatch.chdir(tmp_path / "projA")
+    assert "projA" in runner.invoke(cli.app, ["search", "squirrel"]).output
+    (tmp_path / "projA" / "journal_logs" / "2025-01-01-projA.md").unlink()
+    monkeypatch.chdir(tmp_path / "projB")
+    result = runner.invoke(cli.app, ["search", "squirrel"])
+    assert result.output.splitlines() == [
+        "2025-01-01  journal_logs/2025-01-01-projB.md  projB [squirrel]"
+    ]
+    result = runner.invoke(cli.app, ["search", "cause:acorns"])
+    assert "projB" in result.output and "projA" not in result.output
+
+
+class CountingClient:
+    calls = 0
+
+    def __init__(self, api_key):
+        class Completions:
+            def create(self, model, messages):
+                CountingClient.calls += 1
+                content = f"item {CountingClient.calls}"
+                msg = type("M", (), {"content": content})
+                return type(
+                    "R", (), {"choices": [type("C", (), {"message": msg})]}
+                )
+
+        self.chat = type("Chat", (), {"completions": Completions()})()
+
+
+def test_ask_caches_responses(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "token")
+    CountingClient.calls = 0
+    monkeypatch.setattr(cli.openai, "OpenAI", CountingClient)
+    first = runner.invoke(cli.app, ["ask", "same question"])
+    again = runner.invoke(cli.app, ["ask", "same question"])
+    assert first.output == again.output == "item 1\n"
+    assert CountingClient.calls == 1
+    fresh = runner.invoke(cli.app, ["ask", "--refresh", "same question"])
+    assert fresh.output == "item 2\n"
+    assert runner.invoke(cli.app, ["ask", "same question"]).output == (
+        "item 2\n"
+    )
+    bypass = runner.invoke(cli.app, ["ask", "--no-cache", "same question"])
+    assert bypass.output == "item 3\n"
+    assert runner.invoke(cli.app, ["ask", "same question"]).output == (
+        "item 2\n"
+    )
+    other = runner.invoke(cli.app, ["ask", "other question"])
+    assert other.output == "item 4\n"
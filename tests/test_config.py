@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from typer.testing import CliRunner
 import cli
@@ -106,3 +107,48 @@ def test_unreadable_config_shows_error():
         result = runner.invoke(cli.app, ["hello"])
         assert result.exit_code != 0
         assert "Could not read config" in result.output
+
+
+def _age(path: Path) -> None:
+    os.utime(path, (1_000_000, 1_000_000))
+
+
+def test_config_parsed_once_per_process(monkeypatch):
+    with runner.isolated_filesystem():
+        _write("journals_dir: logs\n")
+        calls = []
+        orig = cli.conf.get_yaml
+
+        def counting():
+            calls.append(1)
+            return orig()
+
+        monkeypatch.setattr(cli.conf, "get_yaml", counting)
+        assert cli.conf.load_cfg()["journals_dir"] == "logs"
+        assert cli.conf.load_cfg()["journals_dir"] == "logs"
+        assert len(calls) == 1
+
+
+def test_compiled_cache_skips_yaml(monkeypatch):
+    with runner.isolated_filesystem():
+        _write("journals_dir: logs\n")
+        _age(_cfg_path())
+        cli.conf.read_cfg()
+        assert (Path(".squirrelfocus") / "cache" / "config.json").exists()
+
+        def no_yaml():
+            raise AssertionError("yaml should not be imported")
+
+        monkeypatch.setattr(cli.conf, "_MEMO", {})
+        monkeypatch.setattr(cli.conf, "get_yaml", no_yaml)
+        assert cli.conf.read_cfg() == {"journals_dir": "logs"}
+
+
+def test_compiled_cache_invalidated_on_change(monkeypatch):
+    with runner.isolated_filesystem():
+        _write("journals_dir: logs\n")
+        _age(_cfg_path())
+        cli.conf.read_cfg()
+        _write("journals_dir: other\n")
+        monkeypatch.setattr(cli.conf, "_MEMO", {})
+        assert cli.conf.read_cfg() == {"journals_dir": "other"}
@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+import os
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+import cli
+from cli import context, fts
+
+runner = CliRunner()
+
+
+def note(text, day="2025-01-01", label="a.md"):
+    return fts.Note("journal", "/j/" + label, day, label, text)
+
+
+def test_pack_respects_budget_and_order():
+    notes = [note("x" * 400), note("y" * 4000), note("z" * 40)]
+    packed = context.pack(notes, budget=150)
+    assert packed.notes == 2 and packed.considered == 3
+    assert packed.tokens <= 150
+    assert packed.text.index("xxx") < packed.text.index("zzz")
+    assert "yyy" not in packed.text
+    assert context.pack(notes, budget=5) == ("", 0, 0, 3)
+    long = context.render(note("w" * 10_000))
+    assert context.estimate_tokens(long) <= context.NOTE_TOKENS
+
+
+def test_related_prefers_recent_matches(tmp_path):
+    conn = fts.open_db(tmp_path / "search.db")
+    today = date.today()
+    old = (today - timedelta(days=720)).isoformat()
+    rows = [
+        ("flaky network probe", "probe", old, "old.md"),
+        ("network probe retries", "probe", today.isoformat(), "new.md"),
+        ("unrelated", "", today.isoformat(), "other.md"),
+    ]
+    for body, fix, day, label in rows:
+        conn.execute(
+            "INSERT INTO notes VALUES (?, ?, '', '', '', '',"
+            " 'journal', ?, ?, ?)",
+            (body, fix, "/j/" + label, day, label),
+        )
+    found = fts.related(conn, "Why does the network probe fail?")
+    assert [n.label for n in found] == ["new.md", "old.md"]
+    assert found[0].text == "fix: probe\nnetwork probe retries"
+    assert fts.related(conn, "?!") == []
+
+
+class Recorder:
+    calls = []
+
+    def __init__(self, api_key):
+        class Completions:
+            def create(self, model, messages):
+                Recorder.calls.append(messages)
+                usage = type(
+                    "U",
+                    (),
+                    {
+                        "prompt_tokens": 900,
+                        "completion_tokens": 40,
+                        "prompt_tokens_details": type(
+                            "D", (), {"cached_tokens": 768}
+                        ),
+                    },
+                )
+                msg = type("M", (), {"content": "item"})
+                choice = type("C", (), {"message": msg})
+                return type("R", (), {"choices": [choice], "usage": usage})
+
+        self.chat = type("Chat", (), {"completions": Completions()})()
+
+
+def test_ask_with_context(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "token")
+    monkeypatch.setattr(cli.openai, "OpenAI", Recorder)
+    Recorder.calls = []
+    with runner.isolated_filesystem():
+        jdir = Path("journal_logs")
+        jdir.mkdir()
+        (jdir / "2025-01-01-probe.md").write_text(
+            "---\ntrailers:\n  fix: retry the network probe\n---\nBody.\n"
+        )
+        runner.invoke(cli.app, ["drop", "probe timed out again"])
+        args = ["ask", "--with-context", "network probe"]
+        result = runner.invoke(cli.app, args)
+        assert result.exit_code == 0, result.output
+        assert "context 2/2 notes" in result.output
+        assert "prompt 900 tokens (768 cached), completion 40" in result.output
+        assert "response cache miss" in result.output
+        system, user = Recorder.calls[0]
+        assert system["content"] == cli.load_prompt()
+        assert "retry the network probe" in user["content"]
+        assert "probe timed out again" in user["content"]
+        assert user["content"].endswith("Question: network probe")
+
+        again = runner.invoke(cli.app, args)
+        assert "response cache hit" in again.output
+        plain = runner.invoke(cli.app, ["ask", "network probe"])
+        assert plain.exit_code == 0
+        assert Recorder.calls[-1][1]["content"] == "network probe"
+        assert len(Recorder.calls) == 2
+
+
+def test_ask_context_excludes_other_projects(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "token")
+    monkeypatch.setattr(cli.openai, "OpenAI", Recorder)
+    Recorder.calls = []
+    for name in ("other", "here"):
+        jdir = tmp_path / name / "journal_logs"
+        jdir.mkdir(parents=True)
+        (jdir / f"2025-01-01-{name}.md").write_text(
+            f"---\ntrailers:\n  fix: {name} network probe\n---\n"
+        )
+    monkeypatch.chdir(tmp_path / "other")
+    args = ["ask", "--with-context", "--no-cache", "network probe"]
+    assert runner.invoke(cli.app, args).exit_code == 0
+    assert "other network probe" in Recorder.calls[-1][1]["content"]
+    monkeypatch.chdir(tmp_path / "here")
+    result = runner.invoke(cli.app, args)
+    assert "context 1/1 notes" in result.output
+    user = Recorder.calls[-1][1]["content"]
+    assert "here network probe" in user
+    assert "other" not in user
+
+
+def test_load_prompt_cached_by_mtime(monkeypatch, tmp_path):
+    prompt = tmp_path / "prompt.md"
+    prompt.write_text("one")
+    monkeypatch.setattr(cli, "PROMPT_FILE", prompt)
+    assert cli.load_prompt() == "one"
+    reads = []
+    real = Path.read_text
+    monkeypatch.setattr(
+        Path, "read_text", lambda *a, **k: reads.append(1) or real(*a, **k)
+    )
+    assert cli.load_prompt() == "one"
+    assert reads == []
+    prompt.write_text("two!")
+    os.utime(prompt, ns=(0, 10**9))
+    assert cli.load_prompt() == "two!"
+    assert reads == [1]
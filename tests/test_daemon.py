@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+import cli
+from cli import acornlog, daemon
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def server(tmp_path):
+    log_dir = tmp_path / "log"
+    # AF_UNIX paths are limited to ~100 bytes, so keep the socket short.
+    sock = Path(f"/tmp/sf-test-{os.getpid()}-{id(tmp_path)}.sock")
+    srv = daemon.Server(sock, log_dir)
+    thread = threading.Thread(
+        target=srv.serve_forever, args=(0.05,), daemon=True
+    )
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    thread.join()
+
+
+def test_concurrent_clients_are_group_committed(server):
+    def client(n):
+        for i in range(20):
+            recs = [acornlog.Record(f"2025-01-01T00:00:{i:02d}", f"c{n} {i}")]
+            assert daemon.send(server.sock, recs) == 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log = server.committer.log_dir / "acornlog.txt"
+    texts = {r.text for r in acornlog.iter_records(log)}
+    assert texts == {f"c{n} {i}" for n in range(16) for i in range(20)}
+    assert server.committer.entries == 320
+    assert server.committer.commits <= 320
+
+
+def test_daemon_follows_log_migration(server):
+    log_dir = server.committer.log_dir
+    daemon.send(server.sock, [acornlog.Record("2025-01-01T00:00:00", "a")])
+    acornlog.migrate(log_dir / "acornlog.txt", log_dir / "acornlog.jsonl")
+    daemon.send(server.sock, [acornlog.Record("2025-01-01T00:00:01", "b")])
+    recs = acornlog.tail_records(log_dir / "acornlog.jsonl", 5)
+    assert [r.text for r in recs] == ["a", "b"]
+
+
+def test_bad_request_and_second_daemon(server):
+    with pytest.raises(daemon.DaemonError):
+        daemon.Server(server.sock, server.committer.log_dir)
+    import socket
+
+    with socket.socket(socket.AF_UNIX) as conn:
+        conn.connect(str(server.sock))
+        conn.sendall(b'{"nope": 1}\n')
+        assert b'"ok": false' in conn.recv(1024)
+
+
+def test_drop_via_daemon_and_fallback(server, tmp_path, monkeypatch):
+    monkeypatch.setenv("SF_SOCKET", str(server.sock))
+    monkeypatch.setattr(cli, "LOG_DIR", server.committer.log_dir)
+    direct = tmp_path / "direct.txt"
+    monkeypatch.setattr(cli, "LOG_FILE", direct)
+    runner = CliRunner()
+    result = runner.invoke(cli.app, ["drop", "--via-daemon", "hello"])
+    assert result.exit_code == 0
+    assert not direct.exists()
+    assert server.committer.entries == 1
+    monkeypatch.setenv("SF_SOCKET", str(tmp_path / "missing.sock"))
+    result = runner.invoke(cli.app, ["drop", "--via-daemon", "offline"])
+    assert result.exit_code == 0
+    assert direct.read_text().endswith(" offline\n")
+
+
+def test_sf_drop_script(server, tmp_path):
+    script = ROOT / "scripts" / "sf_drop.py"
+    env = {**os.environ, "HOME": str(tmp_path), "SF_SOCKET": str(server.sock)}
+    subprocess.run(
+        [sys.executable, str(script), "via", "daemon"], env=env, check=True
+    )
+    assert server.committer.entries == 2
+    env["SF_SOCKET"] = str(tmp_path / "missing.sock")
+    subprocess.run(
+        [sys.executable, str(script), "--fsync", "-"],
+        input=b"one\n\ntwo\n",
+        env=env,
+        check=True,
+    )
+    log = tmp_path / ".squirrelfocus" / "acornlog.txt"
+    assert [r.text for r in acornlog.iter_records(log)] == ["one", "two"]
+
+
+def test_bad_records_never_stop_the_committer(server, monkeypatch):
+    bad = [acornlog.Record("2025-01-01T00:00:00", "\ud800")]
+    with pytest.raises(daemon.DaemonError, match="bad request"):
+        daemon.send(server.sock, bad)
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(acornlog, "append_to", boom)
+    ok = [acornlog.Record("2025-01-01T00:00:01", "fine")]
+    with pytest.raises(daemon.DaemonError, match="disk on fire"):
+        daemon.send(server.sock, ok)
+    monkeypatch.undo()
+    assert daemon.send(server.sock, ok) == 1
+    assert server.committer.is_alive()
+
+
+def test_send_times_out_without_reply(monkeypatch):
+    import socket
+
+    monkeypatch.setattr(daemon, "REPLY_TIMEOUT", 0.2)
+    sock = Path(f"/tmp/sf-test-{os.getpid()}-silent.sock")
+    sock.unlink(missing_ok=True)
+    with socket.socket(socket.AF_UNIX) as silent:
+        silent.bind(str(sock))
+        silent.listen()
+        try:
+            with pytest.raises(daemon.DaemonError, match="no reply"):
+                daemon.send(sock, [acornlog.Record(None, "x")])
+        finally:
+            sock.unlink()
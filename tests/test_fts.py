@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import date
+import os
+from pathlib import Path
+
+import pytest
+
+from cli import emit, fts
+
+
+def journal(path: Path, body: str, **trailers: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ["---", "trailers:"]
+    lines += [f"  {k}: {v}" for k, v in trailers.items()]
+    path.write_text("\n".join(lines + ["---", body, ""]), encoding="utf-8")
+    # Age the file past the racy window so its stamp is trusted.
+    os.utime(path, ns=(1_600_000_000 * 10**9,) * 2)
+    return path
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db = fts.open_db(tmp_path / "search.db")
+    yield db
+    db.close()
+
+
+def refresh(conn, log, jdir):
+    with conn:
+        added = fts.refresh_log(conn, log)
+        changed = fts.refresh_journals(conn, jdir, emit.load())
+    return added, changed
+
+
+def test_build_match_quotes_terms_and_fields():
+    assert fts.build_match('crash fix:"null ptr" pars*') == (
+        '"crash" AND k0 : "null ptr" AND "pars" *'
+    )
+    assert fts.build_match("cause:x", ["issue", "cause"]) == 'k1 : "x"'
+    assert fts.build_match('a"b other:x') == '"a""b" AND "other:x"'
+    with pytest.raises(ValueError):
+        fts.build_match("  ")
+
+
+def test_log_is_indexed_incrementally(tmp_path, conn):
+    log = tmp_path / "acornlog.txt"
+    log.write_text("2025-01-01T10:00:00 first acorn\n")
+    assert refresh(conn, log, tmp_path / "none") == (1, 0)
+    with log.open("a") as fh:
+        fh.write("2025-01-02T10:00:00 second acorn\n2025-01-03T10:00:00 part")
+    assert refresh(conn, log, tmp_path / "none") == (1, 0)
+    assert refresh(conn, log, tmp_path / "none") == (0, 0)
+    hits = fts.query(conn, "acorn")
+    assert sorted(h.day for h in hits) == ["2025-01-01", "2025-01-02"]
+    log.write_text("2025-02-01T10:00:00 replaced\n")
+    refresh(conn, log, tmp_path / "none")
+    assert fts.query(conn, "acorn") == []
+
+
+def test_journals_reindex_only_changes(tmp_path, conn):
+    jdir = tmp_path / "journal"
+    a = journal(jdir / "2025-03-01-a.md", "body alpha", fix="parser crash")
+    journal(jdir / "2025" / "2025-03-02-b.md", "body beta", ref="'#12'")
+    log = tmp_path / "acornlog.txt"
+    assert refresh(conn, log, jdir) == (0, 2)
+    assert refresh(conn, log, jdir) == (0, 0)
+    journal(a, "body gamma", fix="parser crash fixed")
+    assert refresh(conn, log, jdir) == (0, 1)
+    assert fts.query(conn, "alpha") == []
+    assert [h.label for h in fts.query(conn, "gamma")] == ["2025-03-01-a.md"]
+    a.unlink()
+    refresh(conn, log, jdir)
+    assert fts.query(conn, "gamma") == []
+
+
+def test_query_filters_and_ranking(tmp_path, conn):
+    jdir = tmp_path / "journal"
+    journal(jdir / "2025-01-05-a.md", "the parser was slow", fix="cache")
+    journal(jdir / "2025-02-05-b.md", "unrelated", fix="parser timeout")
+    journal(jdir / "2025-03-05-c.md", "see ticket", ref="'#42'")
+    log = tmp_path / "acornlog.txt"
+    log.write_text("2025-02-06T09:00:00 parser notes\n")
+    refresh(conn, log, jdir)
+    hits = fts.query(conn, "parser")
+    assert hits[0].label == "2025-02-05-b.md"
+    assert len(hits) == 3
+    assert [h.label for h in fts.query(conn, "fix:parser")] == [
+        "2025-02-05-b.md"
+    ]
+    assert [h.label for h in fts.query(conn, 'ref:"#42"')] == [
+        "2025-03-05-c.md"
+    ]
+    ranged = fts.query(conn, "parser", since=date(2025, 2, 6))
+    assert [h.kind for h in ranged] == ["log"]
+    ranged = fts.query(conn, "parser", until=date(2025, 1, 31))
+    assert [h.label for h in ranged] == ["2025-01-05-a.md"]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import time
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("git") is None or shutil.which("bash") is None,
+    reason="needs git and bash",
+)
+
+
+def entry(path: Path, fix: str, age: float = 60.0) -> None:
+    path.write_text(f"---\ntrailers:\n  fix: {fix}\n  why: because\n---\n")
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def commit(repo: Path, env: dict) -> str:
+    subprocess.run(
+        ["git", "commit", "-q", "--allow-empty", "-m", "work"],
+        cwd=repo,
+        env=env,
+        check=True,
+    )
+    return subprocess.run(
+        ["git", "log", "-1", "--format=%B"],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.rstrip()
+
+
+def test_commit_msg_hook_reads_cache_without_python(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "scripts").mkdir(parents=True)
+    shutil.copy(SCRIPTS / "sqf_emit.py", repo / "scripts")
+    (repo / ".squirrelfocus").mkdir()
+    (repo / ".squirrelfocus" / "config.yaml").write_text(
+        "journals_dir: journal_logs\ntrailer_keys: [fix, why]\n"
+    )
+    jdir = repo / "journal_logs"
+    jdir.mkdir()
+    entry(jdir / "2025-01-01-a.md", "first fix")
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="t",
+        GIT_AUTHOR_EMAIL="t@example.com",
+        GIT_COMMITTER_NAME="t",
+        GIT_COMMITTER_EMAIL="t@example.com",
+    )
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(
+        ["bash", str(SCRIPTS / "install_hooks.sh")], cwd=repo, check=True
+    )
+    # Age the config and script so only the entries decide freshness.
+    old = time.time() - 60
+    os.utime(repo / ".squirrelfocus" / "config.yaml", (old, old))
+    os.utime(repo / "scripts" / "sqf_emit.py", (old, old))
+
+    assert commit(repo, env).endswith("fix: first fix\nwhy: because")
+    cache = repo / ".git" / "sqf-trailers"
+    assert cache.read_text().splitlines()[0] == "sqf-trailers 1"
+
+    # A python3 that only leaves a marker proves a hit never starts Python.
+    fake = tmp_path / "bin"
+    fake.mkdir()
+    marker = tmp_path / "python-ran"
+    (fake / "python3").write_text(f"#!/bin/sh\ntouch {marker}\nexit 1\n")
+    (fake / "python3").chmod(0o755)
+    offline = dict(env, PATH=f"{fake}{os.pathsep}{env['PATH']}")
+    assert commit(repo, offline).endswith("fix: first fix\nwhy: because")
+    assert not marker.exists()
+
+    entry(jdir / "2025-01-02-b.md", "second fix", age=0)
+    commit(repo, offline)
+    assert marker.exists()
+    assert "second fix" in commit(repo, env)
+
+    (jdir / "2025-01-02-b.md").unlink()
+    os.utime(jdir / "2025-01-01-a.md", (old, old))
+    assert commit(repo, env).endswith("fix: first fix\nwhy: because")
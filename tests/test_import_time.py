@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# Cumulative import budget for a cold ``sf drop``. Typer and its rich
+# dependency dominate; raise via SF_IMPORT_BUDGET_MS on slow runners.
+BUDGET_MS = int(os.environ.get("SF_IMPORT_BUDGET_MS", "500"))
+HEAVY = ("openai", "httpx", "pydantic", "yaml")
+RUN_SF = "import sys; from cli import app; sys.argv[0] = 'sf'; app()"
+
+
+def importtime(tmp_path: Path, *args: str) -> dict[str, int]:
+    """Run ``sf ARGS`` under -X importtime; map module -> self time (us)."""
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPATH=str(ROOT))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUN_SF, *args],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def test_drop_skips_heavy_imports(tmp_path):
+    times = importtime(tmp_path, "drop", "note")
+    loaded = [m for m in times if m.split(".")[0] in HEAVY]
+    assert loaded == []
+    log = tmp_path / ".squirrelfocus" / "acornlog.txt"
+    assert "note" in log.read_text()
+
+
+def test_drop_import_budget(tmp_path):
+    times = importtime(tmp_path, "drop", "note")
+    total_ms = sum(times.values()) / 1000
+    assert total_ms < BUDGET_MS, f"imports took {total_ms:.0f} ms"
+
+
+def test_show_skips_heavy_imports(tmp_path):
+    times = importtime(tmp_path, "show")
+    assert not [m for m in times if m.split(".")[0] in HEAVY]
@@ -0,0 +1,216 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+
+import pytest
+from typer.testing import CliRunner
+
+import cli
+from cli import llm
+
+runner = CliRunner()
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    """Chat completions endpoint that rate-limits each question once."""
+
+    seen: dict = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        question = body["messages"][-1]["content"]
+        with self.lock:
+            count = self.seen[question] = self.seen.get(question, 0) + 1
+        if count == 1 and "slow" not in question:
+            self._send(429, {"error": {"message": "slow down"}}, "0")
+            return
+        if "slow" in question:
+            time.sleep(0.2)
+        if body.get("stream"):
+            self._stream(body["model"], f"task: {question}".split(" "))
+            return
+        self._send(
+            200,
+            {
+                "id": "cmpl",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": f"task: {question}",
+                        },
+                    }
+                ],
+            },
+        )
+
+    def _stream(self, model, words):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "cmpl",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send(self, status, doc, retry_after=None):
+        data = json.dumps(doc).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after is not None:
+            self.send_header("Retry-After", retry_after)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    FakeOpenAI.seen = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "token")
+    monkeypatch.setenv(
+        "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    yield FakeOpenAI.seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_ask_batch_against_fake_server(fake_openai, tmp_path):
+    batch = tmp_path / "questions.jsonl"
+    batch.write_text(
+        '{"id": 1, "question": "slow one"}\n'
+        "plain line\n"
+        "\n"
+        '{"id": 3, "question": "plain line"}\n'
+    )
+    result = runner.invoke(
+        cli.app, ["ask", "--batch", str(batch), "--concurrency", "3"]
+    )
+    assert result.exit_code == 0, result.output
+    rows = [json.loads(line) for line in result.output.splitlines()]
+    assert rows == [
+        {"id": 1, "question": "slow one", "answer": "task: slow one"},
+        {"question": "plain line", "answer": "task: plain line"},
+        {"id": 3, "question": "plain line", "answer": "task: plain line"},
+    ]
+    # One 429 plus one success; the duplicate shared the request.
+    assert fake_openai == {"slow one": 1, "plain line": 2}
+
+    again = runner.invoke(cli.app, ["ask", "--batch", "-"], input="slow one\n")
+    assert json.loads(again.output)["answer"] == "task: slow one"
+    assert fake_openai["slow one"] == 1
+
+
+def test_ask_streams_with_timings(fake_openai):
+    result = runner.invoke(
+        cli.app, ["ask", "--stream", "--timings", "slow stream"]
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0] == "task: slow stream"
+    assert re.fullmatch(r"ttft \d+ ms, total \d+ ms", lines[1])
+
+    cached = runner.invoke(cli.app, ["ask", "--timings", "slow stream"])
+    assert cached.output.startswith("task: slow stream\nttft ")
+    assert cached.output.rstrip().endswith(", cached")
+    assert fake_openai["slow stream"] == 1
+
+
+def test_ask_stream_interrupted(monkeypatch):
+    class Chunks:
+        closed = False
+
+        def __iter__(self):
+            piece = type("D", (), {"content": "partial"})
+            yield type("K", (), {"choices": [type("C", (), {"delta": piece})]})
+            raise KeyboardInterrupt
+
+        def close(self):
+            Chunks.closed = True
+
+    class Client:
+        def __init__(self, api_key):
+            create = lambda model, messages, stream: Chunks()  # noqa: E731
+            completions = type("X", (), {"create": staticmethod(create)})
+            self.chat = type("Chat", (), {"completions": completions})
+
+    monkeypatch.setenv("OPENAI_API_KEY", "token")
+    monkeypatch.setattr(cli.openai, "OpenAI", Client)
+    result = runner.invoke(cli.app, ["ask", "--stream", "question"])
+    assert result.exit_code == 130
+    assert result.output == "partial\nInterrupted.\n"
+    assert Chunks.closed
+
+
+def test_ask_batch_rejects_bad_line(tmp_path):
+    batch = tmp_path / "bad.jsonl"
+    batch.write_text('{"q": "no question key"}\n')
+    result = runner.invoke(cli.app, ["ask", "--batch", str(batch)])
+    assert result.exit_code != 0
+    assert "line 1" in result.output
+    missing = runner.invoke(
+        cli.app, ["ask", "--batch", str(tmp_path / "missing.txt")]
+    )
+    assert missing.exit_code == 2
+    assert "cannot read" in missing.output
+    assert not isinstance(missing.exception, FileNotFoundError)
+
+
+class Limited(Exception):
+    status_code = 429
+
+
+def test_with_retries_backs_off_then_gives_up():
+    delays = []
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise Limited()
+
+    with pytest.raises(Limited):
+        llm.with_retries(call, retries=3, sleep=delays.append)
+    assert len(calls) == 4
+    assert len(delays) == 3
+    assert all(0 <= d <= llm.MAX_DELAY for d in delays)
+
+    with pytest.raises(ValueError):
+        llm.with_retries(lambda: int("x"), sleep=delays.append)
+    assert len(delays) == 3
+
+
+def test_ordered_map_keeps_input_order():
+    def work(n):
+        time.sleep(0.01 * (5 - n))
+        return n * n
+
+    out = [(n, f.result()) for n, f in llm.ordered_map(work, range(6), 3)]
+    assert out == [(n, n * n) for n in range(6)]
@@ -1,6 +1,7 @@
 from pathlib import Path
 from typer.testing import CliRunner
 import cli
+from cli import emit
 
 runner = CliRunner()
 
@@ -66,3 +67,38 @@ def test_preview_invalid_format():
     result = runner.invoke(cli.app, ["preview", "--format", "bad"])
     assert result.exit_code != 0
     assert "Format must be one of" in result.output
+
+
+def make_project(script_text: str) -> None:
+    Path(".squirrelfocus").mkdir()
+    Path(".squirrelfocus/config.yaml").write_text(
+        "journals_dir: journal_logs\n"
+    )
+    scripts = Path("scripts")
+    scripts.mkdir()
+    Path(scripts / "sqf_emit.py").write_text(script_text)
+    jdir = Path("journal_logs")
+    jdir.mkdir()
+    (jdir / "2024-01-01-test.md").write_text(
+        "---\ntrailers:\n  fix: bug\n---\n"
+    )
+
+
+def test_preview_stock_emitter_runs_in_process(monkeypatch):
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError("subprocess should not be used")
+
+    monkeypatch.setattr(cli.subprocess, "run", no_subprocess)
+    with runner.isolated_filesystem():
+        make_project(emit.SCRIPT.read_text())
+        result = runner.invoke(cli.app, ["preview", "--format", "trailers"])
+        assert result.exit_code == 0
+        assert result.output.strip() == "fix: bug"
+
+
+def test_preview_custom_emitter_uses_script():
+    with runner.isolated_filesystem():
+        make_project("print('custom output')\n")
+        result = runner.invoke(cli.app, ["preview"])
+        assert result.exit_code == 0
+        assert result.output.strip() == "custom output"
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from cli import acornlog
+from integrations import spool, webhook, workers
+
+SECRET = b"k"
+
+
+def ev(n):
+    return webhook.Event("github", "push", {"name": f"e{n}"})
+
+
+def test_enqueue_is_idempotent_on_content(tmp_path):
+    sp = spool.Spool(tmp_path / "q.db")
+    assert sp.enqueue([ev(1), ev(2)]) == 2
+    assert sp.enqueue([ev(1), ev(3)]) == 1
+    # The unsigned timestamp is not part of the key.
+    later = webhook.Event("github", "push", {"name": "e1"}, "2025-01-01")
+    assert sp.enqueue([later]) == 0
+    assert sp.pending() == 3
+    sp.close()
+
+
+def test_drain_is_at_least_once(tmp_path):
+    sp = spool.Spool(tmp_path / "q.db")
+    sp.enqueue([ev(n) for n in range(5)])
+
+    def broken(events):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        sp.drain(broken, 10)
+    assert sp.pending() == 5
+    got = []
+    assert sp.drain(got.extend, 3) == 3
+    assert sp.drain(got.extend, 3) == 2
+    assert sp.drain(got.extend, 3) == 0
+    assert [e.payload["name"] for e in got] == [f"e{n}" for n in range(5)]
+    # Delivered events still block duplicates until they are pruned.
+    assert sp.enqueue([ev(0)]) == 0
+    assert sp.prune(retention=-1) == 5
+    assert sp.enqueue([ev(0)]) == 1
+    sp.close()
+
+
+def test_single_drainer(tmp_path):
+    path = tmp_path / "q.db"
+    with spool.drainer_lock(path):
+        with pytest.raises(spool.SpoolBusy):
+            with spool.drainer_lock(path):
+                pass
+
+
+def post(port, body):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(
+        "POST", "/", body, {"X-Signature": webhook.sign(SECRET, body)}
+    )
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+
+def test_worker_pool_end_to_end(tmp_path):
+    settings = webhook.Settings(log_dir=tmp_path / "log", secret=SECRET)
+    pool = workers.Pool(settings, tmp_path / "q.db", workers=2)
+    pool.start()
+    runner = threading.Thread(target=pool.run)
+    runner.start()
+    try:
+        bodies = [
+            json.dumps(
+                {"source": "ci", "event": "run", "payload": {"name": f"r{n}"}}
+            ).encode()
+            for n in range(40)
+        ]
+        statuses = [post(pool.port, b) for b in bodies]
+        # A sender retrying after a lost response is deduplicated.
+        statuses.append(post(pool.port, bodies[0]))
+    finally:
+        pool.stopping = True
+        runner.join()
+        pool.stop()
+    assert statuses == [202] * 41
+    assert pool.delivered == 40
+    recs = acornlog.iter_records(tmp_path / "log" / "acornlog.txt")
+    assert sorted(r.text for r in recs) == sorted(
+        f"[ci/run] r{n}" for n in range(40)
+    )
@@ -3,8 +3,12 @@ from __future__ import annotations
 from pathlib import Path
 import importlib.util
 import os
+import random
+import subprocess
 import sys
 
+import pytest
+
 
 def load_emit(tmp_path: Path):
     src = Path(__file__).resolve().parents[1] / "scripts" / "sqf_emit.py"
@@ -65,3 +69,393 @@ def test_multiple_entries_fallback_parser(tmp_path, capsys, monkeypatch):
     emit.main()
     out = capsys.readouterr().out.strip()
     assert out == "fix: new"
+
+
+def test_render_is_pure(tmp_path):
+    emit = load_emit(tmp_path)
+    cfg = {"trailer_keys": ["fix", "why"], "summary_format": "F={{fix}}"}
+    entry = {"trailers": {"fix": "bug", "why": " "}}
+    assert emit.render("trailers", cfg, entry) == "fix: bug"
+    assert emit.render("summary", cfg, entry) == "F=bug"
+    assert emit.render("other", cfg, entry) == ""
+
+
+def count_parses(emit, monkeypatch) -> list[str]:
+    calls: list[str] = []
+    orig = emit.load_entry
+
+    def wrapped(path):
+        calls.append(os.path.basename(path))
+        return orig(path)
+
+    monkeypatch.setattr(emit, "load_entry", wrapped)
+    return calls
+
+
+def entry(path: Path, fix: str, ts: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\ntrailers:\n  fix: {fix}\n---\n")
+    os.utime(path, (ts, ts))
+
+
+def test_index_parses_only_what_it_needs(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    calls = count_parses(emit, monkeypatch)
+    jdir = tmp_path / "journal_logs"
+    entry(jdir / "2024" / "a.md", "a", 10)
+    entry(jdir / "2025" / "b.md", "b", 20)
+    for d in (jdir, jdir / "2024", jdir / "2025"):
+        os.utime(d, (5, 5))
+    path, fm = emit.newest("journal_logs", root=str(tmp_path))
+    assert path.endswith("b.md") and fm["trailers"]["fix"] == "b"
+    assert calls == ["b.md"]
+
+    calls.clear()
+    assert emit.newest("journal_logs", root=str(tmp_path))[0] == path
+    assert calls == []
+
+    entry(jdir / "2024" / "c.md", "c", 30)
+    os.utime(jdir / "2024", (6, 6))
+    path, fm = emit.newest("journal_logs", root=str(tmp_path))
+    assert path.endswith("c.md") and fm["trailers"]["fix"] == "c"
+    assert calls == ["c.md"]
+
+
+def test_index_handles_removed_dirs_and_inplace_edits(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    jdir = tmp_path / "journal_logs"
+    entry(jdir / "a.md", "a", 10)
+    entry(jdir / "sub" / "b.md", "b", 20)
+    os.utime(jdir, (5, 5))
+    assert emit.newest("journal_logs", root=str(tmp_path))[0].endswith("b.md")
+
+    entry(jdir / "sub" / "b.md", "edited", 25)
+    _, fm = emit.newest("journal_logs", root=str(tmp_path))
+    assert fm["trailers"]["fix"] == "edited"
+
+    (jdir / "sub" / "b.md").unlink()
+    (jdir / "sub").rmdir()
+    os.utime(jdir, (6, 6))
+    path, fm = emit.newest("journal_logs", root=str(tmp_path))
+    assert path.endswith("a.md") and fm["trailers"]["fix"] == "a"
+    gitignore = tmp_path / ".squirrelfocus" / "cache" / ".gitignore"
+    assert gitignore.read_text().strip().endswith("*")
+
+
+def test_index_falls_back_to_scan(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+
+    def broken(*args, **kwargs):
+        raise emit.sqlite3.OperationalError("locked")
+
+    monkeypatch.setattr(emit, "open_index", broken)
+    entry(tmp_path / "journal_logs" / "a.md", "a", 10)
+    path, fm = emit.newest("journal_logs", root=str(tmp_path))
+    assert path.endswith("a.md") and fm["trailers"]["fix"] == "a"
+
+
+def test_load_cfg_uses_compiled_cache(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    cfg = tmp_path / ".squirrelfocus" / "config.yaml"
+    cfg.parent.mkdir()
+    cfg.write_text("journals_dir: notes\n")
+    os.utime(cfg, (1_000_000, 1_000_000))
+    assert emit.load_cfg()["journals_dir"] == "notes"
+    assert (tmp_path / ".squirrelfocus" / "cache" / "config.json").exists()
+
+    def no_yaml():
+        raise AssertionError("yaml should not be imported")
+
+    monkeypatch.setattr(emit, "get_yaml", no_yaml)
+    assert emit.load_cfg()["journals_dir"] == "notes"
+
+
+def test_template_filters_and_unknown_placeholders(tmp_path):
+    emit = load_emit(tmp_path)
+    tmpl = (
+        '{{fix}}|{{why|default:"n/a"}}|{{ref|link}}|{{other}}|'
+        "{{fix|nope}}|{{ {{fix}}"
+    )
+    keys = ["fix", "why", "ref"]
+    out = emit.render_many(
+        tmpl,
+        [{"fix": "bug", "ref": "https://x.test/1"}, {"why": "w", "ref": "#2"}],
+        keys,
+    )
+    assert out == [
+        "bug|n/a|[https://x.test/1](https://x.test/1)|{{other}}|"
+        "{{fix|nope}}|{{ bug",
+        "|w|#2|{{other}}|{{fix|nope}}|{{ ",
+    ]
+
+
+def test_template_compiled_once(tmp_path):
+    emit = load_emit(tmp_path)
+    emit.compile_template.cache_clear()
+    entries = [{"fix": str(i)} for i in range(50)]
+    out = emit.render_many("- {{fix}}", entries, ["fix"])
+    assert out[-1] == "- 49"
+    emit.render(
+        "summary",
+        {"trailer_keys": ["fix"], "summary_format": "- {{fix}}"},
+        entries[0],
+    )
+    info = emit.compile_template.cache_info()
+    assert info.misses == 1 and info.hits == 1
+
+
+def git(root: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_range_by_date_window(tmp_path, capsys, monkeypatch):
+    emit = load_emit(tmp_path)
+    jdir = tmp_path / "journal_logs"
+    entry(jdir / "2024-01-01-a.md", "a", 10)
+    entry(jdir / "2024" / "2024-02-01-b.md", "b", 10)
+    entry(jdir / "2024-03-01-c.md", "c", 10)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["sqf_emit.py", "range", "--since", "2024-01-15"],
+    )
+    emit.main()
+    out = capsys.readouterr().out
+    assert out.startswith("### CI Triage (2 entries)")
+    assert "#### 2024-02-01 b" in out and "- **Fix:** b" in out
+    assert out.index("**Fix:** b") < out.index("**Fix:** c")
+    assert "**Fix:** a" not in out
+
+
+def test_range_by_git_revisions(tmp_path, capsys, monkeypatch):
+    emit = load_emit(tmp_path)
+    jdir = tmp_path / "journal_logs"
+    git(tmp_path, "init", "-q")
+    entry(jdir / "2024-01-01-old.md", "old", 10)
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "base")
+    git(tmp_path, "tag", "base")
+    entry(jdir / "2024-01-02-one.md", "one", 10)
+    entry(jdir / "2024-01-03-two.md", "two", 10)
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "work")
+    monkeypatch.setattr(sys, "argv", ["sqf_emit.py", "range", "base..HEAD"])
+    emit.main()
+    out = capsys.readouterr().out
+    assert "(2 entries)" in out
+    assert "**Fix:** one" in out and "**Fix:** two" in out
+    assert "old" not in out
+    monkeypatch.setattr(sys, "argv", ["sqf_emit.py", "range", "nope..HEAD"])
+    with pytest.raises(SystemExit) as exc:
+        emit.main()
+    assert exc.value.code == 2
+    err = capsys.readouterr().err.splitlines()
+    assert err[-1].startswith("sqf_emit.py range: error: git diff nope..HEAD")
+    assert "nope" in err[-1].split("failed: ")[1]
+
+
+def test_git_selection_ignores_mtimes(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    jdir = tmp_path / "journal_logs"
+    cfg = dict(emit.DEF_CFG, entry_selection="git")
+    git(tmp_path, "init", "-q")
+    entry(jdir / "2024-01-01-first.md", "first", 5)
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "root")
+    # Root commit: HEAD has no parent, so git diffs against the empty tree.
+    assert emit.select_entry(cfg)[1]["trailers"]["fix"] == "first"
+    entry(jdir / "2024-01-02-mine.md", "mine", 10)
+    entry(jdir / "2024-01-03-other.md", "other", 20)
+    git(tmp_path, "add", "journal_logs/2024-01-02-mine.md")
+    git(tmp_path, "commit", "-qm", "mine")
+    # By mtime the untracked "other" entry would win; git picks HEAD's.
+    assert emit.newest("journal_logs")[0].endswith("other.md")
+    path, fm = emit.select_entry(cfg)
+    assert path.endswith("2024-01-02-mine.md")
+
+    runs = []
+    real = emit.subprocess.run
+    monkeypatch.setattr(
+        emit.subprocess,
+        "run",
+        lambda *a, **k: runs.append(a) or real(*a, **k),
+    )
+    assert emit.select_entry(cfg)[0] == path
+    assert runs == []  # served from the per-commit cache
+    git(tmp_path, "add", ".")
+    assert emit.select_entry(cfg)[0].endswith("2024-01-03-other.md")
+    assert len(runs) == 3  # git add, then the staged and HEAD diffs
+    git(tmp_path, "commit", "-qm", "other")
+    head = subprocess.run(
+        ["git", "rev-parse", "HEAD"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    assert emit.head_sha(str(tmp_path / ".git")) == head
+
+
+def test_git_selection_prefers_staged_over_same_date_head(
+    tmp_path, capsys, monkeypatch
+):
+    emit = load_emit(tmp_path)
+    jdir = tmp_path / "journal_logs"
+    cfg = dict(emit.DEF_CFG, entry_selection="git")
+    git(tmp_path, "init", "-q")
+    entry(jdir / "2025-01-05-zeta2.md", "zzz previous", 5)
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "previous")
+    entry(jdir / "2025-01-05-alpha.md", "staged now", 5)
+    git(tmp_path, "add", ".")
+    # Same date, and "zeta2" sorts after "alpha": staged must still win.
+    assert emit.select_entry(cfg)[1]["trailers"]["fix"] == "staged now"
+    cache = tmp_path / "msg-cache"
+    monkeypatch.setattr(emit, "load_cfg", lambda: cfg)
+    monkeypatch.setattr(
+        sys, "argv", ["sqf_emit.py", "trailers", "--cache", str(cache)]
+    )
+    emit.main()
+    assert capsys.readouterr().out.startswith("fix: staged now")
+    git(tmp_path, "commit", "-qm", "alpha")
+    # The hook only describes staged entries, so nothing is emitted now.
+    emit.main()
+    assert capsys.readouterr().out == ""
+    assert emit.select_entry(cfg)[1]["trailers"]["fix"] == "staged now"
+
+
+def test_read_frontmatter_reads_only_the_prefix(tmp_path):
+    emit = load_emit(tmp_path)
+    path = tmp_path / "2024-01-01-big.md"
+    long_why = "y" * (emit.FM_BLOCK * 2)
+    head = f"---\r\ntrailers:\r\n  fix: big\r\n  why: {long_why}\r\n---"
+    # The body is not valid UTF-8, so decoding it would fail.
+    path.write_bytes(head.encode() + b"\nbody \xff\xfe\n")
+    fm, offset = emit.read_frontmatter(str(path))
+    assert fm["trailers"] == {"fix": "big", "why": long_why}
+    assert path.read_bytes()[offset:] == b"\nbody \xff\xfe\n"
+    path.write_text("no frontmatter\n")
+    assert emit.read_frontmatter(str(path)) == ({}, 0)
+    path.write_text("---\nunterminated: yes\n")
+    assert emit.read_frontmatter(str(path)) == ({}, 0)
+
+
+def test_iter_frontmatter_pool_keeps_order(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    monkeypatch.setitem(sys.modules, "sqf_emit", emit)
+    monkeypatch.setattr(emit, "POOL_MIN", 4)
+    monkeypatch.setattr(emit, "POOL_CHUNK", 2)
+    paths = []
+    for i in range(11):
+        path = tmp_path / f"2024-01-{i + 1:02d}-e.md"
+        entry(path, f"fix {i}", 10)
+        paths.append(str(path))
+    serial = list(emit.iter_frontmatter(paths, workers=1))
+    pooled = list(emit.iter_frontmatter(iter(paths), workers=2))
+    assert pooled == serial
+    assert [fm["trailers"]["fix"] for _, fm, _ in pooled] == [
+        f"fix {i}" for i in range(11)
+    ]
+    offsets = [offset for _, _, offset in pooled]
+    assert offsets == [29 + len(str(i)) for i in range(11)]
+
+
+def test_journal_entry_reads_body_lazily(tmp_path):
+    emit = load_emit(tmp_path)
+    path = tmp_path / "2024-03-05-lazy-body.md"
+    path.write_bytes(b"---\r\ntrailers:\r\n  fix: a\r\n---\r\nbody\r\n")
+    entry = emit.JournalEntry.load(str(path), ["fix"])
+    assert (entry.date.isoformat(), entry.slug) == ("2024-03-05", "lazy-body")
+    assert entry.trailers == {"fix": "a"}
+    # The key parsed from the file is the one interned copy, not its own.
+    assert next(iter(entry.trailers)) is sys.intern("fix")
+    assert not hasattr(entry, "__dict__")
+    path.write_bytes(path.read_bytes()[: entry.body_offset] + b"\nnew\n")
+    assert entry.body == "\nnew\n"
+    assert bytes(entry.mapped_body()) == b"\nnew\n"
+    with open(path, encoding="utf-8") as fh:
+        assert emit.split_frontmatter(fh.read())[1] == entry.body
+    plain = emit.JournalEntry.load(str(tmp_path / "scripts" / "sqf_emit.py"))
+    assert (plain.date, plain.trailers, plain.body_offset) == (None, {}, 0)
+
+
+def test_range_output_is_capped(tmp_path):
+    emit = load_emit(tmp_path)
+    cfg = dict(emit.DEF_CFG)
+    paths = [str(tmp_path / f"2024-01-{i:02d}-e.md") for i in range(1, 21)]
+    entries = [emit.JournalEntry(p, {"fix": "x" * 40}) for p in paths]
+    out = emit.render_range(cfg, paths, entries, max_chars=500)
+    assert len(out) <= 550
+    assert out.rstrip().endswith("more entries._")
+
+
+def test_fast_parser_matches_yaml_on_dumped_frontmatter(tmp_path):
+    yaml = pytest.importorskip("yaml")
+    emit = load_emit(tmp_path)
+    rnd = random.Random(7)
+    alphabet = list("ab yz:#-'\"\\\n{}[],&*!|>%@`~.") + ["é", "日", "yes"]
+    for _ in range(300):
+        trailers = {
+            key: "".join(
+                rnd.choice(alphabet) for _ in range(rnd.randint(0, 90))
+            )
+            for key in ("fix", "why", "ref")
+        }
+        for width in (20, 80):
+            text = yaml.safe_dump(
+                {"trailers": trailers}, sort_keys=False, width=width
+            )
+            try:
+                got = emit.parse_frontmatter(text)
+            except emit.Unsupported:
+                continue
+            assert got == yaml.safe_load(text)
+
+
+def test_fast_parser_handles_sf_new_output(tmp_path):
+    emit = load_emit(tmp_path)
+    text = (
+        "trailers:\n"
+        "  fix: plain value\n"
+        "  why: 'it''s quoted\n"
+        "\n"
+        "    and folded'\n"
+        '  change: "caf\\xE9 \\u65E5\\\n'
+        '    \\ tail"\n'
+        "  proof: ''\n"
+        "  ref:\n"
+        "other: {}\n"
+    )
+    assert emit.parse_frontmatter(text) == {
+        "trailers": {
+            "fix": "plain value",
+            "why": "it's quoted\nand folded",
+            "change": "café 日 tail",
+            "proof": "",
+            "ref": None,
+        },
+        "other": {},
+    }
+
+
+def test_fast_parser_rejects_unsupported_yaml(tmp_path, monkeypatch):
+    emit = load_emit(tmp_path)
+    for text in (
+        "trailers: [a, b]\n",
+        "fix: 123\n",
+        "fix: 2024-01-01\n",
+        "fix: |\n  block\n",
+        "fix: &anchor x\n",
+        "yes: x\n",
+        "fix: a # comment\n",
+        "fix:\tx\n",
+    ):
+        with pytest.raises(emit.Unsupported):
+            emit.parse_frontmatter(text)
+    monkeypatch.setattr(emit, "HAVE_YAML", False)
+    fm, _ = emit.split_frontmatter("---\ntrailers:\n  fix: 123\n---\n")
+    assert fm == {"trailers": {"fix": "123"}}
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import time
+
+from cli import acornlog, emit
+from integrations import webhook
+
+SECRET = b"s3cret"
+
+
+async def post(port, obj, signature=None, raw=None):
+    body = raw if raw is not None else json.dumps(obj).encode()
+    if signature is None:
+        signature = webhook.sign(SECRET, body)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = (
+        "POST /hook HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    )
+    if signature:
+        head += f"X-Signature: {signature}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    data = await reader.read()
+    writer.close()
+    status = int(data.split(b" ", 2)[1])
+    return status, json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.0\r\n\r\n".encode())
+    data = await reader.read()
+    writer.close()
+    return json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+def run(settings, scenario):
+    async def main():
+        server = webhook.IngestServer(settings)
+        port = await server.start("127.0.0.1", 0)
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+EVENT = {
+    "source": "github",
+    "event": "push",
+    "payload": {"name": "main", "html_url": "https://example.com/c/1"},
+}
+
+
+def test_signed_event_becomes_log_entry_and_journal(tmp_path):
+    settings = webhook.Settings(
+        log_dir=tmp_path / "log",
+        secret=SECRET,
+        journals_dir=tmp_path / "journal",
+        journal_events=frozenset({"github/push"}),
+    )
+
+    async def scenario(server, port):
+        assert await post(port, EVENT) == (202, {"ok": True})
+        signed = dict(EVENT, timestamp="2025-01-01T00:00:00Z")
+        digest = hmac.new(
+            SECRET, webhook.canonical(signed), "sha256"
+        ).hexdigest()
+        field = dict(signed, signature=digest)
+        assert (await post(port, field, signature=""))[0] == 202
+        # The field covers every other field, not just the payload.
+        for key, value in [("source", "gitlab"), ("timestamp", None)]:
+            forged = dict(field, **{key: value})
+            assert (await post(port, forged, signature=""))[0] == 401
+
+    run(settings, scenario)
+    recs = list(acornlog.iter_records(tmp_path / "log" / "acornlog.txt"))
+    assert [r.text for r in recs] == ["[github/push] main"] * 2
+    (stub,) = (tmp_path / "journal").iterdir()
+    fm = emit.load().load_entry(str(stub))
+    assert fm["trailers"] == {
+        "fix": "[github/push] main",
+        "ref": "https://example.com/c/1",
+    }
+
+
+def test_rejects_bad_signature_and_invalid_body(tmp_path):
+    settings = webhook.Settings(log_dir=tmp_path, secret=SECRET)
+
+    async def scenario(server, port):
+        assert (await post(port, EVENT, signature="sha256=00"))[0] == 401
+        assert (await post(port, EVENT, signature=""))[0] == 401
+        assert (await post(port, EVENT, signature="sha256=\xe9"))[0] == 401
+        field = dict(EVENT, signature="\u00e9\u2603")
+        assert (await post(port, field, signature=""))[0] == 401
+        bad = {"source": "x", "event": "", "payload": {}}
+        status, reply = await post(port, bad)
+        assert status == 400 and "event" in reply["error"]
+        assert (await post(port, None, raw=b"{nope"))[0] == 400
+        return await get(port, "/metrics")
+
+    metrics = run(settings, scenario)
+    assert metrics["received"] == 6
+    assert metrics["rejected"] == {"unauthorized": 4, "invalid": 2}
+
+
+def test_full_queue_returns_429(tmp_path, monkeypatch):
+    def slow(settings, events):
+        time.sleep(0.3)
+
+    monkeypatch.setattr(webhook, "write_batch", slow)
+    settings = webhook.Settings(
+        log_dir=tmp_path, secret=SECRET, queue_size=2, flush_interval=0
+    )
+
+    async def scenario(server, port):
+        return [(await post(port, EVENT))[0] for _ in range(6)]
+
+    statuses = run(settings, scenario)
+    assert statuses.count(202) >= 2
+    assert 429 in statuses
+
+
+def test_batches_many_events_per_write(tmp_path):
+    settings = webhook.Settings(log_dir=tmp_path, secret=SECRET)
+
+    async def scenario(server, port):
+        await asyncio.gather(*(post(port, EVENT) for _ in range(200)))
+
+    server_metrics = {}
+
+    async def wrapped(server, port):
+        await scenario(server, port)
+        await server.queue.join()
+        server_metrics.update(server.metrics.snapshot(0))
+
+    run(settings, wrapped)
+    assert server_metrics["written"] == 200
+    assert server_metrics["batches"] < 200
+    assert len(acornlog.tail(tmp_path / "acornlog.txt", 500)) == 200
+
+
+def test_only_plain_iso_timestamps_are_kept(tmp_path):
+    forged = dict(EVENT, timestamp="2024-01-01T00:00:00\nFORGED fake line")
+    good = dict(EVENT, timestamp="2024-01-01T00:00:00")
+    events = [webhook.parse_event(forged), webhook.parse_event(good)]
+    assert events[0].timestamp is None
+    assert webhook.parse_event(dict(EVENT, timestamp="soon")).timestamp is None
+    utc = webhook.parse_event(dict(EVENT, timestamp="2024-01-01T00:00:00Z"))
+    assert utc.timestamp == "2024-01-01T00:00:00+00:00"
+    settings = webhook.Settings(log_dir=tmp_path, secret=SECRET)
+    webhook.write_batch(settings, events)
+    lines = (tmp_path / "acornlog.txt").read_text().splitlines()
+    assert len(lines) == 2
+    assert lines[1] == "2024-01-01T00:00:00 [github/push] main"